@@ -0,0 +1,166 @@
+"""
+Per-match actors.
+
+Every command that reads, checks and then changes a match runs as a job on
+that match's actor: a queue drained by a single task, so one match's jobs run
+strictly in order while different matches run concurrently. After each job
+the actor publishes a detached snapshot of the match; readers such as
+autocomplete use it without waiting and never see a job half done.
+"""
+import time
+import asyncio
+import functools
+import contextvars
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+import state
+import metrics
+from model import Match
+from combos import ComboIndex, combo_index
+
+# Channel whose job is running in this context; a nested submit for it runs inline
+_inside: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("actor_channel", default=None)
+
+
+class ActorStopped(RuntimeError):
+    """Raised to jobs still queued when their match's actor stops early."""
+
+
+class MatchActor:
+    """One match's job queue and the task draining it; gone once the queue is empty."""
+    __slots__ = ("channel_id", "jobs", "task")
+
+    def __init__(self, channel_id: int):
+        self.channel_id = channel_id
+        self.jobs: deque[tuple[Callable[..., Awaitable[Any]], tuple, dict, asyncio.Future, float]] = deque()
+        self.task: Optional[asyncio.Task] = None
+
+    async def _drain(self) -> None:
+        _inside.set(self.channel_id)
+        try:
+            # Handlers hold on to the Match; don't let eviction swap it under them
+            with state.pinned(self.channel_id):
+                while self.jobs:
+                    fn, args, kwargs, fut, queued_at = self.jobs.popleft()
+                    if fut.done():
+                        # The caller gave up before the job started
+                        continue
+                    metrics.phase_seconds.observe(time.perf_counter() - queued_at, phase="actor_wait")
+                    try:
+                        result = await fn(*args, **kwargs)
+                    except BaseException as e:
+                        if not fut.done():
+                            if isinstance(e, asyncio.CancelledError):
+                                fut.cancel()
+                            else:
+                                fut.set_exception(e)
+                        if not isinstance(e, Exception):
+                            raise
+                    else:
+                        if not fut.done():
+                            fut.set_result(result)
+                    _publish(self.channel_id)
+        finally:
+            self.task = None
+            if _actors.get(self.channel_id) is self:
+                del _actors[self.channel_id]
+            # Stopped early (cancelled or interrupted): nobody else will run these
+            while self.jobs:
+                fut = self.jobs.popleft()[3]
+                if not fut.done():
+                    fut.set_exception(ActorStopped(f"Actor for channel {self.channel_id} stopped"))
+                    # The caller may be gone too; don't warn about it
+                    fut.exception()
+
+class Published:
+    """A match as of its last finished job, with the combo index of the same bans."""
+    __slots__ = ("generation", "ban_generation", "match", "index")
+
+    def __init__(self, generation: int, ban_generation: int, match: Match, index: ComboIndex):
+        self.generation = generation
+        self.ban_generation = ban_generation
+        self.match = match
+        self.index = index
+
+_actors: dict[int, MatchActor] = {}
+# Channel → what it looked like after its last finished job
+_snapshots: dict[int, Published] = {}
+
+
+async def submit(channel_id: int, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+    """Run fn(*args, **kwargs) as the match's next job and return its result."""
+    if _inside.get() == channel_id:
+        return await fn(*args, **kwargs)
+    actor = _actors.get(channel_id)
+    if actor is None:
+        actor = _actors[channel_id] = MatchActor(channel_id)
+    fut = asyncio.get_running_loop().create_future()
+    actor.jobs.append((fn, args, kwargs, fut, time.perf_counter()))
+    if actor.task is None:
+        actor.task = asyncio.create_task(actor._drain())
+    return await fut
+
+def serialized(func: Optional[Callable] = None, *, defer: bool = False,
+               ephemeral: bool = False) -> Callable:
+    """
+    Run a command handler on its channel's actor; goes below @metrics.command.
+    With defer=True the interaction is acknowledged before the job is queued,
+    so a handler waiting behind another stays within Discord's 3s window; it
+    must then reply with followups.
+    """
+    if func is None:
+        return functools.partial(serialized, defer=defer, ephemeral=ephemeral)
+
+    @functools.wraps(func)
+    async def wrapper(interaction, *args, **kwargs):
+        if defer:
+            await interaction.response.defer(ephemeral=ephemeral)
+        return await submit(interaction.channel.id, func, interaction, *args, **kwargs)
+    return wrapper
+
+# ─── Snapshots ───────────────────────────────────────────────────────
+def _publish(channel_id: int) -> None:
+    data = state.ongoing_events.get(channel_id)
+    if data is None:
+        _snapshots.pop(channel_id, None)
+        return
+    # Between jobs, so the live index matches this snapshot; usually already up to date
+    _snapshots[channel_id] = Published(state.generation(channel_id), state.ban_generation(channel_id),
+                                       data.snapshot(), combo_index(channel_id))
+
+def _current(channel_id: int) -> Optional[Published]:
+    published = _snapshots.get(channel_id)
+    actor = _actors.get(channel_id)
+    if published is not None and actor is not None and actor.task is not None:
+        return published
+    # No job in flight, so the live state is consistent; copy it if it moved on
+    if published is None or published.generation != state.generation(channel_id):
+        _publish(channel_id)
+        published = _snapshots.get(channel_id)
+    return published
+
+def snapshot(channel_id: int) -> Optional[Match]:
+    """
+    The match as of its last finished job, without waiting for a running one.
+    Shared between readers: treat it as read-only.
+    """
+    published = _current(channel_id)
+    return published.match if published else None
+
+def combos(channel_id: int) -> ComboIndex:
+    """The combo index of the same snapshot."""
+    published = _current(channel_id)
+    return published.index if published else ComboIndex(Match(), 0)
+
+async def read(channel_id: int, guild_id: Optional[int] = None) -> Match:
+    """Hydrate a match if needed and return its current snapshot."""
+    await state.ensure_loaded(channel_id, guild_id)
+    return snapshot(channel_id) or Match()
+
+def queue_depth() -> int:
+    return sum(len(a.jobs) for a in _actors.values())
+
+
+state.add_listener(lambda channel_id, event: None, lambda channel_id: _snapshots.pop(channel_id, None))
+metrics.gauge("mapban_actor_queue_depth", "Match jobs waiting for their actor", queue_depth)
@@ -0,0 +1,269 @@
+"""
+Append-only archive of finished matches.
+
+cleanup_match writes one record per match before its live state is dropped.
+Records are never updated; the summary columns and the bans table carry
+secondary indexes by team role, map and date, so queries are answered by
+SQLite without reading whole records or loading matches into memory.
+"""
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from datetime import datetime, timezone
+from typing import Any, Optional, Union
+
+import events
+from model import Match
+from storage import STATE_DIR
+
+ARCHIVE_DB = os.getenv("ARCHIVE_DB", os.path.join(STATE_DIR, "archive.db"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    match_id      TEXT PRIMARY KEY,
+    guild_id      INTEGER,
+    channel_id    INTEGER,
+    played_at     REAL NOT NULL,      -- scheduled time, else creation time (unix seconds)
+    archived_at   REAL NOT NULL,
+    team_a        INTEGER,
+    team_b        INTEGER,
+    final_map     TEXT,
+    record        TEXT NOT NULL       -- the full archived record, compact JSON
+);
+CREATE INDEX IF NOT EXISTS matches_played ON matches(played_at);
+CREATE INDEX IF NOT EXISTS matches_final_map ON matches(final_map, played_at);
+CREATE TABLE IF NOT EXISTS match_teams (
+    team_role     INTEGER NOT NULL,
+    played_at     REAL NOT NULL,
+    match_id      TEXT NOT NULL,
+    PRIMARY KEY (team_role, played_at, match_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS bans (
+    match_id      TEXT NOT NULL,
+    ord           INTEGER NOT NULL,
+    team_role     INTEGER,
+    map           TEXT NOT NULL,
+    side          TEXT NOT NULL,
+    double        INTEGER NOT NULL,
+    banned_at     TEXT,
+    played_at     REAL NOT NULL,
+    PRIMARY KEY (match_id, ord)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS bans_map_side ON bans(map, side, played_at);
+CREATE INDEX IF NOT EXISTS bans_team ON bans(team_role, played_at);
+CREATE INDEX IF NOT EXISTS bans_played ON bans(played_at);
+"""
+
+_local = threading.local()
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+TimeBound = Union[datetime, float, None]
+
+
+def _conn() -> sqlite3.Connection:
+    """One connection per executor thread."""
+    global _schema_ready
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        directory = os.path.dirname(ARCHIVE_DB)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(ARCHIVE_DB, isolation_level=None, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with _schema_lock:
+            if not _schema_ready:
+                conn.executescript(_SCHEMA)
+                _schema_ready = True
+        _local.conn = conn
+    return conn
+
+async def _run(fn, *args) -> Any:
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+def _epoch(value: TimeBound) -> Optional[float]:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return value
+
+def _parse_time(ts: Optional[str]) -> Optional[float]:
+    if not ts or ts == "TBD":
+        return None
+    try:
+        dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return _epoch(dt)
+
+# ─── Building a record ───────────────────────────────────────────────
+def build_record(data: Match, guild_id: Optional[int] = None, channel_id: Optional[int] = None) -> dict:
+    """The archived form of a match: everything but the live per-map ban state."""
+    teams = list(data.teams or [None, None])
+    ban_mode = data.ban_mode
+    if isinstance(ban_mode, dict):
+        ban_mode = ban_mode.get("chosen_option")
+    bans = []
+    for event in data.update_history:
+        if event.get("event") == events.BAN_RECORDED:
+            bans.append({
+                "team": teams[0] if event["team_key"] == "team_a" else teams[1],
+                "map": event["map"],
+                "side": event["side"],
+                "double": bool(event.get("double")),
+                "timestamp": event.get("timestamp"),
+            })
+    return {
+        "match_id": data.match_id,
+        "guild_id": guild_id,
+        "channel_id": channel_id,
+        "created_at": data.created_at,
+        "teams": teams,
+        "team_names": data.team_names,
+        "regions": data.regions,
+        "coin_flip": data.coin_flip,
+        "host_mode_rules": data.host_mode_rules,
+        "ban_mode": ban_mode,
+        "host_team": data.host_team,
+        "bans": bans,
+        "final": data.final,
+        "scheduled_time": data.scheduled_time,
+        "casters": data.casters,
+    }
+
+def _insert(record: dict) -> bool:
+    played_at = (_parse_time(record.get("scheduled_time"))
+                 or _parse_time(record.get("created_at"))
+                 or time.time())
+    teams = record["teams"]
+    final = record.get("final") or {}
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO matches (match_id, guild_id, channel_id, played_at, archived_at, "
+            "team_a, team_b, final_map, record) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (record["match_id"], record.get("guild_id"), record.get("channel_id"), played_at,
+             time.time(), teams[0], teams[1], final.get("map"),
+             json.dumps(record, separators=(",", ":"))))
+        if cur.rowcount:
+            conn.executemany(
+                "INSERT OR IGNORE INTO match_teams (team_role, played_at, match_id) VALUES (?, ?, ?)",
+                [(t, played_at, record["match_id"]) for t in teams if t is not None])
+            conn.executemany(
+                "INSERT INTO bans (match_id, ord, team_role, map, side, double, banned_at, played_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(record["match_id"], i, b["team"], b["map"], b["side"], int(b["double"]),
+                  b["timestamp"], played_at) for i, b in enumerate(record["bans"])])
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return bool(cur.rowcount)
+
+async def archive_match(data: Match, guild_id: Optional[int] = None,
+                        channel_id: Optional[int] = None) -> bool:
+    """
+    Append a match to the archive. Returns False if it has no match_id or was
+    already archived (records are never overwritten).
+    """
+    if not data.match_id:
+        return False
+    return await _run(_insert, build_record(data, guild_id, channel_id))
+
+# ─── Queries ─────────────────────────────────────────────────────────
+def _range(column: str, since: TimeBound, until: TimeBound) -> tuple[str, list]:
+    clauses, params = [], []
+    if since is not None:
+        clauses.append(f"{column} >= ?")
+        params.append(_epoch(since))
+    if until is not None:
+        clauses.append(f"{column} < ?")
+        params.append(_epoch(until))
+    return "".join(f" AND {c}" for c in clauses), params
+
+def _fetch_records(sql: str, params: list) -> list[dict]:
+    return [json.loads(r[0]) for r in _conn().execute(sql, params)]
+
+async def get(match_id: str) -> Optional[dict]:
+    rows = await _run(_fetch_records, "SELECT record FROM matches WHERE match_id = ?", [match_id])
+    return rows[0] if rows else None
+
+async def matches_for_team(team_role: int, since: TimeBound = None, until: TimeBound = None,
+                           limit: int = 100) -> list[dict]:
+    """A team's archived matches, newest first, e.g. since the start of the season."""
+    where, params = _range("t.played_at", since, until)
+    sql = ("SELECT m.record FROM match_teams t JOIN matches m ON m.match_id = t.match_id "
+           f"WHERE t.team_role = ?{where} ORDER BY t.played_at DESC LIMIT ?")
+    return await _run(_fetch_records, sql, [team_role, *params, limit])
+
+async def matches_on_map(map_name: str, since: TimeBound = None, until: TimeBound = None,
+                         limit: int = 100) -> list[dict]:
+    """Archived matches whose final map was map_name, newest first."""
+    where, params = _range("played_at", since, until)
+    sql = f"SELECT record FROM matches WHERE final_map = ?{where} ORDER BY played_at DESC LIMIT ?"
+    return await _run(_fetch_records, sql, [map_name, *params, limit])
+
+async def matches_between(since: TimeBound = None, until: TimeBound = None,
+                          limit: int = 100) -> list[dict]:
+    where, params = _range("played_at", since, until)
+    sql = f"SELECT record FROM matches WHERE 1 = 1{where} ORDER BY played_at DESC LIMIT ?"
+    return await _run(_fetch_records, sql, [*params, limit])
+
+def _rows(sql: str, params: list) -> list[tuple]:
+    return _conn().execute(sql, params).fetchall()
+
+async def most_banned(since: TimeBound = None, until: TimeBound = None,
+                      team_role: Optional[int] = None, limit: int = 10) -> list[tuple[str, str, int]]:
+    """(map, side, times banned), most banned first; optionally only one team's bans."""
+    where, params = _range("played_at", since, until)
+    if team_role is not None:
+        where += " AND team_role = ?"
+        params.append(team_role)
+    sql = (f"SELECT map, side, COUNT(*) AS n FROM bans WHERE 1 = 1{where} "
+           "GROUP BY map, side ORDER BY n DESC, map, side LIMIT ?")
+    return await _run(_rows, sql, [*params, limit])
+
+async def count() -> int:
+    rows = await _run(_rows, "SELECT COUNT(*) FROM matches", [])
+    return rows[0][0]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    def _date(s: str) -> datetime:
+        return datetime.fromisoformat(s)
+
+    parser = argparse.ArgumentParser(description="Query the match archive")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_banned = sub.add_parser("most-banned", help="most banned map/side pairs")
+    p_banned.add_argument("--team", type=int, help="only this team role's bans")
+    p_banned.add_argument("--limit", type=int, default=10)
+    p_team = sub.add_parser("team", help="a team role's archived matches")
+    p_team.add_argument("team_role", type=int)
+    p_team.add_argument("--limit", type=int, default=100)
+    for p in (p_banned, p_team):
+        p.add_argument("--since", type=_date, help="ISO date, e.g. the season start")
+        p.add_argument("--until", type=_date)
+    args = parser.parse_args()
+
+    if args.cmd == "most-banned":
+        for map_name, side, n in asyncio.run(most_banned(args.since, args.until, args.team, args.limit)):
+            print(f"{n:>5}  {map_name} ({side})")
+    else:
+        for rec in asyncio.run(matches_for_team(args.team_role, args.since, args.until, args.limit)):
+            final = rec.get("final") or {}
+            teams = rec.get("teams") or [None, None]
+            names = rec.get("team_names") or [f"<@&{t}>" for t in teams]
+            when = rec.get("scheduled_time")
+            if not when or when == "TBD":
+                when = rec.get("created_at")
+            print(f"{when}  "
+                  f"{names[0]} vs {names[1]}  "
+                  f"{final.get('map', '-')}  {rec['match_id']}")
@@ -0,0 +1,117 @@
+"""
+Precomputed lookups for the map and side autocompletes.
+
+A NameIndex is built once per distinct list of map names and shared by every
+match using that pool: normalised names, an n-gram → positions table and
+ready-made Choice objects. Which maps are still open comes from the match's
+ComboIndex, which is already updated incrementally on every ban, so a
+keystroke is a dict lookup plus a filter over at most the matching names.
+"""
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+from discord.app_commands import Choice
+
+import events
+
+MAX_CHOICES = 25  # Discord's limit per autocomplete response
+NGRAM = 3
+_QUERY_CACHE_MAX = 256
+_INDEX_CACHE_MAX = 16
+
+_DASHES = re.compile(r"[‐-―−\-_/]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Casefolded, accent-free, with en/em dashes and runs of whitespace as one space."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = _DASHES.sub(" ", text.casefold())
+    return _SPACES.sub(" ", text).strip()
+
+
+class NameIndex:
+    """Substring search over a fixed list of names, ranked prefix > word prefix > infix."""
+    __slots__ = ("names", "norms", "choices", "_grams", "_cache")
+
+    def __init__(self, names: Iterable[str]):
+        self.names: tuple[str, ...] = tuple(names)
+        self.norms: tuple[str, ...] = tuple(normalize(n) for n in self.names)
+        self.choices: tuple[Choice, ...] = tuple(Choice(name=n, value=n) for n in self.names)
+        # Every 1..NGRAM-character substring → positions of the names containing it
+        grams: dict[str, set[int]] = {}
+        for pos, norm in enumerate(self.norms):
+            for size in range(1, NGRAM + 1):
+                for i in range(len(norm) - size + 1):
+                    grams.setdefault(norm[i:i + size], set()).add(pos)
+        self._grams: dict[str, frozenset[int]] = {g: frozenset(p) for g, p in grams.items()}
+        self._cache: "OrderedDict[str, tuple[int, ...]]" = OrderedDict()
+
+    def _rank(self, pos: int, query: str) -> tuple[int, int]:
+        norm = self.norms[pos]
+        if norm.startswith(query):
+            return 0, pos
+        if f" {query}" in norm:
+            return 1, pos
+        return 2, pos
+
+    def positions(self, current: str) -> tuple[int, ...]:
+        """Positions of the names matching what the user typed, best first."""
+        query = normalize(current)
+        hit = self._cache.get(query)
+        if hit is not None:
+            self._cache.move_to_end(query)
+            return hit
+        if not query:
+            result = tuple(range(len(self.names)))
+        else:
+            if len(query) <= NGRAM:
+                candidates = self._grams.get(query, frozenset())
+            else:
+                # Intersect the n-gram postings, smallest first, then confirm the substring
+                postings = sorted((self._grams.get(query[i:i + NGRAM], frozenset())
+                                   for i in range(len(query) - NGRAM + 1)), key=len)
+                candidates = frozenset.intersection(*postings)
+                candidates = [p for p in candidates if query in self.norms[p]]
+            result = tuple(sorted(candidates, key=lambda p: self._rank(p, query)))
+        self._cache[query] = result
+        if len(self._cache) > _QUERY_CACHE_MAX:
+            self._cache.popitem(last=False)
+        return result
+
+    def search(self, current: str, allowed: Optional[Callable[[str], bool]] = None) -> list[Choice]:
+        """Up to MAX_CHOICES Choice objects, optionally only names for which allowed() is true."""
+        out: list[Choice] = []
+        for pos in self.positions(current):
+            if allowed is None or allowed(self.names[pos]):
+                out.append(self.choices[pos])
+                if len(out) == MAX_CHOICES:
+                    break
+        return out
+
+
+_indexes: "OrderedDict[tuple[str, ...], NameIndex]" = OrderedDict()
+
+def name_index(names: Iterable[str]) -> NameIndex:
+    """The shared index for this exact list of names."""
+    key = tuple(names)
+    idx = _indexes.get(key)
+    if idx is None:
+        idx = _indexes[key] = NameIndex(key)
+        if len(_indexes) > _INDEX_CACHE_MAX:
+            _indexes.popitem(last=False)
+    else:
+        _indexes.move_to_end(key)
+    return idx
+
+
+_sides = NameIndex(events.SIDES)
+
+def side_choices(current: str, is_open: Callable[[str], bool]) -> list[Choice]:
+    """Open sides matching what the user typed; both sides if none is open."""
+    if not any(is_open(s) for s in events.SIDES):
+        return _sides.search(current)
+    return _sides.search(current, is_open)
@@ -0,0 +1,253 @@
+"""
+Drive complete ban phases for N concurrent matches through the real command
+callbacks, against fake Discord objects, and report latency and I/O figures.
+
+    python -m benchmarks.bench_matches --matches 50
+
+Runs offline in a scratch directory; nothing touches Discord or ./state.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--matches", type=int, default=20, help="concurrent matches (default 20)")
+    p.add_argument("--rounds", type=int, default=1, help="times to repeat the whole batch")
+    p.add_argument("--seed", type=int, default=1, help="seed for coin flips and ban choices")
+    p.add_argument("--api-latency-ms", type=float, default=0.0,
+                   help="simulated latency of every Discord request")
+    p.add_argument("--paced", action="store_true",
+                   help="keep the outbound rate limits instead of lifting them")
+    p.add_argument("--backend", choices=("file", "sqlite"), default=None,
+                   help="state backend (default: STATE_BACKEND or file)")
+    p.add_argument("--json", action="store_true", help="print the report as JSON")
+    p.add_argument("--fail-p95-ms", type=float, default=None,
+                   help="exit 1 if overall p95 command latency exceeds this")
+    return p.parse_args(argv)
+
+def percentile(samples: list, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+class Recorder:
+    """Wraps the state backend's write and the grid encoder to count what they do."""
+    def __init__(self):
+        self.latencies: dict[str, list] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.writes: Counter = Counter()
+        self.bytes_written = 0
+        self.render_seconds: list = []
+        self._lock = threading.Lock()
+
+    def _count_write(self, kind: str, nbytes: int) -> None:
+        with self._lock:
+            self.writes[kind] += 1
+            self.bytes_written += nbytes
+
+    def install(self, state, render) -> None:
+        backend = state.backend()
+        write, encode_grid = backend.write, render.encode_grid
+
+        async def _write(writes):
+            for w in writes:
+                if w.snapshot is not None:
+                    self._count_write("snapshot", len(w.snapshot.encode()))
+                else:
+                    self._count_write("journal", len(w.journal.encode()))
+            return await write(writes)
+
+        def _encode_grid(*args):
+            start = time.perf_counter()
+            try:
+                return encode_grid(*args)
+            finally:
+                # Renders run in the pool's threads
+                with self._lock:
+                    self.render_seconds.append(time.perf_counter() - start)
+
+        backend.write = _write
+        render.encode_grid = _encode_grid
+
+    async def run(self, name: str, command, interaction, *args) -> None:
+        start = time.perf_counter()
+        try:
+            await command.callback(interaction, *args)
+        except Exception as e:
+            self.errors[f"{name}: {type(e).__name__}: {e}"] += 1
+        finally:
+            self.latencies[name].append(time.perf_counter() - start)
+
+
+async def play_match(rec: Recorder, cmds, fake, team_names, rng: random.Random) -> None:
+    import state
+    from combos import combo_index
+
+    role_a = fake.Role(next(fake._ids), team_names[0])
+    role_b = fake.Role(next(fake._ids), team_names[1])
+    channel = fake.TextChannel(fake.Guild([role_a, role_b]))
+    users = (fake.Member([role_a]), fake.Member([role_b]))
+
+    def turn() -> "fake.Interaction":
+        data = state.ongoing_events[channel.id]
+        return fake.Interaction(channel, users[data.current_turn_index])
+
+    await rec.run("match_create", cmds.match_create, fake.Interaction(channel, users[0]), role_a, role_b)
+    data = state.ongoing_events[channel.id]
+    if data.host_mode_rules == "Ban":
+        await rec.run("select_ban_mode", cmds.select_ban_mode, turn(), rng.choice(["Final", "Double"]))
+    else:
+        await rec.run("select_host_mode", cmds.select_host_mode, turn(), rng.choice(["Ban", "Host"]))
+
+    # Each ban closes at least one slot, so this always terminates
+    for _ in range(len(combo_index(channel.id).combos()) + 1):
+        if data.finalbanpost:
+            break
+        team_key = "team_a" if data.current_turn_index % 2 == 0 else "team_b"
+        options = [(m, s) for (m, t, s) in combo_index(channel.id).combos() if t == team_key]
+        if not options:
+            break
+        map_name, side = rng.choice(options)
+        await rec.run("ban_map", cmds.ban_map, turn(), map_name, side)
+
+    await rec.run("match_time", cmds.match_time, fake.Interaction(channel, users[0]),
+                  "2026-05-21T18:00:00-04:00")
+    await rec.run("caster_add", cmds.caster_add, fake.Interaction(channel, users[0]),
+                  "https://twitch.tv/caster")
+
+
+async def main(args: argparse.Namespace) -> dict:
+    import state
+    import render
+    import registry
+    import scheduler
+    from benchmarks import fake_discord as fake
+    from commands import (match_create, select_host_mode, select_ban_mode,
+                          ban_map, match_time, caster_add)
+
+    cmds = argparse.Namespace(
+        match_create=match_create.match_create,
+        select_host_mode=select_host_mode.select_host_mode,
+        select_ban_mode=select_ban_mode.select_ban_mode,
+        ban_map=ban_map.ban_map,
+        match_time=match_time.match_time,
+        caster_add=caster_add.caster_add,
+    )
+    rec = Recorder()
+    rec.install(state, render)
+    fake.api_latency = args.api_latency_ms / 1000
+
+    names = sorted(registry.team_map().region_lookup) or ["Team A", "Team B"]
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        await asyncio.gather(*(
+            play_match(rec, cmds, fake, tuple(rng.sample(names, 2)) if len(names) > 1 else ("Team A", "Team B"),
+                       random.Random(rng.random()))
+            for _ in range(args.matches)
+        ))
+    await state.flush_all()
+    wall = time.perf_counter() - start
+    render.shutdown()
+    state.close_backend()
+    scheduler.close()
+
+    commands_run = sum(len(v) for v in rec.latencies.values())
+    all_latencies = [x for v in rec.latencies.values() for x in v]
+    ms = lambda s: round(s * 1000, 3)
+    return {
+        "matches": args.matches * args.rounds,
+        "commands": commands_run,
+        "wall_seconds": round(wall, 3),
+        "commands_per_second": round(commands_run / wall, 1) if wall else 0.0,
+        "latency_ms": {
+            name: {"n": len(v), "p50": ms(percentile(v, 50)),
+                   "p95": ms(percentile(v, 95)), "p99": ms(percentile(v, 99))}
+            for name, v in sorted(rec.latencies.items())
+        } | {"all": {"n": len(all_latencies), "p50": ms(percentile(all_latencies, 50)),
+                     "p95": ms(percentile(all_latencies, 95)),
+                     "p99": ms(percentile(all_latencies, 99))}},
+        "state_writes": dict(rec.writes),
+        "state_writes_per_command": round(sum(rec.writes.values()) / commands_run, 3) if commands_run else 0.0,
+        "bytes_written": rec.bytes_written,
+        "renders": len(rec.render_seconds),
+        "render_ms": {"p50": ms(percentile(rec.render_seconds, 50)),
+                      "p95": ms(percentile(rec.render_seconds, 95)),
+                      "total": ms(sum(rec.render_seconds))},
+        "api_calls": dict(fake.calls),
+        "api_calls_per_command": round(sum(fake.calls.values()) / commands_run, 3) if commands_run else 0.0,
+        "errors": dict(rec.errors),
+    }
+
+def print_report(report: dict) -> None:
+    print(f"{report['matches']} matches, {report['commands']} commands in "
+          f"{report['wall_seconds']}s ({report['commands_per_second']}/s)")
+    print(f"\n{'command':<18}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, row in report["latency_ms"].items():
+        print(f"{name:<18}{row['n']:>6}{row['p50']:>10}{row['p95']:>10}{row['p99']:>10}")
+    print(f"\nstate writes:   {report['state_writes']} "
+          f"({report['state_writes_per_command']}/command, {report['bytes_written']} bytes)")
+    print(f"grid renders:   {report['renders']} "
+          f"(p50 {report['render_ms']['p50']} ms, total {report['render_ms']['total']} ms)")
+    print(f"api calls:      {report['api_calls']} ({report['api_calls_per_command']}/command)")
+    if report["errors"]:
+        print("\nerrors:")
+        for err, n in report["errors"].items():
+            print(f"  {n} × {err}")
+
+def run(argv=None) -> int:
+    args = parse_args(argv)
+    # Configure the bot modules before they are imported
+    os.environ.setdefault("RENDER_POOL", "thread")
+    if args.backend:
+        os.environ["STATE_BACKEND"] = args.backend
+    if not args.paced:
+        os.environ.setdefault("OUTBOUND_CHANNEL_RATE", "1e9")
+        os.environ.setdefault("OUTBOUND_CHANNEL_BURST", "1e9")
+        os.environ.setdefault("OUTBOUND_GLOBAL_RATE", "1e9")
+        os.environ.setdefault("OUTBOUND_WARN_DEPTH", "1000000")
+    sys.path.insert(0, str(REPO_DIR))
+
+    with tempfile.TemporaryDirectory(prefix="mapban-bench-") as scratch:
+        # state/ is relative to the working directory
+        cwd = os.getcwd()
+        os.chdir(scratch)
+        try:
+            report = asyncio.run(main(args))
+        finally:
+            os.chdir(cwd)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    if report["errors"]:
+        return 1
+    if args.fail_p95_ms is not None and report["latency_ms"]["all"]["p95"] > args.fail_p95_ms:
+        print(f"\np95 {report['latency_ms']['all']['p95']} ms exceeds {args.fail_p95_ms} ms",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,154 @@
+"""
+Offline stand-ins for the discord.py objects the commands touch.
+Every simulated API request is counted in `calls` and can be given a latency.
+"""
+import asyncio
+import itertools
+import types
+from collections import Counter
+from typing import Optional
+
+import discord
+
+_ids = itertools.count(10_000)
+
+# Simulated REST requests by kind: send, edit, delete, react, fetch, followup, respond
+calls: Counter = Counter()
+# Seconds each simulated request takes
+api_latency = 0.0
+
+
+def _not_found() -> discord.NotFound:
+    return discord.NotFound(types.SimpleNamespace(status=404, reason="Not Found"), "Unknown Message")
+
+async def _request(kind: str) -> None:
+    calls[kind] += 1
+    if api_latency:
+        await asyncio.sleep(api_latency)
+
+
+class Role:
+    def __init__(self, id: int, name: str):
+        self.id = id
+        self.name = name
+        self.mention = f"<@&{id}>"
+
+
+class Member:
+    def __init__(self, roles: list):
+        self.id = next(_ids)
+        self.roles = roles
+        self.mention = f"<@{self.id}>"
+
+
+class Guild:
+    def __init__(self, roles: list):
+        self.id = next(_ids)
+        self._roles = {r.id: r for r in roles}
+
+    def get_role(self, role_id: int) -> Optional[Role]:
+        return self._roles.get(role_id)
+
+
+class Message:
+    def __init__(self, channel: "TextChannel", content=None, embed=None, file=None):
+        self.id = next(_ids)
+        self.channel = channel
+        self.content = content
+        self.embeds = [embed] if embed else []
+        self.reactions: list[str] = []
+
+    async def edit(self, *, content=None, embed=None, **kwargs) -> "Message":
+        await _request("edit")
+        if content is not None:
+            self.content = content
+        if embed is not None:
+            self.embeds = [embed]
+        return self
+
+    async def delete(self) -> None:
+        await _request("delete")
+        if self.channel.messages.pop(self.id, None) is None:
+            raise _not_found()
+
+    async def add_reaction(self, emoji: str) -> None:
+        await _request("react")
+        self.reactions.append(emoji)
+
+
+class PartialMessage:
+    """Like discord.PartialMessage: an id and a channel, no fetch needed."""
+    def __init__(self, channel: "TextChannel", message_id: int):
+        self.id = message_id
+        self.channel = channel
+
+    async def edit(self, **kwargs) -> Message:
+        msg = self.channel.messages.get(self.id)
+        if msg is None:
+            await _request("edit")
+            raise _not_found()
+        return await msg.edit(**kwargs)
+
+    async def delete(self) -> None:
+        msg = self.channel.messages.get(self.id)
+        if msg is None:
+            await _request("delete")
+            raise _not_found()
+        await msg.delete()
+
+
+class TextChannel:
+    def __init__(self, guild: Guild):
+        self.id = next(_ids)
+        self.guild = guild
+        self.mention = f"<#{self.id}>"
+        self.messages: dict[int, Message] = {}
+
+    async def send(self, content=None, *, embed=None, file=None, **kwargs) -> Message:
+        await _request("send")
+        msg = Message(self, content, embed, file)
+        self.messages[msg.id] = msg
+        return msg
+
+    async def fetch_message(self, message_id: int) -> Message:
+        await _request("fetch")
+        msg = self.messages.get(message_id)
+        if msg is None:
+            raise _not_found()
+        return msg
+
+    def get_partial_message(self, message_id: int) -> PartialMessage:
+        return PartialMessage(self, message_id)
+
+
+class _Response:
+    def __init__(self):
+        self._done = False
+
+    async def defer(self, **kwargs) -> None:
+        await _request("respond")
+        self._done = True
+
+    async def send_message(self, *args, **kwargs) -> None:
+        await _request("respond")
+        self._done = True
+
+    def is_done(self) -> bool:
+        return self._done
+
+
+class _Followup:
+    async def send(self, *args, **kwargs) -> None:
+        await _request("followup")
+
+
+class Interaction:
+    def __init__(self, channel: TextChannel, user: Member):
+        self.channel = channel
+        self.channel_id = channel.id
+        self.guild = channel.guild
+        self.guild_id = channel.guild.id
+        self.user = user
+        self.response = _Response()
+        self.followup = _Followup()
+        self.namespace = types.SimpleNamespace()
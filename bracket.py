@@ -0,0 +1,194 @@
+"""
+Bulk match creation from a bracket file.
+
+A bracket is CSV with a header row (channel, role_a, role_b and an optional
+time column) or JSON: a list of objects with those keys, or {"matches": [...]}.
+Channels and roles may be given as ids, mentions or exact names; times are
+ISO-8601 with a timezone.
+"""
+import os
+import io
+import csv
+import json
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+import discord
+from dateutil.parser import isoparse
+
+import state
+import actors
+from commands.match_create import create_match
+
+logger = logging.getLogger(__name__)
+
+# Matches set up at once. Their status embeds still go through the outbound
+# queue, so this bounds state loads and memory, not the request rate.
+CONCURRENCY = int(os.getenv("BRACKET_CONCURRENCY", "4"))
+MAX_ROWS = int(os.getenv("BRACKET_MAX_ROWS", "200"))
+
+
+class BracketError(ValueError):
+    """The bracket file as a whole could not be read."""
+
+
+class Row(NamedTuple):
+    line: int
+    channel: str
+    role_a: str
+    role_b: str
+    time: Optional[str]
+
+
+def _row(line: int, entry: dict) -> Row:
+    entry = {str(k).strip().lower(): ("" if v is None else str(v).strip()) for k, v in entry.items()}
+    return Row(line, entry.get("channel", ""), entry.get("role_a", ""), entry.get("role_b", ""),
+               entry.get("time") or None)
+
+def parse(text: str, filename: str = "") -> list[Row]:
+    """Rows of a CSV or JSON bracket; JSON is detected by name or content."""
+    stripped = text.lstrip("\ufeff").strip()
+    if not stripped:
+        raise BracketError("The bracket file is empty.")
+    if filename.lower().endswith(".json") or stripped[0] in "[{":
+        try:
+            data = json.loads(stripped)
+        except json.JSONDecodeError as e:
+            raise BracketError(f"Invalid JSON: {e}") from None
+        if isinstance(data, dict):
+            data = data.get("matches")
+        if not isinstance(data, list) or not all(isinstance(e, dict) for e in data):
+            raise BracketError('JSON must be a list of matches or {"matches": [...]}.')
+        rows = [_row(i, e) for i, e in enumerate(data, 1)]
+    else:
+        reader = csv.DictReader(io.StringIO(stripped))
+        fields = {f.strip().lower() for f in reader.fieldnames or []}
+        missing = {"channel", "role_a", "role_b"} - fields
+        if missing:
+            raise BracketError(f"CSV header is missing: {', '.join(sorted(missing))}.")
+        # Line numbers as an editor shows them, header being line 1
+        rows = [_row(reader.line_num, e) for e in reader]
+    if len(rows) > MAX_ROWS:
+        raise BracketError(f"{len(rows)} matches is more than the limit of {MAX_ROWS}.")
+    return rows
+
+def _snowflake(ref: str, prefix: str) -> Optional[int]:
+    if ref.startswith(prefix) and ref.endswith(">"):
+        ref = ref[len(prefix):-1]
+    return int(ref) if ref.isdigit() else None
+
+def resolve_channel(guild: discord.Guild, ref: str) -> Optional[discord.TextChannel]:
+    channel_id = _snowflake(ref, "<#")
+    if channel_id is not None:
+        channel = guild.get_channel(channel_id)
+    else:
+        channel = discord.utils.get(guild.text_channels, name=ref.lstrip("#"))
+    return channel if isinstance(channel, discord.TextChannel) else None
+
+def resolve_role(guild: discord.Guild, ref: str) -> Optional[discord.Role]:
+    role_id = _snowflake(ref, "<@&")
+    if role_id is not None:
+        return guild.get_role(role_id)
+    return discord.utils.get(guild.roles, name=ref.lstrip("@"))
+
+
+class Report:
+    """Outcome of one import, one line per bracket row."""
+    def __init__(self):
+        # (bracket line, text), in completion order
+        self.created: list[tuple[int, str]] = []
+        self.skipped: list[tuple[int, str]] = []
+        self.failed: list[tuple[int, str]] = []
+        self.seconds = 0.0
+
+    def summary(self) -> str:
+        lines = [f"Created {len(self.created)}, skipped {len(self.skipped)}, "
+                 f"failed {len(self.failed)} in {self.seconds:.1f}s."]
+        for title, items in (("Created", self.created), ("Skipped", self.skipped), ("Failed", self.failed)):
+            if items:
+                lines.append(f"\n{title}:")
+                lines.extend(f"- line {line}: {text}" for line, text in sorted(items))
+        return "\n".join(lines)
+
+
+class _Planned(NamedTuple):
+    row: Row
+    channel: discord.TextChannel
+    role_a: discord.Role
+    role_b: discord.Role
+    when: Optional[datetime]
+
+
+def _plan(guild: discord.Guild, rows: list[Row], report: Report) -> list[_Planned]:
+    """Resolve every row up front so bad rows are reported without touching Discord."""
+    planned: list[_Planned] = []
+    seen: set[int] = set()
+    for row in rows:
+        channel = resolve_channel(guild, row.channel)
+        role_a, role_b = resolve_role(guild, row.role_a), resolve_role(guild, row.role_b)
+        problem = None
+        if channel is None:
+            problem = f"unknown channel `{row.channel}`"
+        elif channel.id in seen:
+            problem = f"{channel.mention} appears more than once"
+        elif role_a is None or role_b is None:
+            problem = f"unknown role `{row.role_a if role_a is None else row.role_b}`"
+        elif role_a.id == role_b.id:
+            problem = "a team can't play itself"
+        when = None
+        if problem is None and row.time:
+            try:
+                when = isoparse(row.time)
+            except ValueError:
+                problem = f"invalid time `{row.time}`"
+            else:
+                if when.tzinfo is None:
+                    problem = f"time `{row.time}` has no timezone"
+        if problem:
+            report.failed.append((row.line, problem))
+            continue
+        seen.add(channel.id)
+        planned.append(_Planned(row, channel, role_a, role_b, when))
+    return planned
+
+async def _create(p: _Planned, guild_id: int, overwrite: bool) -> bool:
+    existing = await state.ensure_loaded(p.channel.id, guild_id)
+    if existing.match_id and not overwrite:
+        return False
+    await create_match(p.channel, guild_id, p.role_a, p.role_b, p.when)
+    return True
+
+async def import_bracket(guild: discord.Guild, rows: list[Row], overwrite: bool = False) -> Report:
+    """
+    Create every match in the bracket, CONCURRENCY at a time. State writes of
+    the whole import are held and written together at the end.
+    """
+    start = time.perf_counter()
+    report = Report()
+    planned = _plan(guild, rows, report)
+    sem = asyncio.Semaphore(CONCURRENCY)
+
+    async def _one(p: _Planned) -> None:
+        line = p.row.line
+        label = f"{p.channel.mention} {p.role_a.mention} vs {p.role_b.mention}"
+        async with sem:
+            try:
+                # The existence check and the creation run as one job on the match's actor
+                if not await actors.submit(p.channel.id, _create, p, guild.id, overwrite):
+                    report.skipped.append((line, f"{label} (match already exists)"))
+                    return
+            except Exception as e:
+                logger.exception("Bracket import failed for channel %s", p.channel.id)
+                report.failed.append((line, f"{label}: {type(e).__name__}: {e}"))
+                return
+        report.created.append((line, label))
+
+    async with state.batched_writes(p.channel.id for p in planned):
+        await asyncio.gather(*(_one(p) for p in planned))
+    report.seconds = time.perf_counter() - start
+    logger.info("Bracket import in guild %s: %d created, %d skipped, %d failed",
+                guild.id, len(report.created), len(report.skipped), len(report.failed))
+    return report
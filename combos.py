@@ -0,0 +1,124 @@
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import state
+import events
+import metrics
+from model import TEAM_KEYS, Match, bit
+
+
+class ComboIndex:
+    """
+    Open map × team × side slots of one match at one ban generation. Not changed
+    once published: a ban derives the next generation's index from it, so
+    snapshots can keep the one they were taken with.
+    """
+    __slots__ = ("open", "per_map", "per_map_side", "generation", "map_names", "_maps")
+
+    def __init__(self, data: Match, generation: int):
+        self.open: set[Tuple[str, str, str]] = set()
+        self.per_map: Counter = Counter()
+        self.per_map_side: Counter = Counter()
+        self.generation = generation
+        self._maps: Optional[List[str]] = None
+
+        # One full scan; afterwards only ban events touch the index
+        for m, mask in data.map_bans.items():
+            for team_key in TEAM_KEYS:
+                for side in events.SIDES:
+                    if not mask & (bit(team_key, side) | bit(team_key, side, auto=True)):
+                        self._add(m, team_key, side)
+        # Every map of the match, open or not, for the autocomplete index
+        self.map_names: Tuple[str, ...] = tuple(sorted(data.map_bans))
+
+    def _add(self, m: str, team_key: str, side: str) -> None:
+        self.open.add((m, team_key, side))
+        self.per_map[m] += 1
+        self.per_map_side[m, side] += 1
+
+    def copy(self) -> "ComboIndex":
+        other = ComboIndex.__new__(ComboIndex)
+        other.open = set(self.open)
+        other.per_map = self.per_map.copy()
+        other.per_map_side = self.per_map_side.copy()
+        other.generation = self.generation
+        other.map_names = self.map_names
+        other._maps = self._maps
+        return other
+
+    def close(self, m: str, team_key: str, side: str) -> None:
+        slot = (m, team_key, side)
+        if slot not in self.open:
+            return
+        self.open.remove(slot)
+        self.per_map[m] -= 1
+        self.per_map_side[m, side] -= 1
+        if not self.per_map[m]:
+            del self.per_map[m]
+            self._maps = None
+        if not self.per_map_side[m, side]:
+            del self.per_map_side[m, side]
+
+    def apply(self, event: dict) -> None:
+        if event["event"] != events.BAN_RECORDED:
+            return
+        team_key = event["team_key"]
+        other_key = "team_b" if team_key == "team_a" else "team_a"
+        side = event["side"]
+        opp_side = "Axis" if side == "Allied" else "Allied"
+        self.close(event["map"], team_key, side)
+        self.close(event["map"], other_key, opp_side)
+
+    def is_open(self, m: str, side: str) -> bool:
+        """True if either team still has this map/side open."""
+        return (m, side) in self.per_map_side
+
+    def remaining(self) -> int:
+        return len(self.open)
+
+    def maps(self) -> List[str]:
+        """Sorted names of maps with at least one open slot."""
+        if self._maps is None:
+            self._maps = sorted(self.per_map)
+        return self._maps
+
+    def combos(self) -> List[Tuple[str, str, str]]:
+        return sorted(self.open)
+
+
+_indexes: dict[int, ComboIndex] = {}
+
+
+def combo_index(channel_id: int) -> ComboIndex:
+    """
+    The channel's index for its current bans, rebuilt only if they changed
+    outside a ban event. Treat it as read-only.
+    """
+    gen = state.ban_generation(channel_id)
+    idx = _indexes.get(channel_id)
+    if idx is None or idx.generation != gen:
+        with metrics.timed("remaining_combos"):
+            idx = ComboIndex(state.ongoing_events.get(channel_id) or Match(), gen)
+        _indexes[channel_id] = idx
+    return idx
+
+def _on_event(channel_id: int, event: dict) -> None:
+    idx = _indexes.get(channel_id)
+    if idx is None:
+        return
+    gen = state.ban_generation(channel_id)
+    if idx.generation == gen:
+        # Not a ban; the index is unaffected
+        return
+    if idx.generation == gen - 1:
+        idx = _indexes[channel_id] = idx.copy()
+        idx.apply(event)
+        idx.generation = gen
+    else:
+        del _indexes[channel_id]
+
+def _on_evict(channel_id: int) -> None:
+    _indexes.pop(channel_id, None)
+
+
+state.add_listener(_on_event, _on_evict)
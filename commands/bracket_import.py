@@ -0,0 +1,35 @@
+import io
+import discord
+from discord import app_commands
+import metrics
+import bracket
+
+# Longer reports are attached as a text file
+_INLINE_MAX = 1900
+
+@app_commands.command(name="bracket_import",description="Create matches in bulk from a CSV/JSON bracket")
+@app_commands.describe(
+    file="CSV or JSON with channel, role_a, role_b and optional time columns",
+    overwrite="Replace matches that already exist in those channels"
+)
+@app_commands.default_permissions(manage_channels=True)
+@app_commands.guild_only()
+@metrics.command
+async def bracket_import(interaction: discord.Interaction, file: discord.Attachment, overwrite: bool = False):
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    try:
+        rows = bracket.parse((await file.read()).decode("utf-8"), file.filename)
+    except UnicodeDecodeError:
+        return await interaction.followup.send("❌ The bracket file must be UTF-8 text.", ephemeral=True)
+    except bracket.BracketError as e:
+        return await interaction.followup.send(f"❌ {e}", ephemeral=True)
+
+    report = await bracket.import_bracket(interaction.guild, rows, overwrite=overwrite)
+    summary = report.summary()
+    if len(summary) <= _INLINE_MAX:
+        return await interaction.followup.send(summary, ephemeral=True)
+    await interaction.followup.send(
+        summary.split("\n", 1)[0],
+        file=discord.File(io.BytesIO(summary.encode()), filename="bracket_report.txt"),
+        ephemeral=True
+    )
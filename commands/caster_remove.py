@@ -2,27 +2,28 @@ from typing import Optional
 import discord
 from discord import app_commands
 import state
-from helpers import update_casters_embed
+import metrics
+import actors
+import events
+from helpers import refresh_status_embed
 
 @app_commands.command(name="caster_remove",description="Remove a link from the match")
 @app_commands.describe(member="Which link to remove")
+@metrics.command
+@actors.serialized(defer=True, ephemeral=True)
 async def caster_remove(interaction: discord.Interaction,member: str):
     channel_id = interaction.channel.id
-    await state.load_state(channel_id)
-    ongoing = state.ongoing_events.setdefault(channel_id, {})
-    casters = ongoing.get("casters")
+    ongoing = await state.ensure_loaded(channel_id, interaction.guild_id)
+    casters = ongoing.casters
     if casters is None:
         casters = []
-        ongoing["casters"] = casters
+        ongoing.casters = casters
         
     if member not in casters:
-        return await interaction.response.send_message(f"❌ {member} isn't in the casters list.",ephemeral=True,delete_after=15)
+        return await interaction.followup.send(f"❌ {member} isn't in the casters list.", ephemeral=True)
 
-    casters.remove(member)
-    await state.save_state(channel_id)
+    await state.record_event(channel_id, events.CASTER_REMOVED, caster=member)
 
-    await interaction.response.send_message(f"🗑️ Removed {member} from casters.",ephemeral=True,delete_after=15)
+    await interaction.followup.send(f"🗑️ Removed {member} from casters.", ephemeral=True)
 
-    embed_id = ongoing.get("embed_message_id")
-    if embed_id:
-        await update_casters_embed(interaction.channel, embed_id, casters)
\ No newline at end of file
+    await refresh_status_embed(interaction.channel, ongoing)
\ No newline at end of file
@@ -1,16 +1,32 @@
-import os
+import logging
 import discord
 from discord import app_commands
 import state
+import metrics
+import actors
+import archive
+import reminders
+from helpers import delete_later
+
+logger = logging.getLogger(__name__)
 
 @app_commands.command(name="cleanup_match")
+@metrics.command
+@actors.serialized(defer=True)
 async def cleanup_match(interaction: discord.Interaction):
-    """Clear match state and delete its file."""
+    """Archive the match, then clear its state and delete its file."""
     channel_id = interaction.channel.id
-    await state.load_state(channel_id)
-    state.ongoing_events.pop(channel_id, None)
-    try:
-        os.remove(state._state_file(channel_id))
-    except FileNotFoundError:
-        pass
-    await interaction.response.send_message("Match state cleaned up.",delete_after=15)
\ No newline at end of file
+    data = await state.ensure_loaded(channel_id, interaction.guild_id)
+    if data.teams:
+        try:
+            await archive.archive_match(data, interaction.guild_id, channel_id)
+        except Exception:
+            # Keep the live state so the cleanup can be retried
+            logger.exception("Archiving match in channel %s failed", channel_id)
+            await interaction.followup.send(
+                "❌ Could not archive the match; state was kept.")
+            return
+    await state.delete_state(channel_id, interaction.guild_id)
+    reminders.cancel(channel_id)
+    msg = await interaction.followup.send("Match state cleaned up.", wait=True)
+    delete_later(msg, 15)
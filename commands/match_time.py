@@ -1,7 +1,11 @@
 import discord
 from discord import app_commands
 import state
-from helpers import format_timestamp, update_mt_embed
+import metrics
+import actors
+import events
+import reminders
+from helpers import format_timestamp, refresh_status_embed
 from dateutil.parser import isoparse
 from datetime import timezone
 from datetime import datetime
@@ -13,25 +17,23 @@ from datetime import datetime
 @app_commands.describe(
     time="ISO-8601 datetime WITH timezone, e.g. 2025-05-21T18:00:00-04:00"
 )
+@metrics.command
+@actors.serialized(defer=True, ephemeral=True)
 async def match_time(
     interaction: discord.Interaction,
     time: str
 ) -> None:
     channel_id = interaction.channel.id
-    await state.load_state(channel_id)
-    ongoing = state.ongoing_events.get(channel_id, {})
-    team_roles = ongoing.get("teams", [])
+    ongoing = await state.ensure_loaded(channel_id, interaction.guild_id)
+    team_roles = ongoing.teams
 
     # ─── Permission check ────────────────────────────────────────
     # ensure the caller has one of those team roles
     if not any(r.id in team_roles for r in interaction.user.roles):
-        return await interaction.response.send_message(
+        return await interaction.followup.send(
             "❌ You can’t set the match time.", ephemeral=True
         )
 
-    # ─── Defer so we can follow up multiple times ─────────────────
-    await interaction.response.defer(ephemeral=True)
-
     # ─── Parse the ISO-8601 timestamp into UTC ────────────────────
     try:
         dt = isoparse(time).astimezone(timezone.utc)
@@ -42,19 +44,15 @@ async def match_time(
         )
 
     # ─── Store and update the embed ───────────────────────────────
-    ongoing["scheduled_time"] = dt.isoformat()
-    await state.save_state(channel_id)
+    await state.record_event(channel_id, events.TIME_SET, scheduled_time=dt.isoformat())
+    upcoming = reminders.schedule(channel_id, interaction.guild_id, ongoing.match_id, ongoing.scheduled_time)
 
-    embed_msg_id = ongoing.get("embed_message_id")
-    if embed_msg_id:
-        await update_mt_embed(
-            interaction.channel,
-            embed_msg_id,
-            dt.isoformat()
-        )
+    await refresh_status_embed(interaction.channel, ongoing)
 
     # ─── Final confirmation ────────────────────────────────────────
     human = dt.strftime("%Y-%m-%d %H:%M UTC")
     await interaction.followup.send(
-        f"🕒 Match time set to **{human}** (UTC)", ephemeral=True
+        f"🕒 Match time set to **{human}** (UTC)"
+        + (f", {upcoming} reminder{'s' if upcoming != 1 else ''} scheduled." if upcoming else ""),
+        ephemeral=True
     )
\ No newline at end of file
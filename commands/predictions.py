@@ -0,0 +1,19 @@
+import discord
+from discord import app_commands
+import metrics
+import actors
+import polls
+from embeds import prediction_lines
+
+@app_commands.command(name="predictions", description="Show the live winner prediction totals")
+@metrics.command
+async def predictions(interaction: discord.Interaction):
+    ongoing = await actors.read(interaction.channel.id, interaction.guild_id)
+    counts = polls.totals(ongoing)
+    if counts is None:
+        return await interaction.response.send_message(
+            "❌ There is no prediction poll in this channel yet.", ephemeral=True, delete_after=15)
+    names = ongoing.team_names or [f"<@&{t}>" for t in ongoing.teams]
+    await interaction.response.send_message(
+        f"**Winner Predictions** ({sum(counts)} votes)\n" + prediction_lines(names, counts),
+        ephemeral=True)
@@ -1,8 +1,10 @@
-import datetime
 import discord
 from discord import app_commands
 import state
-from helpers import update_ban_mode_choice_embed, flip_turn, update_current_turn_embed
+import metrics
+import actors
+import events
+from helpers import flip_turn, refresh_status_embed
 
 @app_commands.command(name="select_ban_mode")
 @app_commands.describe(option="Choose ban mode: final or double")
@@ -10,20 +12,21 @@ from helpers import update_ban_mode_choice_embed, flip_turn, update_current_turn
     app_commands.Choice(name="Final Ban Mode - You pick the final ban but go second.  Other team will pick first twice.", value="Final"),
     app_commands.Choice(name="Double Ban Mode - You pick the first two bans.  Other team will pick the final ban.", value="Double"),
 ])
+@metrics.command
+@actors.serialized(defer=True, ephemeral=True)
 async def select_ban_mode(interaction: discord.Interaction, option: str):
     """Select ban mode after coin flip."""
     channel_id = interaction.channel.id
-    await state.load_state(channel_id)
-    ongoing = state.ongoing_events.setdefault(channel_id, {})
+    ongoing = await state.ensure_loaded(channel_id, interaction.guild_id)
     
     # ─── Prevent re-selection ───────────────────────────────────────────
-    choice_data = ongoing.get("ban_mode")
+    choice_data = ongoing.ban_mode
     if (choice_data is not None):
-        await interaction.response.send_message(f"❌ Ban mode is already set.",ephemeral=True,delete_after=15)
+        await interaction.followup.send(f"❌ Ban mode is already set.", ephemeral=True)
         return
     # Determine whose turn it is
-    turn_idx = ongoing["current_turn_index"]
-    team_roles = ongoing["teams"]
+    turn_idx = ongoing.current_turn_index
+    team_roles = ongoing.teams
     turn_id = team_roles[turn_idx]
     other_idx = team_roles[0]
     if turn_idx == team_roles[0]:
@@ -31,22 +34,13 @@ async def select_ban_mode(interaction: discord.Interaction, option: str):
 
     # Check if the invoking user has that role
     if turn_id not in [r.id for r in interaction.user.roles]:
-        await interaction.response.send_message(f"❌ You can’t do that right now.",ephemeral=True,delete_after=15)
+        await interaction.followup.send(f"❌ You can’t do that right now.", ephemeral=True)
         return
         
-    ongoing["ban_mode"] = {
-        "chosen_option": option,
-        "chosen_by": interaction.user.id,
-        "timestamp": datetime.datetime.utcnow().isoformat() + 'Z'
-    }
+    await state.record_event(channel_id, events.BAN_MODE_CHOSEN, option=option, chosen_by=interaction.user.id, team_index=turn_idx)
     
-    await update_ban_mode_choice_embed(interaction.channel,ongoing["embed_message_id"],option)
     if option == "Final":
-        new_turn = await flip_turn(channel_id)
-        embed_msg_id = ongoing.get("embed_message_id")
-        await update_current_turn_embed(interaction.channel, embed_msg_id, new_turn)
-        await state.save_state(channel_id)
-        
+        await flip_turn(channel_id)
     
-    await state.save_state(channel_id)
-    await interaction.response.send_message(f"✅ Option '{option}' recorded.", ephemeral=True,delete_after=15)
\ No newline at end of file
+    await refresh_status_embed(interaction.channel, ongoing)
+    await interaction.followup.send(f"✅ Option '{option}' recorded.", ephemeral=True)
\ No newline at end of file
@@ -1,11 +1,15 @@
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
-from PIL import ImageFont
 
 load_dotenv()
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
-if not DISCORD_TOKEN:
-    raise RuntimeError("DISCORD_TOKEN not set in environment")
+
+def require_token() -> str:
+    """The bot token; checked when the bot runs, so importing config never fails."""
+    if not DISCORD_TOKEN:
+        raise RuntimeError("DISCORD_TOKEN not set in environment")
+    return DISCORD_TOKEN
 
 CONFIG = {
     "font_paths": [
@@ -16,8 +20,10 @@ CONFIG = {
     "font_size": 18,
 }
 
-# Preload fonts once
+# Fonts load on first use, not at import
+@lru_cache(maxsize=1)
 def load_fonts():
+    from PIL import ImageFont
     for path in CONFIG["font_paths"]:
         if os.path.isfile(path):
             return (
@@ -26,4 +32,10 @@ def load_fonts():
             )
     raise FileNotFoundError(f"No valid font found in {CONFIG['font_paths']}")
 
-HDR_FONT, ROW_FONT = load_fonts()
\ No newline at end of file
+def __getattr__(name):
+    # config.HDR_FONT / config.ROW_FONT still work, loading the fonts then
+    if name == "HDR_FONT":
+        return load_fonts()[0]
+    if name == "ROW_FONT":
+        return load_fonts()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
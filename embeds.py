@@ -0,0 +1,279 @@
+from datetime import datetime, timezone
+from typing import List, Optional, Union
+
+import discord
+
+import state
+import events
+import outbound
+from model import Match
+
+# Last embed pushed to each channel's status message, as Embed.to_dict(),
+# and a handle to that message so edits never need a fetch_message first
+_last_pushed: dict[int, dict] = {}
+_handles: dict[int, Union[discord.Message, discord.PartialMessage]] = {}
+
+# Discord's limits for one embed
+FIELD_VALUE_MAX = 1024
+EMBED_CHARS_MAX = 6000
+EMBED_FIELDS_MAX = 25
+
+
+def chunk_history_lines(lines: List[str], max_chars: int = 1024) -> List[str]:
+    chunks: List[str] = []
+    current = ""
+    for line in lines:
+        # +1 for the newline
+        if current and len(current) + len(line) + 1 > max_chars:
+            chunks.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current:
+        chunks.append(current)
+    return chunks
+
+def format_timestamp(ts: str) -> str:
+    dt = datetime.fromisoformat(ts)
+    return dt.strftime("%Y-%m-%d %H:%M:%S UTC")
+
+def _role(role_id) -> str:
+    return f"<@&{role_id}>"
+
+def _chooser(data: Match, event: dict) -> str:
+    teams = data.teams
+    idx = event.get("team_index")
+    if idx is not None and idx < len(teams):
+        return _role(teams[idx])
+    return f"<@{event['chosen_by']}>"
+
+def history_line(data: Match, event: dict) -> Optional[str]:
+    """The Update History line for one event, or None if it isn't shown."""
+    kind = event.get("event")
+    teams = data.teams or [0, 0]
+    if kind == events.COIN_FLIPPED:
+        return f"Coinflip winner: {_role(event['winner'])}"
+    if kind in (events.HOST_CHOSEN, events.BAN_MODE_CHOSEN):
+        return f"{_chooser(data, event)} choice: {event['option']}"
+    if kind == events.BAN_RECORDED:
+        team = teams[0] if event["team_key"] == "team_a" else teams[1]
+        label = "Double ban" if event.get("double") else "Ban"
+        return (f"{_role(team)} choice: {label}: {event['map']} {event['side']} "
+                f"at {format_timestamp(event['timestamp'])}")
+    if kind == "note":
+        return event.get("text")
+    return None
+
+def history_lines(data: Match) -> List[str]:
+    return [line for line in (history_line(data, e) for e in data.update_history) if line]
+
+
+class HistoryChunks:
+    """
+    A match's Update History packed into field-sized chunks, as
+    chunk_history_lines() would, but extended in place: a new event only
+    renders its own line and touches the last chunk.
+    """
+    __slots__ = ("source", "seen", "chunks")
+
+    def __init__(self):
+        self.source: Optional[list] = None
+        self.seen = 0
+        self.chunks: List[str] = []
+
+    def update(self, data: Match) -> List[str]:
+        history = data.update_history
+        # A reload or a new match replaces the list; start over
+        if history is not self.source or len(history) < self.seen:
+            self.source, self.seen, self.chunks = history, 0, []
+        for event in history[self.seen:]:
+            line = history_line(data, event)
+            if line:
+                self._append(line)
+        self.seen = len(history)
+        return self.chunks
+
+    def _append(self, line: str) -> None:
+        if self.chunks and len(self.chunks[-1]) + len(line) + 1 <= FIELD_VALUE_MAX:
+            self.chunks[-1] = f"{self.chunks[-1]}\n{line}"
+        else:
+            self.chunks.append(line[:FIELD_VALUE_MAX])
+
+_history: dict[int, HistoryChunks] = {}
+
+def _history_name(i: int) -> str:
+    return "Update History" if i == 1 else f"Update History ({i})"
+
+def _add_history(embed: discord.Embed, at: int, chunks: List[str]) -> None:
+    """
+    Insert the history fields at position `at`, keeping the embed within
+    Discord's character and field limits: when they don't all fit, the oldest
+    chunks are replaced by a one-line summary.
+    """
+    budget = EMBED_CHARS_MAX - len(embed)
+    slots = EMBED_FIELDS_MAX - len(embed.fields)
+    total = sum(len(_history_name(i)) + len(c) for i, c in enumerate(chunks, start=1))
+    if total <= budget and len(chunks) <= slots:
+        for i, chunk in enumerate(chunks, start=1):
+            embed.insert_field_at(at + i - 1, name=_history_name(i), value=chunk, inline=False)
+        return
+    # Newest chunks first until the budget runs out, leaving room for the summary
+    summary_name, summary_max = "Update History", 64
+    budget -= len(summary_name) + summary_max
+    slots -= 1
+    kept: List[tuple[int, str]] = []
+    for i in range(len(chunks), 0, -1):
+        cost = len(_history_name(i)) + len(chunks[i - 1])
+        if cost > budget or not slots:
+            break
+        kept.append((i, chunks[i - 1]))
+        budget -= cost
+        slots -= 1
+    kept.reverse()
+    hidden = sum(c.count("\n") + 1 for c in chunks[:len(chunks) - len(kept)])
+    embed.insert_field_at(at, name=summary_name,
+                          value=f"… {hidden} earlier updates not shown", inline=False)
+    for n, (i, chunk) in enumerate(kept, start=1):
+        embed.insert_field_at(at + n, name=_history_name(i), value=chunk, inline=False)
+
+def prediction_lines(names: List[str], counts) -> str:
+    total = sum(counts)
+    return "\n".join(
+        f"{emoji} **{name}**: {n}" + (f" ({n * 100 // total}%)" if total else "")
+        for emoji, name, n in zip(("🇦", "🇧"), names, counts))
+
+def next_step(data: Match) -> str:
+    teams = data.teams
+    ct = _role(teams[data.current_turn_index]) if teams else "TBD"
+    if data.finalbanpost:
+        if (data.scheduled_time or "TBD") == "TBD":
+            return "Set match time and casters"
+        return "Current turn role: Add Casters"
+    if data.ban_mode is None:
+        if data.host_mode_rules == "Ban":
+            return f"{ct}: select_ban_mode"
+        return f"{ct}: select_host_mode"
+    return f"{ct}: ban_map"
+
+def build_status_embed(data: Match, channel_id: Optional[int] = None) -> discord.Embed:
+    """
+    Render the whole match status embed from match state. With a channel_id
+    the history chunks are kept between calls and only extended.
+    """
+    teams = data.teams or [0, 0]
+    names = data.team_names or [_role(t) for t in teams]
+    regions = data.regions or {}
+
+    embed = discord.Embed(title="Match Status", color=discord.Color.blue())
+    embed.add_field(name="Teams", value=f"{_role(teams[0])} vs {_role(teams[1])}", inline=True)
+    embed.add_field(name="Team Regions",
+                    value=(f"{names[0]}: {regions.get('team_a', 'Unknown')}\n"
+                           f"{names[1]}: {regions.get('team_b', 'Unknown')}"),
+                    inline=True)
+    winner = (data.coin_flip or {}).get("winner")
+    embed.add_field(name="Coin Flip Winner", value=_role(winner) if winner else "TBD", inline=True)
+
+    rules = data.host_mode_rules
+    if rules is None and isinstance(data.host_or_ban_choice, str):
+        rules = data.host_or_ban_choice
+    embed.add_field(name="Host Mode Rules", value=f"{rules or 'TBD'}", inline=False)
+
+    ban_mode = data.ban_mode
+    if isinstance(ban_mode, dict):
+        ban_mode = ban_mode.get("chosen_option")
+    embed.add_field(name="Ban Mode", value=ban_mode or "TBD", inline=True)
+
+    host_team = data.host_team
+    host = _role(host_team) if host_team else (data.host_role or "TBD")
+    embed.add_field(name="Host", value=f"{host}", inline=True)
+
+    scheduled = data.scheduled_time or "TBD"
+    if scheduled != "TBD":
+        # Discord timestamp markup renders in each viewer's timezone
+        unix_sec = int(datetime.fromisoformat(scheduled).astimezone(timezone.utc).timestamp())
+        scheduled = f"<t:{unix_sec}:F>"
+    embed.add_field(name="Scheduled Time", value=scheduled, inline=False)
+
+    casters = data.casters
+    if casters is None:
+        caster_val = "TBD"
+    else:
+        caster_val = " ".join(f"{c}" for c in casters) if casters else "_None_"
+    embed.add_field(name="Casters", value=caster_val, inline=False)
+
+    if channel_id is None:
+        chunks = HistoryChunks().update(data)
+    else:
+        chunks = _history.setdefault(channel_id, HistoryChunks()).update(data)
+    history_at = len(embed.fields)
+
+    if teams:
+        embed.add_field(name="Current Turn:",
+                        value=_role(teams[data.current_turn_index]), inline=False)
+    embed.add_field(name="Next Step:", value=next_step(data), inline=False)
+
+    final = data.final
+    if final:
+        embed.add_field(name="Final Map",
+                        value=(f"**{final['map']}**  •  "
+                               f"{names[0]}: {final['sides']['team_a']}  |  "
+                               f"{names[1]}: {final['sides']['team_b']}"),
+                        inline=True)
+    elif data.has_bans():
+        embed.add_field(name="Remaining Maps", value="See chart below", inline=False)
+    if data.poll_msg_id:
+        embed.add_field(name="Winner Predictions",
+                        value=prediction_lines(names, data.poll_totals()), inline=False)
+    _add_history(embed, history_at, chunks)
+    return embed
+
+def status_message(
+    channel: discord.TextChannel,
+    message_id: int
+) -> Union[discord.Message, discord.PartialMessage]:
+    """Cached handle to a channel's status message, built without an API call."""
+    handle = _handles.get(channel.id)
+    if handle is None or handle.id != message_id:
+        handle = channel.get_partial_message(message_id)
+        _handles[channel.id] = handle
+    return handle
+
+async def send_status_embed(channel: discord.TextChannel, data: Match) -> discord.Message:
+    """Post a new status message for a match and remember it."""
+    embed = build_status_embed(data, channel.id)
+    msg = await outbound.send(channel, embed=embed)
+    data.embed_message_id = msg.id
+    _handles[channel.id] = msg
+    _last_pushed[channel.id] = embed.to_dict()
+    await state.save_state(channel.id)
+    return msg
+
+async def refresh_status_embed(channel: discord.TextChannel, data: Match) -> bool:
+    """
+    Re-render the status embed from state and push it with a single edit.
+    Returns False without any request when nothing visible changed.
+    """
+    message_id = data.embed_message_id
+    if not message_id:
+        return False
+    embed = build_status_embed(data, channel.id)
+    rendered = embed.to_dict()
+    if _last_pushed.get(channel.id) == rendered:
+        return False
+    try:
+        await outbound.edit(status_message(channel, message_id), embed=embed)
+    except discord.NotFound:
+        # The status message was deleted; post a fresh one instead
+        forget(channel.id)
+        await send_status_embed(channel, data)
+        return True
+    _last_pushed[channel.id] = rendered
+    return True
+
+def forget(channel_id: int) -> None:
+    _last_pushed.pop(channel_id, None)
+    _handles.pop(channel_id, None)
+    _history.pop(channel_id, None)
+
+
+state.add_listener(lambda channel_id, event: None, forget)
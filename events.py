@@ -0,0 +1,101 @@
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from model import Match
+
+# Typed match events. Each one is appended to the channel's journal and
+# folded into the in-memory state by apply_event().
+COIN_FLIPPED = "coin_flipped"
+BAN_RECORDED = "ban_recorded"
+TURN_FLIPPED = "turn_flipped"
+BAN_MODE_CHOSEN = "ban_mode_chosen"
+HOST_CHOSEN = "host_chosen"
+TIME_SET = "time_set"
+CASTER_ADDED = "caster_added"
+CASTER_REMOVED = "caster_removed"
+GRID_POSTED = "grid_posted"
+
+SIDES = ("Allied", "Axis")
+
+
+def make_event(event_type: str, seq: int, timestamp: Optional[str] = None, **fields) -> dict:
+    return {
+        "seq": seq,
+        "event": event_type,
+        "timestamp": timestamp or datetime.utcnow().isoformat() + "Z",
+        **fields,
+    }
+
+def apply_event(data: "Match", event: dict) -> None:
+    """Fold one event into a channel's match state."""
+    kind = event["event"]
+
+    if kind == COIN_FLIPPED:
+        data.coin_flip = {
+            "winner": event["winner"],
+            "loser": event["loser"],
+            "timestamp": event["timestamp"],
+        }
+        data.current_turn_index = event["turn_index"]
+
+    elif kind == BAN_RECORDED:
+        team_key = event["team_key"]
+        other_key = "team_b" if team_key == "team_a" else "team_a"
+        side = event["side"]
+        opp_side = "Axis" if side == "Allied" else "Allied"
+        data.ban(event["map"], team_key, side)
+        # mirror-ban the opposite side for the other team
+        data.ban(event["map"], other_key, opp_side, auto=True)
+        data.firstban = False
+
+    elif kind == TURN_FLIPPED:
+        data.current_turn_index = event["new_turn_index"]
+
+    elif kind == BAN_MODE_CHOSEN:
+        data.ban_mode = {
+            "chosen_option": event["option"],
+            "chosen_by": event["chosen_by"],
+            "timestamp": event["timestamp"],
+        }
+
+    elif kind == HOST_CHOSEN:
+        data.host_or_ban_choice = {
+            "chosen_option": event["option"],
+            "chosen_by": event["chosen_by"],
+            "timestamp": event["timestamp"],
+        }
+        data.ban_mode = "Final"
+        data.firstban = False
+        if event["option"] == "Host":
+            data.host_role = event["chosen_by"]
+        # The chooser's team hosts on "Host", the other team on "Ban"
+        teams = data.teams
+        idx = event.get("team_index")
+        if idx is not None and len(teams) == 2:
+            data.host_team = teams[idx] if event["option"] == "Host" else teams[1 - idx]
+
+    elif kind == TIME_SET:
+        data.scheduled_time = event["scheduled_time"]
+
+    elif kind == CASTER_ADDED:
+        casters = data.casters
+        if casters is None:
+            casters = []
+        if event["caster"] not in casters:
+            casters.append(event["caster"])
+        data.casters = casters
+
+    elif kind == CASTER_REMOVED:
+        casters = data.casters
+        if casters is None:
+            casters = []
+        if event["caster"] in casters:
+            casters.remove(event["caster"])
+        data.casters = casters
+
+    elif kind == GRID_POSTED:
+        data.grid_msg_id = event["message_id"]
+
+    data.update_history.append(event)
+    data.journal_seq = event["seq"]
@@ -1,8 +1,18 @@
+import os
+import json
+import hashlib
+import logging
 import discord
 from discord import app_commands
-from discord.app_commands import Choice
-from config import DISCORD_TOKEN
+from config import require_token
 import state
+import registry
+import render
+import metrics
+import shards
+import scheduler
+import polls
+from storage import STATE_DIR
 # Import command handlers to register them
 import commands.match_create
 import commands.select_host_mode
@@ -12,10 +22,41 @@ import commands.match_time
 import commands.cleanup_match
 import commands.caster_add
 import commands.caster_remove
+import commands.bracket_import
+import commands.predictions
 
 intents = discord.Intents.default()
 intents.message_content = True
-bot = discord.Client(intents=intents)
+
+# SHARD_COUNT/SHARD_AUTO switch to an AutoShardedClient; see shards.py
+_Base = discord.AutoShardedClient if shards.SHARDED else discord.Client
+
+logger = logging.getLogger(__name__)
+
+# Hash of the last command schemas pushed to Discord; delete it to force a sync
+TREE_HASH_PATH = os.path.join(STATE_DIR, "command_tree.sha256")
+
+class MapBanClient(_Base):
+    async def setup_hook(self):
+        # Runs once per process, before the first connect; reconnects skip it
+        if shards.is_primary():
+            await sync_tree_if_changed()
+        # Pick up maplist/teammap edits without a restart
+        registry.start_watching()
+        # Prometheus text on localhost when METRICS_PORT is set
+        await metrics.start_server()
+
+    async def close(self):
+        # Flush any write-behind state before the loop goes away
+        await polls.flush_all()
+        await state.flush_all()
+        state.close_backend()
+        scheduler.close()
+        render.shutdown()
+        metrics.stop_server()
+        await super().close()
+
+bot = MapBanClient(intents=intents, **(shards.client_kwargs() if shards.SHARDED else {}))
 tree = app_commands.CommandTree(bot)
 
 # Register commands
@@ -27,6 +68,8 @@ from commands.match_time import match_time
 from commands.cleanup_match import cleanup_match
 from commands.caster_add import caster_add
 from commands.caster_remove import caster_remove
+from commands.bracket_import import bracket_import
+from commands.predictions import predictions
 
 tree.add_command(match_create)
 tree.add_command(select_host_mode)
@@ -36,15 +79,61 @@ tree.add_command(match_time)
 tree.add_command(cleanup_match)
 tree.add_command(caster_add)
 tree.add_command(caster_remove)
-        
+tree.add_command(bracket_import)
+tree.add_command(predictions)
+
+def tree_hash() -> str:
+    """Hash of every command's schema as it would be sent to Discord."""
+    schemas = sorted((c.to_dict(tree) for c in tree.get_commands()), key=lambda c: c["name"])
+    payload = json.dumps([bot.application_id, schemas], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+async def sync_tree_if_changed() -> None:
+    """Push the command tree only when its schemas changed since the last sync."""
+    digest = tree_hash()
+    try:
+        with open(TREE_HASH_PATH) as f:
+            if f.read().strip() == digest:
+                logger.info("Command tree unchanged; skipping sync")
+                return
+    except FileNotFoundError:
+        pass
+    await tree.sync()
+    os.makedirs(os.path.dirname(TREE_HASH_PATH), exist_ok=True)
+    tmp = TREE_HASH_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(digest)
+    os.replace(tmp, TREE_HASH_PATH)
+    logger.info("Command tree synced")
+
+_started = False
+
 @bot.event
 async def on_ready():
-    await tree.sync()
-    # Load persisted state for all channels
-    for path in state.list_state_files():
-        channel_id = int(path.split('_')[1].split('.')[0])
-        await state.load_state(channel_id)
+    # Also fires after every gateway reconnect; only the first one starts things up
+    global _started
+    if _started:
+        return
+    _started = True
+    # Resume delayed deletions left over from before a restart
+    await scheduler.start(bot.get_channel)
+    # Match state is hydrated lazily on first touch; optionally warm the active ones
+    if state.WARM_START:
+        await state.warm_start()
     print("Bot is ready.")
+
+# Prediction votes come from raw events, which also cover uncached messages
+@bot.event
+async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
+    if bot.user is not None and payload.user_id == bot.user.id:
+        return
+    await polls.on_reaction_add(payload, bot.get_channel(payload.channel_id))
+
+@bot.event
+async def on_raw_reaction_remove(payload: discord.RawReactionActionEvent):
+    if bot.user is not None and payload.user_id == bot.user.id:
+        return
+    await polls.on_reaction_remove(payload, bot.get_channel(payload.channel_id))
         
 if __name__ == "__main__":
-    bot.run(DISCORD_TOKEN)
\ No newline at end of file
+    bot.run(require_token())
\ No newline at end of file
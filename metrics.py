@@ -0,0 +1,170 @@
+import os
+import time
+import asyncio
+import functools
+import logging
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Prometheus text endpoint; METRICS_PORT=0 (the default) leaves it off
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Latency buckets in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        # label tuple -> [bucket counts..., sum, count]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * len(BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def expose(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, series in sorted(self._series.items()):
+            for bound, n in zip(BUCKETS, series):
+                yield f"{self.name}_bucket{_labels(key + (('le', bound),))} {n}"
+            yield f"{self.name}_bucket{_labels(key + (('le', '+Inf'),))} {series[-1]}"
+            yield f"{self.name}_sum{_labels(key)} {series[-2]}"
+            yield f"{self.name}_count{_labels(key)} {series[-1]}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def expose(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(key)} {value}"
+
+
+command_seconds = Histogram("mapban_command_seconds", "Slash command handler latency")
+phase_seconds = Histogram("mapban_phase_seconds", "Latency of phases inside command handlers")
+command_errors = Counter("mapban_command_errors_total", "Exceptions raised out of command handlers")
+discord_errors = Counter("mapban_discord_errors_total", "Failed Discord requests by HTTP status")
+lock_waits = Counter("mapban_lock_waits_total", "Times a match lock was already held when requested")
+# Unlabelled, so expose it from the start rather than after the first wait
+lock_waits.inc(0)
+
+_metrics = [command_seconds, phase_seconds, command_errors, discord_errors, lock_waits]
+# name -> (help, callable returning the current value)
+_gauges: dict[str, tuple[str, Callable[[], float]]] = {}
+_server: Optional[asyncio.AbstractServer] = None
+
+
+def gauge(name: str, help: str, read: Callable[[], float]) -> None:
+    """Register a gauge read at scrape time."""
+    _gauges[name] = (help, read)
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Record how long the enclosed block takes, awaits included."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phase_seconds.observe(time.perf_counter() - start, phase=phase)
+
+def command(func: Callable) -> Callable:
+    """Time a command handler; goes directly above the `async def`."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(interaction, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(interaction, *args, **kwargs)
+        except Exception as e:
+            command_errors.inc(command=name, error=type(e).__name__)
+            raise
+        finally:
+            command_seconds.observe(time.perf_counter() - start, command=name)
+    return wrapper
+
+def discord_error(exc: BaseException) -> None:
+    discord_errors.inc(status=getattr(exc, "status", "none"))
+
+def render() -> str:
+    """All metrics in Prometheus text exposition format."""
+    lines: list[str] = []
+    for metric in _metrics:
+        lines.extend(metric.expose())
+    for name, (help, read) in sorted(_gauges.items()):
+        try:
+            value = read()
+        except Exception:
+            logger.exception("Failed reading gauge %s", name)
+            continue
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+# ─── HTTP endpoint ───────────────────────────────────────────────────
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Drain the headers; the body of a GET is empty
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/", "/metrics"):
+            status, body = "200 OK", render().encode()
+        else:
+            status, body = "404 Not Found", b"not found\n"
+        writer.write(f"HTTP/1.1 {status}\r\n"
+                     "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     "Connection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def start_server() -> None:
+    """Serve /metrics on METRICS_HOST:METRICS_PORT; a no-op if disabled or already running."""
+    global _server
+    if _server is not None or not METRICS_PORT:
+        return
+    _server = await asyncio.start_server(_handle, METRICS_HOST, METRICS_PORT)
+    logger.info("Metrics on http://%s:%d/metrics", METRICS_HOST, METRICS_PORT)
+
+def stop_server() -> None:
+    global _server
+    if _server is not None:
+        _server.close()
+        _server = None
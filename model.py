@@ -0,0 +1,197 @@
+"""
+Typed in-memory model of one match.
+
+Metadata lives in __slots__ attributes; the ban state of each map is a single
+int with one bit per team × side × manual/auto (8 bits in all) instead of a
+nested dict of lists. to_wire()/from_wire() give the versioned, compact
+snapshot form; version 1 is the old free-form channel dict, which is still
+read (its map trackers are folded into bitmasks) and is never written.
+"""
+import json
+from typing import Any, Optional, Union
+
+import events
+from events import SIDES
+
+TEAM_KEYS = ("team_a", "team_b")
+
+# What a team × side slot of a map holds
+OPEN, MANUAL, AUTO = 0, 1, 2
+
+WIRE_VERSION = 2
+
+# Bit layout: team_b is the high nibble; in each nibble the low two bits are
+# manual Allied/Axis and the high two auto Allied/Axis
+_TEAM_SHIFT = {"team_a": 0, "team_b": 4}
+_SIDE_BIT = {"Allied": 0, "Axis": 1}
+_AUTO_SHIFT = 2
+
+def bit(team_key: str, side: str, auto: bool = False) -> int:
+    return 1 << (_TEAM_SHIFT[team_key] + (_AUTO_SHIFT if auto else 0) + _SIDE_BIT[side])
+
+def slot(mask: int, team_key: str, side: str) -> int:
+    """OPEN, MANUAL or AUTO for one slot; a manual ban wins over a mirrored one."""
+    if mask & bit(team_key, side):
+        return MANUAL
+    if mask & bit(team_key, side, auto=True):
+        return AUTO
+    return OPEN
+
+# Every mask's row of slot states (team A Allied/Axis, then team B), precomputed
+ROWS: tuple[tuple[int, ...], ...] = tuple(
+    tuple(slot(mask, t, s) for t in TEAM_KEYS for s in SIDES) for mask in range(256))
+
+def _mask_from_tracker(tracker: dict) -> int:
+    mask = 0
+    for team_key in TEAM_KEYS:
+        for side in tracker[team_key].get("manual", []):
+            mask |= bit(team_key, side)
+        for side in tracker[team_key].get("auto", []):
+            mask |= bit(team_key, side, auto=True)
+    return mask
+
+def _is_tracker(value: Any) -> bool:
+    return (isinstance(value, dict)
+            and isinstance(value.get("team_a"), dict)
+            and isinstance(value.get("team_b"), dict))
+
+
+# Attribute → default for a channel without a match; the same names are the wire keys
+_DEFAULTS: dict[str, Any] = {
+    "match_id": None,
+    "created_at": None,
+    "teams": [],
+    "team_names": None,
+    "regions": None,
+    "coin_flip": None,
+    "current_turn_index": 0,
+    "host_or_ban_choice": None,
+    "host_role": None,
+    "host_team": None,
+    "host_mode_rules": None,
+    "ban_mode": None,
+    "scheduled_time": "TBD",
+    "casters": None,
+    "embed_message_id": None,
+    "grid_msg_id": None,
+    "firstban": True,
+    "finalbanpost": False,
+    "final": None,
+    "poll_msg_id": None,
+    "poll_votes": {},
+    "journal_seq": 0,
+}
+
+
+class Match:
+    """One channel's match state. An empty Match stands for "no match here"."""
+    __slots__ = (*_DEFAULTS, "update_history", "map_bans")
+
+    def __init__(self):
+        self.match_id: Optional[str] = None
+        self.created_at: Optional[str] = None
+        self.teams: list[int] = []
+        self.team_names: Optional[list[str]] = None
+        self.regions: Optional[dict[str, str]] = None
+        self.coin_flip: Optional[dict] = None
+        self.current_turn_index: int = 0
+        self.host_or_ban_choice: Union[str, dict, None] = None
+        self.host_role: Union[str, int, None] = None
+        self.host_team: Optional[int] = None
+        self.host_mode_rules: Optional[str] = None
+        self.ban_mode: Union[str, dict, None] = None
+        self.scheduled_time: str = "TBD"
+        self.casters: Optional[list[str]] = None
+        self.embed_message_id: Optional[int] = None
+        self.grid_msg_id: Optional[int] = None
+        self.firstban: bool = True
+        self.finalbanpost: bool = False
+        self.final: Optional[dict] = None
+        # Winner prediction poll message and its votes, user id → 0 (team A) or 1 (team B)
+        self.poll_msg_id: Optional[int] = None
+        self.poll_votes: dict[str, int] = {}
+        self.journal_seq: int = 0
+        # Every event applied so far, oldest first
+        self.update_history: list[dict] = []
+        # Map name → ban bitmask, in map-pool order
+        self.map_bans: dict[str, int] = {}
+
+    # ─── Ban state ───────────────────────────────────────────────────
+    def ban(self, map_name: str, team_key: str, side: str, auto: bool = False) -> None:
+        self.map_bans[map_name] = self.map_bans.get(map_name, 0) | bit(team_key, side, auto)
+
+    def slot(self, map_name: str, team_key: str, side: str) -> int:
+        return slot(self.map_bans.get(map_name, 0), team_key, side)
+
+    def row(self, map_name: str) -> tuple[int, ...]:
+        """Slot states of a map, team A Allied/Axis then team B Allied/Axis."""
+        return ROWS[self.map_bans.get(map_name, 0)]
+
+    @property
+    def bans(self) -> list[dict]:
+        """Recorded bans in order, as {map, side, timestamp}."""
+        return [{"map": e["map"], "side": e["side"], "timestamp": e["timestamp"]}
+                for e in self.update_history if e.get("event") == events.BAN_RECORDED]
+
+    def has_bans(self) -> bool:
+        return any(e.get("event") == events.BAN_RECORDED for e in self.update_history)
+
+    def poll_totals(self) -> tuple[int, int]:
+        a = sum(1 for v in self.poll_votes.values() if v == 0)
+        return a, len(self.poll_votes) - a
+
+    # ─── Copying and serialisation ───────────────────────────────────
+    def replace_with(self, other: "Match") -> None:
+        """Take over another Match's state, so references held elsewhere stay valid."""
+        for name in Match.__slots__:
+            setattr(self, name, getattr(other, name))
+
+    def snapshot(self) -> "Match":
+        """A detached copy; later changes to this match don't reach it."""
+        copy = Match.__new__(Match)
+        for name in Match.__slots__:
+            value = getattr(self, name)
+            if isinstance(value, (list, dict)):
+                value = value.copy()
+            setattr(copy, name, value)
+        return copy
+
+    def to_wire(self) -> dict:
+        """Compact snapshot: version, non-default fields, history and bitmasks."""
+        wire: dict[str, Any] = {"v": WIRE_VERSION}
+        for name, default in _DEFAULTS.items():
+            value = getattr(self, name)
+            if value != default:
+                wire[name] = value
+        wire["update_history"] = self.update_history
+        wire["map_bans"] = self.map_bans
+        return wire
+
+    @classmethod
+    def from_wire(cls, raw: dict) -> "Match":
+        """Read either snapshot version; unknown keys of old files are dropped."""
+        m = cls()
+        version = raw.get("v", 1)
+        if version > WIRE_VERSION:
+            raise ValueError(f"Match snapshot version {version} is newer than this bot ({WIRE_VERSION})")
+        for name in _DEFAULTS:
+            if name in raw:
+                setattr(m, name, raw[name])
+        m.teams = m.teams or []
+        if version >= 2:
+            m.map_bans = {name: int(mask) for name, mask in raw.get("map_bans", {}).items()}
+        else:
+            m.map_bans = {key: _mask_from_tracker(value) for key, value in raw.items() if _is_tracker(value)}
+        history = raw.get("update_history")
+        if isinstance(history, str):
+            # Pre-journal state files stored the coin flip line as plain text
+            history = [{"event": "note", "text": history}]
+        m.update_history = history if isinstance(history, list) else []
+        return m
+
+
+def dumps(match: Match) -> str:
+    return json.dumps(match.to_wire(), separators=(",", ":"))
+
+def loads(text: Union[str, bytes]) -> Match:
+    return Match.from_wire(json.loads(text))
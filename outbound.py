@@ -0,0 +1,188 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+from typing import Any, Callable, Optional
+
+import discord
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Priorities: lower runs first. Interaction responses/follow-ups never go
+# through these queues (they use the interaction webhook, not the channel
+# bucket) so they always go out ahead of queued work.
+HIGH, NORMAL, LOW = 0, 1, 2
+
+# Per-channel token bucket (Discord allows ~5 message writes per 5s per
+# channel) plus one process-wide bucket below the global limit.
+CHANNEL_RATE = float(os.getenv("OUTBOUND_CHANNEL_RATE", "1.0"))
+CHANNEL_BURST = float(os.getenv("OUTBOUND_CHANNEL_BURST", "5"))
+GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "40"))
+WARN_DEPTH = int(os.getenv("OUTBOUND_WARN_DEPTH", "20"))
+
+
+class _Bucket:
+    """Token bucket; acquire() waits until a token is available."""
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def penalise(self, retry_after: float) -> None:
+        """Empty the bucket after a 429 so nothing else goes out early."""
+        self.tokens = -retry_after * self.rate
+        self.updated = time.monotonic()
+
+
+class _Job:
+    __slots__ = ("priority", "seq", "fn", "args", "kwargs", "future", "key", "queued_at")
+
+    def __init__(self, priority: int, fn: Callable, args: tuple, kwargs: dict,
+                 key: Optional[tuple]):
+        self.priority = priority
+        self.seq = next(_seq)
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.key = key
+        self.queued_at = time.perf_counter()
+
+    def __lt__(self, other: "_Job") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _ChannelQueue:
+    __slots__ = ("heap", "bucket", "task")
+
+    def __init__(self):
+        self.heap: list[_Job] = []
+        self.bucket = _Bucket(CHANNEL_RATE, CHANNEL_BURST)
+        self.task: Optional[asyncio.Task] = None
+
+
+_seq = itertools.count()
+_queues: dict[int, _ChannelQueue] = {}
+_global = _Bucket(GLOBAL_RATE, GLOBAL_RATE)
+# Queued (not yet started) edits by (channel_id, message_id), for coalescing
+_pending_edits: dict[tuple, _Job] = {}
+
+
+def queue_depth(channel_id: Optional[int] = None) -> int:
+    """Jobs waiting to be sent, for one channel or across all channels."""
+    if channel_id is not None:
+        q = _queues.get(channel_id)
+        return len(q.heap) if q else 0
+    return sum(len(q.heap) for q in _queues.values())
+
+def _submit(channel_id: int, priority: int, fn: Callable, *args,
+            key: Optional[tuple] = None, **kwargs) -> asyncio.Future:
+    q = _queues.get(channel_id)
+    if q is None:
+        q = _queues[channel_id] = _ChannelQueue()
+    job = _Job(priority, fn, args, kwargs, key)
+    heapq.heappush(q.heap, job)
+    if key is not None:
+        _pending_edits[key] = job
+    if len(q.heap) > WARN_DEPTH:
+        logger.warning("Outbound queue for channel %s is %d deep", channel_id, len(q.heap))
+    if q.task is None:
+        q.task = asyncio.create_task(_drain(channel_id, q))
+    return job.future
+
+async def _drain(channel_id: int, q: _ChannelQueue) -> None:
+    while q.heap:
+        # Take the token first so a job queued meanwhile can still jump ahead
+        await q.bucket.acquire()
+        await _global.acquire()
+        if not q.heap:
+            break
+        job = heapq.heappop(q.heap)
+        if job.key is not None and _pending_edits.get(job.key) is job:
+            del _pending_edits[job.key]
+        await _run(q, job)
+    q.task = None
+    _queues.pop(channel_id, None)
+
+async def _run(q: _ChannelQueue, job: _Job) -> None:
+    name = getattr(job.fn, "__name__", "request")
+    metrics.phase_seconds.observe(time.perf_counter() - job.queued_at, phase="outbound_wait")
+    for attempt in range(2):
+        try:
+            with metrics.timed(f"discord_{name}"):
+                result = await job.fn(*job.args, **job.kwargs)
+        except discord.HTTPException as e:
+            metrics.discord_error(e)
+            if e.status == 429 and attempt == 0:
+                retry_after = float(getattr(e, "retry_after", 1.0) or 1.0)
+                q.bucket.penalise(retry_after)
+                await q.bucket.acquire()
+                continue
+            _fail(job, e)
+        except Exception as e:
+            _fail(job, e)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+        return
+
+def _fail(job: _Job, exc: BaseException) -> None:
+    if job.future.done():
+        return
+    job.future.set_exception(exc)
+    # Fire-and-forget callers never await the future; don't warn about it
+    job.future.exception()
+    if not isinstance(exc, discord.NotFound):
+        logger.warning("Outbound %s failed: %s", getattr(job.fn, "__name__", job.fn), exc)
+
+# ─── Public API ─────────────────────────────────────────────────────────
+def edit(message: Any, *, priority: int = NORMAL, **kwargs) -> asyncio.Future:
+    """Queue a message edit; a still-queued edit of the same message is replaced."""
+    key = (message.channel.id, message.id)
+    job = _pending_edits.get(key)
+    if job is not None and not job.future.done():
+        # Superseded: send only the latest content, at the most urgent priority
+        job.kwargs = kwargs
+        job.fn = message.edit
+        if priority < job.priority:
+            q = _queues[message.channel.id]
+            job.priority = priority
+            heapq.heapify(q.heap)
+        return job.future
+    return _submit(message.channel.id, priority, message.edit, key=key, **kwargs)
+
+def send(channel: discord.abc.Messageable, *, priority: int = NORMAL, **kwargs) -> asyncio.Future:
+    return _submit(channel.id, priority, channel.send, **kwargs)
+
+def add_reaction(message: Any, emoji: str, *, priority: int = LOW) -> asyncio.Future:
+    return _submit(message.channel.id, priority, message.add_reaction, emoji)
+
+def remove_reaction(message: Any, emoji: str, member: Any, *, priority: int = LOW) -> asyncio.Future:
+    return _submit(message.channel.id, priority, message.remove_reaction, emoji, member)
+
+def delete(message: Any, *, priority: int = LOW) -> asyncio.Future:
+    return _submit(message.channel.id, priority, message.delete)
+
+def delete_messages(channel: Any, message_ids: list[int], *, priority: int = LOW) -> list[asyncio.Future]:
+    """Bulk-delete a channel's messages, up to 100 per request."""
+    messages = [channel.get_partial_message(i) for i in message_ids]
+    return [_submit(channel.id, priority, channel.delete_messages, messages[i:i + 100])
+            for i in range(0, len(messages), 100)]
+
+
+metrics.gauge("mapban_outbound_queue_depth", "Discord requests waiting in the outbound queues", queue_depth)
@@ -0,0 +1,188 @@
+"""
+Winner prediction poll tally.
+
+Votes are counted in memory from raw reaction add/remove gateway events, so
+no reaction user lists are ever fetched. Each user has one vote: reacting
+with the other option moves it, and the bot takes the old reaction off. A
+poll's votes are written to match state, and its status embed updated, at
+most every POLL_FLUSH_INTERVAL seconds, as a job on the match's actor.
+"""
+import os
+import asyncio
+import logging
+from typing import Any, Optional
+
+import discord
+
+import state
+import actors
+import outbound
+import metrics
+from model import Match
+from embeds import refresh_status_embed
+
+logger = logging.getLogger(__name__)
+
+POLL_FLUSH_INTERVAL = float(os.getenv("POLL_FLUSH_INTERVAL", "5"))
+
+OPTIONS = ("🇦", "🇧")
+
+# Messages seen not to be polls, so their reactions don't reload state
+_MISSES_MAX = 4096
+
+
+class Tally:
+    """Live votes and per-option counts of one poll."""
+    __slots__ = ("channel_id", "message_id", "votes", "counts", "channel", "flush_task")
+
+    def __init__(self, channel_id: int, message_id: int, votes: dict[str, int]):
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.votes = dict(votes)
+        self.counts = [0, 0]
+        for option in self.votes.values():
+            self.counts[option] += 1
+        self.channel: Any = None
+        self.flush_task: Optional[asyncio.Task] = None
+
+    def add(self, user_id: int, option: int) -> Optional[int]:
+        """Count a user's vote; returns the option it moved away from, if any."""
+        key = str(user_id)
+        previous = self.votes.get(key)
+        if previous == option:
+            return None
+        self.votes[key] = option
+        self.counts[option] += 1
+        if previous is not None:
+            self.counts[previous] -= 1
+        return previous
+
+    def remove(self, user_id: int, option: int) -> bool:
+        """Drop a user's vote if it is still for this option."""
+        key = str(user_id)
+        if self.votes.get(key) != option:
+            return False
+        del self.votes[key]
+        self.counts[option] -= 1
+        return True
+
+
+# Poll message id → tally
+_polls: dict[int, Tally] = {}
+_misses: set[int] = set()
+
+
+def open_poll(channel_id: int, message_id: int) -> None:
+    """Start counting a freshly posted poll."""
+    _misses.discard(message_id)
+    _polls[message_id] = Tally(channel_id, message_id, {})
+
+def totals(data: Match) -> Optional[tuple[int, int]]:
+    """Live (team A, team B) counts of a match's poll, None without one."""
+    if not data.poll_msg_id:
+        return None
+    tally = _polls.get(data.poll_msg_id)
+    return tuple(tally.counts) if tally else data.poll_totals()
+
+def _option(emoji: discord.PartialEmoji) -> Optional[int]:
+    try:
+        return OPTIONS.index(str(emoji))
+    except ValueError:
+        return None
+
+async def _tally_for(payload: discord.RawReactionActionEvent) -> Optional[Tally]:
+    tally = _polls.get(payload.message_id)
+    if tally is not None or payload.message_id in _misses:
+        return tally
+    data = None
+    # Reactions in channels without a match don't load anything
+    if await state.has_match(payload.channel_id, payload.guild_id):
+        data = await state.ensure_loaded(payload.channel_id, payload.guild_id)
+    if data is None or data.poll_msg_id != payload.message_id:
+        if len(_misses) >= _MISSES_MAX:
+            _misses.clear()
+        _misses.add(payload.message_id)
+        return None
+    # Another event may have built it while the state was loading
+    tally = _polls.get(payload.message_id)
+    if tally is None:
+        tally = _polls[payload.message_id] = Tally(payload.channel_id, payload.message_id, data.poll_votes)
+    return tally
+
+# ─── Gateway events ──────────────────────────────────────────────────
+async def on_reaction_add(payload: discord.RawReactionActionEvent, channel: Any) -> None:
+    option = _option(payload.emoji)
+    if option is None or (payload.member is not None and payload.member.bot):
+        return
+    tally = await _tally_for(payload)
+    if tally is None:
+        return
+    previous = tally.add(payload.user_id, option)
+    if previous is not None and channel is not None:
+        # The removal event that follows no longer matches the vote and is ignored
+        outbound.remove_reaction(channel.get_partial_message(payload.message_id),
+                                 OPTIONS[previous], discord.Object(payload.user_id))
+    _flush_soon(tally, channel)
+
+async def on_reaction_remove(payload: discord.RawReactionActionEvent, channel: Any) -> None:
+    option = _option(payload.emoji)
+    if option is None:
+        return
+    tally = await _tally_for(payload)
+    if tally is not None and tally.remove(payload.user_id, option):
+        _flush_soon(tally, channel)
+
+# ─── Flushing to state ───────────────────────────────────────────────
+def _flush_soon(tally: Tally, channel: Any) -> None:
+    if channel is not None:
+        tally.channel = channel
+    if tally.flush_task is None:
+        tally.flush_task = asyncio.create_task(_flush_later(tally))
+
+async def _flush_later(tally: Tally) -> None:
+    try:
+        await asyncio.sleep(POLL_FLUSH_INTERVAL)
+        # Votes from here on schedule the next flush
+        tally.flush_task = None
+        await actors.submit(tally.channel_id, _flush, tally)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        logger.exception("Failed flushing poll votes for channel %s", tally.channel_id)
+    finally:
+        if tally.flush_task is asyncio.current_task():
+            tally.flush_task = None
+
+async def _flush(tally: Tally) -> None:
+    data = await state.ensure_loaded(tally.channel_id)
+    if data.poll_msg_id != tally.message_id:
+        # The match was cleaned up or replaced
+        _polls.pop(tally.message_id, None)
+        return
+    if data.poll_votes == tally.votes:
+        return
+    data.poll_votes = dict(tally.votes)
+    await state.save_state(tally.channel_id)
+    if tally.channel is not None:
+        await refresh_status_embed(tally.channel, data)
+
+async def flush_all() -> None:
+    """Write out every poll's unflushed votes, e.g. before shutdown."""
+    for tally in list(_polls.values()):
+        if tally.flush_task is not None:
+            tally.flush_task.cancel()
+            tally.flush_task = None
+            try:
+                await actors.submit(tally.channel_id, _flush, tally)
+            except Exception:
+                logger.exception("Failed flushing poll votes for channel %s", tally.channel_id)
+
+def _on_evict(channel_id: int) -> None:
+    # Idle polls are rebuilt from state on their next vote
+    for message_id, tally in list(_polls.items()):
+        if tally.channel_id == channel_id and tally.flush_task is None:
+            del _polls[message_id]
+
+
+state.add_listener(lambda channel_id, event: None, _on_evict)
+metrics.gauge("mapban_open_polls", "Prediction polls being counted in memory", lambda: len(_polls))
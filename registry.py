@@ -0,0 +1,114 @@
+import os
+import json
+import asyncio
+import logging
+import pathlib
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = pathlib.Path(__file__).parent
+MAPLIST_PATH = BASE_DIR / "maplist.json"
+TEAMMAP_PATH = BASE_DIR / "teammap.json"
+
+# How often watch() checks the config files' mtimes (seconds)
+RELOAD_INTERVAL = float(os.getenv("CONFIG_RELOAD_INTERVAL", "5.0"))
+
+
+class MapPool:
+    """Parsed maplist.json."""
+    def __init__(self, data):
+        if isinstance(data, dict) and "maps" in data:
+            self.entries: list[dict] = list(data["maps"])
+            self.names: list[str] = [entry["name"] for entry in self.entries]
+        elif isinstance(data, list):
+            self.entries = [{"name": name} for name in sorted({c[0] for c in data})]
+            self.names = [entry["name"] for entry in self.entries]
+        else:
+            raise ValueError(f"Unexpected maplist format: {type(data)}")
+
+
+class TeamMap:
+    """Parsed teammap.json with precompiled lookups."""
+    def __init__(self, data: dict):
+        # role-name → region, from "team_regions"
+        self.region_lookup: dict[str, str] = {
+            entry["name"]: entry["options"]["region"]
+            for entry in data.get("team_regions", [])
+        }
+        # (region_a, region_b) → "ExtraBan" / "DetermineHost" / ..., from "region_pairings"
+        self.decisions: dict[tuple[str, str], str] = {
+            (rp["name"], other): decision
+            for rp in data.get("region_pairings", [])
+            for other, decision in rp["options"].items()
+        }
+
+    def region_for(self, role_name: str) -> str:
+        return self.region_lookup.get(role_name, "Unknown")
+
+    def decision(self, region_a: str, region_b: str) -> str:
+        return self.decisions.get((region_a, region_b), "TBD")
+
+
+class _ConfigFile:
+    """A JSON file parsed once and rebuilt when its mtime changes."""
+    def __init__(self, path: pathlib.Path, build: Callable):
+        self.path = path
+        self.build = build
+        self.mtime: Optional[int] = None
+        self.value = None
+
+    def _stat(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _parse(self, mtime: Optional[int]):
+        with open(self.path, "r") as f:
+            return mtime, self.build(json.load(f))
+
+    def get(self):
+        # Only the very first access reads the file on the caller's thread
+        if self.value is None:
+            self.mtime, self.value = self._parse(self._stat())
+        return self.value
+
+    async def refresh(self) -> None:
+        loop = asyncio.get_running_loop()
+        mtime = await loop.run_in_executor(None, self._stat)
+        if mtime is None or mtime == self.mtime:
+            return
+        try:
+            self.mtime, self.value = await loop.run_in_executor(None, self._parse, mtime)
+            logger.info("Reloaded %s", self.path.name)
+        except Exception as e:
+            # Keep serving the last good version while an admin is mid-edit
+            logger.error("Failed reloading %s: %s", self.path, e)
+
+
+_maplist = _ConfigFile(MAPLIST_PATH, MapPool)
+_teammap = _ConfigFile(TEAMMAP_PATH, TeamMap)
+_watch_task: Optional[asyncio.Task] = None
+
+
+def map_pool() -> MapPool:
+    return _maplist.get()
+
+def map_names() -> list[str]:
+    return _maplist.get().names
+
+def team_map() -> TeamMap:
+    return _teammap.get()
+
+async def _watch() -> None:
+    while True:
+        await asyncio.sleep(RELOAD_INTERVAL)
+        for cfg in (_maplist, _teammap):
+            await cfg.refresh()
+
+def start_watching() -> None:
+    """Start the background mtime watcher (idempotent)."""
+    global _watch_task
+    if _watch_task is None or _watch_task.done():
+        _watch_task = asyncio.create_task(_watch())
@@ -0,0 +1,102 @@
+"""
+Match-time reminders.
+
+Each match with a scheduled time gets one scheduler job per offset in
+REMINDER_OFFSETS, keyed by channel and offset, so setting a new time or
+cleaning up a match replaces or cancels exactly those jobs. The jobs live in
+the scheduler's persistent heap alongside everything else; nothing polls
+match state.
+"""
+import os
+import re
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+import discord
+
+import state
+import outbound
+import scheduler
+
+logger = logging.getLogger(__name__)
+
+REMINDER = "match_reminder"
+
+_UNITS = {"d": 86400, "h": 3600, "m": 60, "s": 1}
+
+
+def parse_offsets(spec: str) -> list[tuple[str, int]]:
+    """"24h,1h,10m" -> [("24h", 86400), ("1h", 3600), ("10m", 600)], largest first."""
+    offsets = []
+    for part in spec.split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        m = re.fullmatch(r"(\d+)([dhms])", part)
+        if not m:
+            raise ValueError(f"Bad reminder offset {part!r} (expected e.g. 24h, 10m)")
+        offsets.append((part, int(m.group(1)) * _UNITS[m.group(2)]))
+    return sorted(offsets, key=lambda o: -o[1])
+
+# Empty disables reminders
+OFFSETS = parse_offsets(os.getenv("REMINDER_OFFSETS", "24h,1h,10m"))
+
+
+def _key(channel_id: int, label: str) -> str:
+    return f"{REMINDER}:{channel_id}:{label}"
+
+def _start_of(scheduled_time: Optional[str]) -> Optional[float]:
+    if not scheduled_time or scheduled_time == "TBD":
+        return None
+    return datetime.fromisoformat(scheduled_time).astimezone(timezone.utc).timestamp()
+
+def cancel(channel_id: int) -> None:
+    for label, _ in OFFSETS:
+        scheduler.cancel(_key(channel_id, label))
+
+def schedule(channel_id: int, guild_id: Optional[int], match_id: Optional[str],
+             scheduled_time: Optional[str]) -> int:
+    """(Re)schedule a match's reminders; returns how many are still ahead."""
+    cancel(channel_id)
+    start = _start_of(scheduled_time)
+    if start is None:
+        return 0
+    now = datetime.now(timezone.utc).timestamp()
+    count = 0
+    for label, seconds in OFFSETS:
+        if start - seconds > now:
+            scheduler.schedule_at(REMINDER, channel_id, start - seconds, guild_id=guild_id,
+                                  key=_key(channel_id, label), seconds=seconds, match_id=match_id,
+                                  scheduled_time=scheduled_time)
+            count += 1
+    return count
+
+def _human(seconds: int) -> str:
+    for size, name in ((86400, "day"), (3600, "hour"), (60, "minute"), (1, "second")):
+        if seconds >= size and seconds % size == 0:
+            n = seconds // size
+            return f"{n} {name}{'s' if n != 1 else ''}"
+    return f"{seconds} seconds"
+
+async def _remind(channel, jobs: list[scheduler.Job]) -> None:
+    job = jobs[0]
+    data = await state.ensure_loaded(channel.id, job.guild_id)
+    # The match may have been cleaned up or re-timed since this was scheduled
+    current = [j for j in jobs
+               if j.data.get("match_id") == data.match_id
+               and j.data.get("scheduled_time") == data.scheduled_time]
+    start = _start_of(data.scheduled_time)
+    if not current or start is None or start <= datetime.now(timezone.utc).timestamp():
+        return
+    # After downtime several may be due at once; only the nearest one is still useful
+    seconds = min(j.data["seconds"] for j in current)
+    teams = " vs ".join(f"<@&{t}>" for t in data.teams)
+    lines = [f"⏰ Match starts in {_human(seconds)} (<t:{int(start)}:F>, <t:{int(start)}:R>): {teams}"]
+    if data.casters:
+        lines.append("Casters: " + " ".join(data.casters))
+    await outbound.send(channel, content="\n".join(lines),
+                        allowed_mentions=discord.AllowedMentions(roles=True, users=True))
+
+
+scheduler.register(REMINDER, _remind)
@@ -0,0 +1,269 @@
+import os
+import asyncio
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
+from io import BytesIO
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import metrics
+from model import OPEN, MANUAL, AUTO, Match
+
+# PIL is imported on the first render, not at startup
+if TYPE_CHECKING:
+    from PIL import Image, ImageDraw, ImageFont
+
+# ─── Grid geometry ────────────────────────────────────────────────────
+TEAM_KEYS = ("team_a", "team_b")
+SIDES     = ("Allied", "Axis")
+CELL_W    = 75
+MAP_W     = 150
+CELL_H    = 20
+HEADER_H  = 20
+GROUP_H   = 20
+MARGIN    = 5
+
+# Cell states (model.OPEN/MANUAL/AUTO) and their fills
+FILLS = {OPEN: "#ffffff", MANUAL: "#ff0000", AUTO: "#ffa500"}
+
+# Number of encoded PNGs kept, keyed by a hash of the ban state
+PNG_CACHE_SIZE = int(os.getenv("RENDER_PNG_CACHE_SIZE", "256"))
+_png_cache: "OrderedDict[str, bytes]" = OrderedDict()
+
+# Rendering runs off the event loop in a worker pool. RENDER_POOL is
+# "thread" or "process"; at most RENDER_WORKERS grids render at once and
+# at most RENDER_QUEUE_MAX may be waiting or running before new ones are refused.
+RENDER_POOL = os.getenv("RENDER_POOL", "thread")
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+RENDER_QUEUE_MAX = int(os.getenv("RENDER_QUEUE_MAX", "32"))
+
+_executor: Optional[Executor] = None
+_slots: Optional[asyncio.Semaphore] = None
+_queued = 0
+_inflight: dict[str, asyncio.Task] = {}
+
+
+class RenderQueueFull(RuntimeError):
+    """Raised when too many grid renders are already pending."""
+
+
+@lru_cache(maxsize=1)
+def _font() -> "ImageFont.ImageFont":
+    from PIL import ImageFont
+    return ImageFont.load_default()
+
+@lru_cache(maxsize=None)
+def text_size(txt: str) -> Tuple[int, int]:
+    from PIL import Image, ImageDraw
+    bbox = ImageDraw.Draw(Image.new("RGB", (1, 1))).textbbox((0, 0), txt, font=_font())
+    return bbox[2]-bbox[0], bbox[3]-bbox[1]
+
+def _label(draw: "ImageDraw.ImageDraw", box: Tuple[int, int, int, int], fill: str, txt: str) -> None:
+    x0, y0, x1, y1 = box
+    draw.rectangle(box, fill=fill, outline="black")
+    w, h = text_size(txt)
+    draw.text((x0 + (x1-x0-w)/2, y0 + (y1-y0-h)/2), txt, fill="black", font=_font())
+
+@lru_cache(maxsize=None)
+def _cell_sprite(side: str, cell_state: int) -> "Image.Image":
+    from PIL import Image, ImageDraw
+    # One pixel larger than the cell so the sprite carries its full outline
+    img = Image.new("RGB", (CELL_W+1, CELL_H+1), "white")
+    _label(ImageDraw.Draw(img), (0, 0, CELL_W, CELL_H), FILLS[cell_state], side)
+    return img
+
+@lru_cache(maxsize=32)
+def _static_frame(maps: Tuple[str, ...], team_names: Tuple[str, str]) -> "Image.Image":
+    """Headers, the map-name column and every cell in its open state."""
+    from PIL import Image, ImageDraw
+    width  = MARGIN*2 + CELL_W*2 + MAP_W + CELL_W*2
+    height = MARGIN*2 + GROUP_H + HEADER_H + len(maps)*CELL_H
+
+    img  = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+
+    # ─── Group header ─────────────────────────────────────────────
+    x = MARGIN
+    for idx, team in enumerate(team_names):
+        _label(draw, (x, MARGIN, x+CELL_W*2, MARGIN+GROUP_H), "#cccccc", team)
+        x += CELL_W*2 + (MAP_W if idx == 0 else 0)
+    # “Maps” group header
+    _label(draw, (MARGIN + CELL_W*2, MARGIN, MARGIN + CELL_W*2 + MAP_W, MARGIN + GROUP_H),
+           "#cccccc", "Maps")
+
+    # ─── Sub-headers (Allied/Axis/Maps) ────────────────────────────
+    y0 = MARGIN + GROUP_H
+    x  = MARGIN
+    for _ in TEAM_KEYS:
+        for side in SIDES:
+            _label(draw, (x, y0, x+CELL_W, y0+HEADER_H), "#e0e0e0", side)
+            x += CELL_W
+        x += MAP_W
+    _label(draw, (MARGIN + CELL_W*2, y0, MARGIN + CELL_W*2 + MAP_W, y0 + HEADER_H),
+           "#e0e0e0", "Maps")
+
+    # ─── Rows in their open state ──────────────────────────────────
+    for i, m in enumerate(maps):
+        y = MARGIN + GROUP_H + HEADER_H + i*CELL_H
+        x = MARGIN
+        for side in SIDES:
+            img.paste(_cell_sprite(side, OPEN), (x, y))
+            x += CELL_W
+        _label(draw, (x, y, x+MAP_W, y+CELL_H), "#dddddd", m)
+        x += MAP_W
+        for side in SIDES:
+            img.paste(_cell_sprite(side, OPEN), (x, y))
+            x += CELL_W
+
+    return img
+
+def ban_matrix(maps: List[str], state_data: Match) -> Tuple[Tuple[int, ...], ...]:
+    """Per map, the OPEN/MANUAL/AUTO state of team A Allied/Axis then team B Allied/Axis."""
+    return tuple(state_data.row(m) for m in maps)
+
+def render_grid(
+    maps: Tuple[str, ...],
+    matrix: Tuple[Tuple[int, ...], ...],
+    team_names: Tuple[str, str]
+) -> "Image.Image":
+    img = _static_frame(tuple(maps), tuple(team_names)).copy()
+    # Only banned cells differ from the frame
+    xs = [MARGIN, MARGIN + CELL_W,
+          MARGIN + CELL_W*2 + MAP_W, MARGIN + CELL_W*3 + MAP_W]
+    for i, row in enumerate(matrix):
+        y = MARGIN + GROUP_H + HEADER_H + i*CELL_H
+        for col, cell_state in enumerate(row):
+            if cell_state != OPEN:
+                img.paste(_cell_sprite(SIDES[col % 2], cell_state), (xs[col], y))
+    return img
+
+def create_combo_grid_image(
+    maps: List[str],
+    state_data: Match,
+    team_names: Tuple[str, str] = ("Team A", "Team B")
+) -> "Image.Image":
+    """
+    Build a grid image showing combos for each map and team, coloring cells:
+      • manual bans → Red (#ff0000)
+      • auto   bans → Orange (#ffa500)
+      • otherwise → White (#ffffff)
+    """
+    return render_grid(tuple(maps), ban_matrix(maps, state_data), tuple(team_names))
+
+def grid_key(
+    maps: Tuple[str, ...],
+    matrix: Tuple[Tuple[int, ...], ...],
+    team_names: Tuple[str, str]
+) -> str:
+    return hashlib.sha1(repr((tuple(maps), matrix, tuple(team_names))).encode()).hexdigest()
+
+def render_grid_png(
+    maps: Tuple[str, ...],
+    matrix: Tuple[Tuple[int, ...], ...],
+    team_names: Tuple[str, str]
+) -> bytes:
+    """Encoded PNG for a ban state, served from cache when already rendered."""
+    key = grid_key(maps, matrix, team_names)
+    png = _cached(key)
+    if png is None:
+        png = encode_grid(maps, matrix, team_names)
+        _store(key, png)
+    return png
+
+def encode_grid(
+    maps: Tuple[str, ...],
+    matrix: Tuple[Tuple[int, ...], ...],
+    team_names: Tuple[str, str]
+) -> bytes:
+    """Render and PNG-encode a grid; pure, so it can run in any worker."""
+    buf = BytesIO()
+    render_grid(maps, matrix, team_names).save(buf, format="PNG")
+    return buf.getvalue()
+
+def _cached(key: str) -> Optional[bytes]:
+    png = _png_cache.get(key)
+    if png is not None:
+        _png_cache.move_to_end(key)
+    return png
+
+def _store(key: str, png: bytes) -> None:
+    _png_cache[key] = png
+    if len(_png_cache) > PNG_CACHE_SIZE:
+        _png_cache.popitem(last=False)
+
+# ─── Worker pool ──────────────────────────────────────────────────────
+def _get_executor() -> Executor:
+    global _executor, _slots
+    if _executor is None:
+        if RENDER_POOL == "process":
+            _executor = ProcessPoolExecutor(max_workers=RENDER_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS,
+                                           thread_name_prefix="render")
+        _slots = asyncio.Semaphore(RENDER_WORKERS)
+    return _executor
+
+def queue_depth() -> int:
+    """Grid renders currently waiting for or holding a worker."""
+    return _queued
+
+async def render_grid_png_async(
+    maps: Tuple[str, ...],
+    matrix: Tuple[Tuple[int, ...], ...],
+    team_names: Tuple[str, str]
+) -> bytes:
+    """render_grid_png() on the worker pool; identical concurrent requests share one render."""
+    with metrics.timed("grid_render"):
+        return await _render_grid_png_async(tuple(maps), matrix, tuple(team_names))
+
+async def _render_grid_png_async(
+    maps: Tuple[str, ...],
+    matrix: Tuple[Tuple[int, ...], ...],
+    team_names: Tuple[str, str]
+) -> bytes:
+    global _queued
+    key = grid_key(maps, matrix, team_names)
+    png = _cached(key)
+    if png is not None:
+        return png
+    task = _inflight.get(key)
+    if task is None:
+        if _queued >= RENDER_QUEUE_MAX:
+            raise RenderQueueFull(f"{_queued} grid renders already pending")
+        # The render is its own task, so a cancelled caller doesn't cancel the others
+        _queued += 1
+        task = _inflight[key] = asyncio.create_task(_render(key, maps, matrix, team_names))
+        task.add_done_callback(partial(_render_done, key))
+    return await asyncio.shield(task)
+
+async def _render(
+    key: str,
+    maps: Tuple[str, ...],
+    matrix: Tuple[Tuple[int, ...], ...],
+    team_names: Tuple[str, str]
+) -> bytes:
+    executor = _get_executor()
+    async with _slots:
+        with metrics.timed("png_encode"):
+            png = await asyncio.get_running_loop().run_in_executor(
+                executor, encode_grid, maps, matrix, team_names)
+    _store(key, png)
+    return png
+
+def _render_done(key: str, task: asyncio.Task) -> None:
+    global _queued
+    _queued -= 1
+    del _inflight[key]
+    if not task.cancelled():
+        # Every caller may have given up; don't warn about an unread error
+        task.exception()
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+metrics.gauge("mapban_render_queue_depth", "Grid renders waiting for or holding a worker", queue_depth)
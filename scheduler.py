@@ -0,0 +1,280 @@
+"""
+One persistent scheduler for delayed, channel-scoped jobs.
+
+Pending jobs sit in a single heap ordered by due time with one task sleeping
+until the earliest, instead of a sleeping task per job. They are also kept in
+SQLite (SCHEDULER_DB), so a restart resumes them; jobs of one kind and channel
+that fall due together are handed to their handler as one batch.
+"""
+import os
+import json
+import time
+import heapq
+import uuid
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Optional
+
+import metrics
+import shards
+from storage import STATE_DIR
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_DB = os.getenv("SCHEDULER_DB", os.path.join(STATE_DIR, "scheduler.db"))
+# Jobs due within this many seconds of the first due job run in the same batch
+BATCH_WINDOW = float(os.getenv("SCHEDULER_BATCH_WINDOW", "1.0"))
+# Quiet period before new and finished jobs are written out together
+PERSIST_DELAY = 0.25
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    due         REAL NOT NULL,        -- unix seconds
+    kind        TEXT NOT NULL,
+    guild_id    INTEGER,
+    channel_id  INTEGER NOT NULL,
+    data        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_due ON jobs(due);
+"""
+
+
+class Job:
+    __slots__ = ("id", "due", "kind", "guild_id", "channel_id", "data", "cancelled")
+
+    def __init__(self, id: str, due: float, kind: str, guild_id: Optional[int],
+                 channel_id: int, data: dict):
+        self.id = id
+        self.due = due
+        self.kind = kind
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.data = data
+        self.cancelled = False
+
+
+Handler = Callable[[Any, list[Job]], Awaitable[None]]
+
+_handlers: dict[str, Handler] = {}
+_jobs: dict[str, Job] = {}
+_heap: list[tuple[float, int, Job]] = []
+_seq = 0
+_wake: Optional[asyncio.Event] = None
+_runner: Optional[asyncio.Task] = None
+_running: set[asyncio.Task] = set()
+_get_channel: Optional[Callable[[int], Any]] = None
+
+# Write-behind to SQLite
+_to_save: dict[str, Job] = {}
+_to_delete: set[str] = set()
+_persist_task: Optional[asyncio.Task] = None
+_conn: Optional[sqlite3.Connection] = None
+_db_lock = threading.Lock()
+
+
+def register(kind: str, handler: Handler) -> None:
+    """handler(channel, jobs) runs every due batch of this kind for one channel."""
+    _handlers[kind] = handler
+
+def pending(kind: Optional[str] = None) -> int:
+    return sum(1 for j in _jobs.values() if kind is None or j.kind == kind)
+
+def _push(job: Job) -> None:
+    global _seq
+    _seq += 1
+    _jobs[job.id] = job
+    heapq.heappush(_heap, (job.due, _seq, job))
+    # Wake the runner if this is now the earliest job
+    if _wake is not None and _heap[0][2] is job:
+        _wake.set()
+
+def schedule(kind: str, channel_id: int, delay: float, *, guild_id: Optional[int] = None,
+             key: Optional[str] = None, **data) -> Job:
+    """Run a job `delay` seconds from now; a job with the same key is replaced."""
+    return schedule_at(kind, channel_id, time.time() + delay, guild_id=guild_id, key=key, **data)
+
+def schedule_at(kind: str, channel_id: int, due: float, *, guild_id: Optional[int] = None,
+                key: Optional[str] = None, **data) -> Job:
+    """Run a job at a unix time."""
+    if key is not None:
+        cancel(key)
+    job = Job(key or uuid.uuid4().hex, due, kind, guild_id, channel_id, data)
+    _push(job)
+    _to_delete.discard(job.id)
+    _to_save[job.id] = job
+    _persist_soon()
+    return job
+
+def cancel(job_id: str) -> bool:
+    job = _jobs.pop(job_id, None)
+    if job is None:
+        return False
+    job.cancelled = True
+    _finished(job)
+    return True
+
+def cancel_channel(channel_id: int, kind: Optional[str] = None) -> int:
+    """Cancel a channel's pending jobs (of one kind); returns how many."""
+    ids = [j.id for j in _jobs.values()
+           if j.channel_id == channel_id and (kind is None or j.kind == kind)]
+    for job_id in ids:
+        cancel(job_id)
+    return len(ids)
+
+def _finished(job: Job) -> None:
+    if _to_save.pop(job.id, None) is None:
+        _to_delete.add(job.id)
+    _persist_soon()
+
+# ─── Persistence ─────────────────────────────────────────────────────
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        directory = os.path.dirname(SCHEDULER_DB)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _conn = sqlite3.connect(SCHEDULER_DB, isolation_level=None, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.executescript(_SCHEMA)
+    return _conn
+
+def _write(save: list[Job], delete: list[str]) -> None:
+    with _db_lock:
+        conn = _db()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO jobs (id, due, kind, guild_id, channel_id, data) VALUES (?, ?, ?, ?, ?, ?)",
+                [(j.id, j.due, j.kind, j.guild_id, j.channel_id, json.dumps(j.data, separators=(",", ":")))
+                 for j in save])
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(i,) for i in delete])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+def _read() -> list[Job]:
+    with _db_lock:
+        rows = _db().execute("SELECT id, due, kind, guild_id, channel_id, data FROM jobs").fetchall()
+    return [Job(r[0], r[1], r[2], r[3], r[4], json.loads(r[5])) for r in rows]
+
+def _take_changes() -> tuple[list[Job], list[str]]:
+    save, delete = list(_to_save.values()), list(_to_delete)
+    _to_save.clear()
+    _to_delete.clear()
+    return save, delete
+
+def _persist_soon() -> None:
+    global _persist_task
+    if _persist_task is None:
+        _persist_task = asyncio.create_task(_persist_later())
+
+async def _persist_later() -> None:
+    global _persist_task
+    try:
+        await asyncio.sleep(PERSIST_DELAY)
+        save, delete = _take_changes()
+        if save or delete:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, _write, save, delete)
+            except Exception:
+                logger.exception("Failed persisting %d scheduled jobs", len(save) + len(delete))
+                for job in save:
+                    if job.id in _jobs:
+                        _to_save.setdefault(job.id, job)
+                _to_delete.update(i for i in delete if i not in _to_save)
+    finally:
+        _persist_task = None
+    if _to_save or _to_delete:
+        _persist_soon()
+
+# ─── Running ─────────────────────────────────────────────────────────
+async def start(get_channel: Callable[[int], Any]) -> None:
+    """Load this process's pending jobs and start running them; safe to call again."""
+    global _runner, _wake, _get_channel
+    _get_channel = get_channel
+    if _runner is not None:
+        return
+    _wake = asyncio.Event()
+    stored = await asyncio.get_running_loop().run_in_executor(None, _read)
+    resumed = 0
+    for job in stored:
+        owned = shards.owns_guild(job.guild_id) if job.guild_id is not None else shards.is_primary()
+        if owned and job.id not in _jobs and job.id not in _to_delete:
+            _push(job)
+            resumed += 1
+    if resumed:
+        logger.info("Resumed %d scheduled jobs", resumed)
+    _runner = asyncio.create_task(_run())
+
+async def _run() -> None:
+    while True:
+        _wake.clear()
+        while _heap and _heap[0][2].cancelled:
+            heapq.heappop(_heap)
+        if not _heap:
+            await _wake.wait()
+            continue
+        delay = _heap[0][0] - time.time()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(_wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        # Everything due now, plus whatever falls due within the batch window
+        horizon = time.time() + BATCH_WINDOW
+        batches: dict[tuple[str, int], list[Job]] = {}
+        while _heap and _heap[0][0] <= horizon:
+            _, _, job = heapq.heappop(_heap)
+            if job.cancelled:
+                continue
+            _jobs.pop(job.id, None)
+            batches.setdefault((job.kind, job.channel_id), []).append(job)
+        for (kind, channel_id), jobs in batches.items():
+            task = asyncio.create_task(_dispatch(kind, channel_id, jobs))
+            _running.add(task)
+            task.add_done_callback(_running.discard)
+
+async def _dispatch(kind: str, channel_id: int, jobs: list[Job]) -> None:
+    try:
+        handler = _handlers.get(kind)
+        channel = _get_channel(channel_id) if _get_channel else None
+        if handler is None:
+            logger.warning("No handler for %d scheduled %r jobs", len(jobs), kind)
+        elif channel is None:
+            logger.info("Dropping %d %r jobs for unknown channel %s", len(jobs), kind, channel_id)
+        else:
+            with metrics.timed(f"scheduled_{kind}"):
+                await handler(channel, jobs)
+    except Exception:
+        logger.exception("Scheduled %r jobs for channel %s failed", kind, channel_id)
+    finally:
+        # Run at most once, whatever the outcome
+        for job in jobs:
+            # Rescheduled under the same key meanwhile: that row belongs to the new job
+            if _jobs.get(job.id) is None:
+                _finished(job)
+
+def close() -> None:
+    """Stop running jobs and write out pending changes; jobs not yet due stay stored."""
+    global _runner, _persist_task, _conn
+    if _runner is not None:
+        _runner.cancel()
+        _runner = None
+    if _persist_task is not None:
+        _persist_task.cancel()
+        _persist_task = None
+    save, delete = _take_changes()
+    if save or delete:
+        _write(save, delete)
+    if _conn is not None:
+        _conn.close()
+        _conn = None
+
+
+metrics.gauge("mapban_scheduled_jobs", "Jobs waiting in the scheduler", lambda: len(_jobs))
@@ -0,0 +1,136 @@
+"""
+Shard layout for this process, and a launcher for shard-range workers.
+
+    python shards.py --workers 4 --shards 16
+
+starts four `main.py` processes, each running an AutoShardedClient over a
+contiguous quarter of the 16 shards. Discord routes a guild's events to
+shard (guild_id >> 22) % shard_count, so each worker only ever sees, loads
+and writes the state of its own guilds.
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import subprocess
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def parse_ids(spec: Optional[str]) -> Optional[list[int]]:
+    """"0-3,8" -> [0, 1, 2, 3, 8]; empty or None means every shard."""
+    if not spec:
+        return None
+    ids: list[int] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            ids.extend(range(int(lo), int(hi) + 1))
+        elif part:
+            ids.append(int(part))
+    return sorted(set(ids))
+
+# SHARD_COUNT=0 keeps the single unsharded discord.Client. SHARD_AUTO=1 uses
+# AutoShardedClient with Discord's recommended shard count. SHARD_IDS limits
+# this process to a range of shards (requires SHARD_COUNT).
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))
+SHARD_IDS = parse_ids(os.getenv("SHARD_IDS"))
+SHARD_AUTO = os.getenv("SHARD_AUTO", "0") == "1"
+SHARDED = SHARD_AUTO or SHARD_COUNT > 0
+
+if SHARD_IDS is not None and not SHARD_COUNT:
+    raise RuntimeError("SHARD_IDS needs SHARD_COUNT")
+
+
+def shard_for(guild_id: int, shard_count: int) -> int:
+    return (guild_id >> 22) % shard_count
+
+def owns_guild(guild_id: Optional[int]) -> bool:
+    """True if this process serves the guild (always, unless running a shard range)."""
+    if SHARD_IDS is None or guild_id is None:
+        return True
+    return shard_for(guild_id, SHARD_COUNT) in SHARD_IDS
+
+def is_primary() -> bool:
+    """
+    The one process that syncs the command tree and owns guild-less state.
+    SHARD_PRIMARY=1/0 overrides; by default it is whoever runs shard 0.
+    """
+    override = os.getenv("SHARD_PRIMARY")
+    if override is not None:
+        return override == "1"
+    return SHARD_IDS is None or 0 in SHARD_IDS
+
+def client_kwargs() -> dict:
+    """Constructor arguments for the AutoShardedClient."""
+    kwargs: dict = {}
+    if SHARD_COUNT:
+        kwargs["shard_count"] = SHARD_COUNT
+    if SHARD_IDS is not None:
+        kwargs["shard_ids"] = SHARD_IDS
+    return kwargs
+
+def split(shard_count: int, workers: int) -> list[list[int]]:
+    """Contiguous, near-equal shard ranges, one per worker."""
+    workers = max(1, min(workers, shard_count))
+    base, extra = divmod(shard_count, workers)
+    ranges, start = [], 0
+    for i in range(workers):
+        size = base + (1 if i < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+# ─── Launcher ────────────────────────────────────────────────────────
+def _worker_env(index: int, shard_ids: list[int], shard_count: int, workers: int) -> dict:
+    env = dict(os.environ)
+    env["SHARD_COUNT"] = str(shard_count)
+    env["SHARD_IDS"] = ",".join(map(str, shard_ids))
+    env["SHARD_PRIMARY"] = "1" if index == 0 else "0"
+    env.pop("SHARD_AUTO", None)
+    # The global rate limit is per bot token, so split it between workers
+    global_rate = float(os.getenv("OUTBOUND_GLOBAL_RATE", "40"))
+    env["OUTBOUND_GLOBAL_RATE"] = str(global_rate / workers)
+    # Each worker gets its own metrics port
+    port = int(os.getenv("METRICS_PORT", "0"))
+    if port:
+        env["METRICS_PORT"] = str(port + index)
+    return env
+
+def launch(workers: int, shard_count: int) -> int:
+    ranges = split(shard_count, workers)
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    procs = []
+    for i, shard_ids in enumerate(ranges):
+        logger.info("Worker %d: shards %s of %d", i, shard_ids, shard_count)
+        procs.append(subprocess.Popen([sys.executable, main_py],
+                                      env=_worker_env(i, shard_ids, shard_count, len(ranges))))
+
+    def _stop(signum, frame):
+        for p in procs:
+            if p.poll() is None:
+                p.send_signal(signal.SIGINT)
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    # A worker exiting takes the others down so a supervisor can restart the set
+    while all(p.poll() is None for p in procs):
+        time.sleep(1)
+    _stop(None, None)
+    return max(p.wait() for p in procs)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Run the bot as shard-range worker processes")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SHARD_WORKERS", "2")))
+    parser.add_argument("--shards", type=int, default=SHARD_COUNT or None,
+                        help="total shard count (defaults to SHARD_COUNT)")
+    args = parser.parse_args()
+    if not args.shards:
+        parser.error("--shards or SHARD_COUNT is required")
+    sys.exit(launch(args.workers, args.shards))
@@ -2,46 +2,476 @@ import os
 import json
 import asyncio
 import logging
+import time
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Iterator, Optional
+from events import BAN_RECORDED, apply_event, make_event
+import model
+from model import Match
+import metrics
+import shards
+import storage
+from storage import Write
 
 logger = logging.getLogger(__name__)
 
-# Directory for per-channel state files
-STATE_DIR = "state"
-os.makedirs(STATE_DIR, exist_ok=True)
+# Write-behind persistence: save_state() only marks a channel dirty and the
+# actual disk write is coalesced into a single flush that runs in an executor.
+# STATE_FLUSH_DELAY is the quiet period after the last save_state() call,
+# STATE_MAX_STALENESS caps how long a dirty channel may wait for its flush.
+WRITE_BEHIND = os.getenv("STATE_WRITE_BEHIND", "1") != "0"
+FLUSH_DELAY = float(os.getenv("STATE_FLUSH_DELAY", "0.25"))
+MAX_STALENESS = float(os.getenv("STATE_MAX_STALENESS", "2.0"))
+
+# Typed events are journaled next to the snapshot (state_<channel>.journal or
+# the events table); once the journal grows past this many bytes the snapshot
+# is rewritten. Where and how is up to the storage backend (storage.py).
+JOURNAL_MAX_BYTES = int(os.getenv("STATE_JOURNAL_MAX_BYTES", "65536"))
+
+# Matches are hydrated on first touch. Clean matches are evicted from memory
+# once more than STATE_CACHE_MAX are loaded or after STATE_IDLE_TTL seconds
+# without a command. STATE_WARM_START=1 preloads the manifest's active matches.
+CACHE_MAX = int(os.getenv("STATE_CACHE_MAX", "64"))
+IDLE_TTL = float(os.getenv("STATE_IDLE_TTL", "3600"))
+WARM_START = os.getenv("STATE_WARM_START", "0") == "1"
+LOAD_CONCURRENCY = int(os.getenv("STATE_LOAD_CONCURRENCY", "8"))
+
+# Memory is the source of truth once a match is loaded. With STATE_WATCH_DISK
+# on, load_state() still re-reads a clean match whose stored copy was changed
+# by something other than this process (its backend signature differs).
+WATCH_DISK = os.getenv("STATE_WATCH_DISK", "1") != "0"
+# ...checked at most this often per channel, since the check runs on the event loop
+WATCH_INTERVAL = float(os.getenv("STATE_WATCH_INTERVAL", "2.0"))
 
 # In-memory state containers
 state_locks: dict[int, asyncio.Lock] = {}
-ongoing_events: dict[int, dict] = {}
+ongoing_events: dict[int, Match] = {}
+
+# Write-behind bookkeeping (loop time of first / latest dirty mark)
+_dirty_since: dict[int, float] = {}
+_last_dirty: dict[int, float] = {}
+_flush_tasks: dict[int, asyncio.Task] = {}
+# Channels whose flushes are held until their batched_writes() block exits
+_batched: set[int] = set()
+
+# Journal bookkeeping
+_snapshot_dirty: set[int] = set()
+_pending_events: dict[int, list[dict]] = {}
+_journal_bytes: dict[int, int] = {}
+
+# Hydration bookkeeping: LRU of loaded channels and each channel's guild
+_last_used: "OrderedDict[int, float]" = OrderedDict()
+_guild_of: dict[int, int] = {}
+# Channels with handlers still holding their Match (see pinned()); never evicted
+_pins: dict[int, int] = {}
+
+# Backend signature after our last read/write, when it last matched, and a per-channel change counter
+_disk_sig: dict[int, tuple] = {}
+_disk_checked: dict[int, float] = {}
+_generation: dict[int, int] = {}
+# Only bumped when map_bans change (ban events, reloads, resets); the combo index follows it
+_ban_generation: dict[int, int] = {}
 
+# Derived in-memory indexes register here to follow events and evictions
+_listeners: list[tuple[Callable[[int, dict], None], Callable[[int], None]]] = []
 
-def _state_file(channel_id: int) -> str:
-    return os.path.join(STATE_DIR, f"state_{channel_id}.json")
 
-async def load_state(channel_id: int) -> None:
+_backend: Optional[storage.StateBackend] = None
+
+
+def backend() -> storage.StateBackend:
+    """The configured storage backend (STATE_BACKEND), opened on first use."""
+    global _backend
+    if _backend is None:
+        _backend = storage.open_backend()
+    return _backend
+
+def close_backend() -> None:
+    global _backend
+    if _backend is not None:
+        _backend.close()
+        _backend = None
+
+def _is_current(channel_id: int) -> bool:
+    if channel_id not in ongoing_events:
+        return False
+    # Unflushed changes in memory are newer than the file on disk
+    if channel_id in _dirty_since or not WATCH_DISK:
+        return True
+    now = time.monotonic()
+    if now - _disk_checked.get(channel_id, float("-inf")) < WATCH_INTERVAL:
+        return True
+    if _disk_sig.get(channel_id) != backend().signature(channel_id, _guild_of.get(channel_id)):
+        return False
+    _disk_checked[channel_id] = now
+    return True
+
+@asynccontextmanager
+async def _locked(channel_id: int) -> AsyncIterator[None]:
+    """Hold a channel's lock, counting the times someone else already had it."""
     lock = state_locks.setdefault(channel_id, asyncio.Lock())
-    async with lock:
-        path = _state_file(channel_id)
-        if not os.path.exists(path):
-            ongoing_events[channel_id] = {}
+    if lock.locked():
+        metrics.lock_waits.inc()
+        with metrics.timed("lock_wait"):
+            await lock.acquire()
+    else:
+        await lock.acquire()
+    try:
+        yield
+    finally:
+        lock.release()
+
+def bind_guild(channel_id: int, guild_id: Optional[int]) -> None:
+    """Record which guild a channel belongs to, which decides where its files live."""
+    if guild_id is not None and _guild_of.get(channel_id) != guild_id:
+        _guild_of[channel_id] = guild_id
+
+async def load_state(channel_id: int, guild_id: Optional[int] = None) -> None:
+    """Make sure a channel's in-memory state is loaded and up to date."""
+    bind_guild(channel_id, guild_id)
+    if _is_current(channel_id):
+        _touch(channel_id)
+        return
+    async with _locked(channel_id):
+        _touch(channel_id)
+        if _is_current(channel_id):
             return
-        try:
-            with open(path, 'r') as f:
-                ongoing_events[channel_id] = json.load(f)
-        except json.JSONDecodeError as e:
-            logger.warning("Corrupted JSON in %s: %s", path, e)
-            ongoing_events[channel_id] = {}
+        with metrics.timed("load_state"):
+            data, journal_bytes, sig = await backend().read(channel_id, _guild_of.get(channel_id))
+        _journal_bytes[channel_id] = journal_bytes
+        _disk_sig[channel_id] = sig
+        _disk_checked[channel_id] = time.monotonic()
+        current = ongoing_events.get(channel_id)
+        if current is None:
+            ongoing_events[channel_id] = data
+        else:
+            # Update in place so matches held by running handlers stay valid
+            current.replace_with(data)
+        _bump(channel_id, bans=True)
+
+async def has_match(channel_id: int, guild_id: Optional[int] = None) -> bool:
+    """True if a channel's match is loaded or stored as running, without loading it."""
+    if channel_id in ongoing_events:
+        return True
+    guild_id = guild_id if guild_id is not None else _guild_of.get(channel_id)
+    if channel_id in await backend().active(guild_id):
+        return True
+    # Files from before per-guild directories, not moved yet
+    return guild_id is not None and channel_id in await backend().active(None)
+
+async def ensure_loaded(channel_id: int, guild_id: Optional[int] = None) -> Match:
+    """Return a channel's state, hydrating it from disk on first touch."""
+    await load_state(channel_id, guild_id)
+    return ongoing_events[channel_id]
+
+def _bump(channel_id: int, bans: bool = False) -> None:
+    _generation[channel_id] = _generation.get(channel_id, 0) + 1
+    if bans:
+        _ban_generation[channel_id] = _ban_generation.get(channel_id, 0) + 1
+
+def generation(channel_id: int) -> int:
+    """Counter that changes whenever a channel's in-memory state changes."""
+    return _generation.get(channel_id, 0)
+
+def ban_generation(channel_id: int) -> int:
+    """Counter that changes whenever a channel's map_bans change."""
+    return _ban_generation.get(channel_id, 0)
+
+def bans_changed(channel_id: int) -> None:
+    """Call after changing map_bans directly rather than through a ban event."""
+    _bump(channel_id, bans=True)
+
+def add_listener(on_event: Callable[[int, dict], None], on_evict: Callable[[int], None]) -> None:
+    """Register callbacks for recorded events and for channels leaving memory."""
+    _listeners.append((on_event, on_evict))
+
+def _notify_evict(channel_id: int) -> None:
+    for _, on_evict in _listeners:
+        on_evict(channel_id)
+
+async def warm_start() -> None:
+    """Preload the manifest's active matches with bounded concurrency."""
+    sem = asyncio.Semaphore(LOAD_CONCURRENCY)
+
+    async def _load(channel_id: int) -> None:
+        async with sem:
+            try:
+                await load_state(channel_id)
+            except Exception:
+                logger.exception("Failed loading state for channel %s", channel_id)
+
+    # Guild-less state belongs to the primary worker; a guild's to whoever owns the guild
+    guilds: list[Optional[int]] = [None] if shards.is_primary() else []
+    guilds += [g for g in await backend().guilds() if shards.owns_guild(g)]
+    channels = []
+    for guild_id in guilds:
+        for channel_id in await backend().active(guild_id):
+            bind_guild(channel_id, guild_id)
+            channels.append(channel_id)
+    await asyncio.gather(*(_load(ch) for ch in channels))
+
+# ─── LRU eviction ────────────────────────────────────────────────────
+@contextmanager
+def pinned(channel_id: int) -> Iterator[None]:
+    """Keep a channel in memory while the block runs, so its Match object stays the live one."""
+    _pins[channel_id] = _pins.get(channel_id, 0) + 1
+    try:
+        yield
+    finally:
+        if _pins[channel_id] == 1:
+            del _pins[channel_id]
+        else:
+            _pins[channel_id] -= 1
+
+def _touch(channel_id: int) -> None:
+    _last_used[channel_id] = time.monotonic()
+    _last_used.move_to_end(channel_id)
+    _evict_idle(keep=channel_id)
+
+def _evictable(channel_id: int) -> bool:
+    lock = state_locks.get(channel_id)
+    return (channel_id not in _dirty_since
+            and channel_id not in _flush_tasks
+            and channel_id not in _pending_events
+            and channel_id not in _snapshot_dirty
+            and channel_id not in _pins
+            and not (lock and lock.locked()))
+
+def _evict_idle(keep: Optional[int] = None) -> None:
+    now = time.monotonic()
+    excess = len(_last_used) - CACHE_MAX
+    for channel_id, used in list(_last_used.items()):
+        if excess <= 0 and now - used < IDLE_TTL:
+            break
+        if channel_id != keep and _evictable(channel_id):
+            evict(channel_id)
+            excess -= 1
+
+def evict(channel_id: int) -> None:
+    """Drop a clean channel from memory; it is re-read on next touch."""
+    _last_used.pop(channel_id, None)
+    ongoing_events.pop(channel_id, None)
+    _journal_bytes.pop(channel_id, None)
+    _disk_sig.pop(channel_id, None)
+    _disk_checked.pop(channel_id, None)
+    _notify_evict(channel_id)
+    lock = state_locks.get(channel_id)
+    if lock and not lock.locked():
+        del state_locks[channel_id]
 
 async def save_state(channel_id: int) -> None:
-    lock = state_locks.setdefault(channel_id, asyncio.Lock())
-    async with lock:
-        path = _state_file(channel_id)
-        temp = path + ".tmp"
-        with open(temp, 'w') as f:
-            json.dump(ongoing_events.get(channel_id, {}), f, indent=2)
-        os.replace(temp, path)
-
-
-def list_state_files() -> list[str]:
-    return [os.path.join(STATE_DIR, fname)
-            for fname in os.listdir(STATE_DIR)
-            if fname.startswith("state_") and fname.endswith(".json")]
\ No newline at end of file
+    with metrics.timed("save_state"):
+        _snapshot_dirty.add(channel_id)
+        _bump(channel_id)
+        if not WRITE_BEHIND:
+            await flush_state(channel_id)
+            return
+        mark_dirty(channel_id)
+
+async def record_event(channel_id: int, event_type: str, **fields) -> dict:
+    """Apply a typed event to a channel's state and journal it."""
+    data = await ensure_loaded(channel_id)
+    event = make_event(event_type, data.journal_seq + 1, **fields)
+    apply_event(data, event)
+    _bump(channel_id, bans=event_type == BAN_RECORDED)
+    for on_event, _ in _listeners:
+        on_event(channel_id, event)
+    _pending_events.setdefault(channel_id, []).append(event)
+    if not WRITE_BEHIND:
+        await flush_state(channel_id)
+    else:
+        mark_dirty(channel_id)
+    return event
+
+def mark_dirty(channel_id: int) -> None:
+    """Schedule a coalesced flush of a channel's state."""
+    now = asyncio.get_running_loop().time()
+    _dirty_since.setdefault(channel_id, now)
+    _last_dirty[channel_id] = now
+    if channel_id not in _flush_tasks and channel_id not in _batched:
+        _flush_tasks[channel_id] = asyncio.create_task(_flush_later(channel_id))
+
+async def _flush_later(channel_id: int) -> None:
+    loop = asyncio.get_running_loop()
+    try:
+        while channel_id in _dirty_since:
+            wake = min(_last_dirty[channel_id] + FLUSH_DELAY,
+                       _dirty_since[channel_id] + MAX_STALENESS)
+            delay = wake - loop.time()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        await flush_state(channel_id)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        logger.exception("Failed flushing state for channel %s", channel_id)
+    finally:
+        if _flush_tasks.get(channel_id) is asyncio.current_task():
+            del _flush_tasks[channel_id]
+    # Something was marked dirty while the write was in flight
+    if channel_id in _dirty_since and channel_id not in _flush_tasks:
+        _flush_tasks[channel_id] = asyncio.create_task(_flush_later(channel_id))
+
+def _take_pending(channel_id: int) -> Optional[Write]:
+    """Clear a channel's dirty marks and turn its pending changes into one write."""
+    _dirty_since.pop(channel_id, None)
+    _last_dirty.pop(channel_id, None)
+    events = _pending_events.pop(channel_id, [])
+    snapshot = channel_id in _snapshot_dirty
+    _snapshot_dirty.discard(channel_id)
+    data = ongoing_events.get(channel_id)
+    if data is None:
+        return None
+    # Encode on the loop with the C encoder; the backend writes off the loop
+    journal = ""
+    if not snapshot:
+        journal = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in events)
+        if _journal_bytes.get(channel_id, 0) + len(journal) > JOURNAL_MAX_BYTES:
+            snapshot = True
+        elif not journal:
+            return None
+    return Write(channel_id, _guild_of.get(channel_id), data.match_id,
+                 model.dumps(data) if snapshot else None,
+                 events, journal)
+
+def _written(write: Write, sig: tuple) -> None:
+    channel_id = write.channel_id
+    _disk_sig[channel_id] = sig
+    _disk_checked[channel_id] = time.monotonic()
+    if write.snapshot is not None:
+        _journal_bytes[channel_id] = 0
+    else:
+        _journal_bytes[channel_id] = _journal_bytes.get(channel_id, 0) + len(write.journal)
+
+def _requeue(write: Write) -> None:
+    """Keep the channel dirty so the next flush retries the write."""
+    channel_id = write.channel_id
+    if channel_id not in ongoing_events:
+        # Deleted meanwhile; nothing left to retry
+        return
+    _pending_events[channel_id] = write.events + _pending_events.get(channel_id, [])
+    if write.snapshot is not None:
+        _snapshot_dirty.add(channel_id)
+    now = asyncio.get_running_loop().time()
+    _dirty_since.setdefault(channel_id, now)
+    _last_dirty[channel_id] = now
+
+async def _apply_writes(writes: list[Write]) -> None:
+    """Write to the backend and record the result; failed writes stay pending."""
+    try:
+        sigs = await backend().write(writes)
+    except BaseException:
+        for write in writes:
+            _requeue(write)
+        raise
+    for write, sig in zip(writes, sigs):
+        _written(write, sig)
+
+async def _write_through(writes: list[Write]) -> None:
+    """
+    _apply_writes, finished even if the caller is cancelled: the executor thread
+    can't be stopped, so a retry or a delete must not start until it is done.
+    """
+    task = asyncio.ensure_future(_apply_writes(writes))
+    try:
+        await asyncio.shield(task)
+    except asyncio.CancelledError:
+        # Keep holding the caller's locks until the thread is done, then give up
+        while not task.done():
+            try:
+                await asyncio.wait([task])
+            except asyncio.CancelledError:
+                pass
+        if not task.cancelled():
+            task.exception()
+        raise
+
+async def flush_state(channel_id: int) -> None:
+    """Write a channel's pending changes now, off the event loop."""
+    async with _locked(channel_id):
+        with metrics.timed("flush_state"):
+            write = _take_pending(channel_id)
+            if write is None:
+                return
+            await _write_through([write])
+
+async def flush_all() -> None:
+    """Flush every dirty channel in one backend write; called on shutdown."""
+    tasks = list(_flush_tasks.values())
+    _flush_tasks.clear()
+    for task in tasks:
+        task.cancel()
+    # A flush already writing finishes first, so its channel isn't written twice at once
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await _flush_many(list(_dirty_since))
+
+@asynccontextmanager
+async def batched_writes(channel_ids) -> AsyncIterator[None]:
+    """
+    Hold the write-behind flushes of these channels while the block runs, then
+    write all of them in one backend write (bulk imports).
+    """
+    ids = set(channel_ids) - _batched
+    _batched.update(ids)
+    try:
+        yield
+    finally:
+        _batched.difference_update(ids)
+        await _flush_many([c for c in ids if c in _dirty_since])
+        # A failed batch leaves its channels dirty; retry them the usual way
+        for channel_id in ids & _dirty_since.keys():
+            mark_dirty(channel_id)
+
+async def _flush_many(channels: list[int]) -> None:
+    for channel_id in channels:
+        task = _flush_tasks.pop(channel_id, None)
+        if task:
+            task.cancel()
+    channels = sorted(channels)
+    if not channels:
+        return
+    async with AsyncExitStack() as stack:
+        # Sorted, so two batched flushes can't deadlock each other
+        for channel_id in channels:
+            await stack.enter_async_context(_locked(channel_id))
+        writes = [w for w in map(_take_pending, channels) if w is not None]
+        if not writes:
+            return
+        try:
+            await _write_through(writes)
+        except Exception:
+            logger.exception("Failed flushing state for %d channels", len(writes))
+
+async def delete_state(channel_id: int, guild_id: Optional[int] = None) -> None:
+    """Drop a channel from memory and remove its file, discarding pending writes."""
+    bind_guild(channel_id, guild_id)
+    # Waits for a write already in progress; a later flush finds nothing to write
+    async with _locked(channel_id):
+        task = _flush_tasks.pop(channel_id, None)
+        if task:
+            task.cancel()
+        _dirty_since.pop(channel_id, None)
+        _last_dirty.pop(channel_id, None)
+        _pending_events.pop(channel_id, None)
+        _snapshot_dirty.discard(channel_id)
+        _journal_bytes.pop(channel_id, None)
+        _last_used.pop(channel_id, None)
+        _disk_sig.pop(channel_id, None)
+        _disk_checked.pop(channel_id, None)
+        _generation.pop(channel_id, None)
+        _ban_generation.pop(channel_id, None)
+        ongoing_events.pop(channel_id, None)
+        _notify_evict(channel_id)
+        await backend().delete(channel_id, _guild_of.get(channel_id))
+    _guild_of.pop(channel_id, None)
+
+
+async def list_matches(guild_id: Optional[int] = None) -> list[int]:
+    """Channels with stored state in a guild (None = guild-less)."""
+    return await backend().matches(guild_id)
+
+
+metrics.gauge("mapban_active_matches", "Matches currently loaded in memory", lambda: len(ongoing_events))
+metrics.gauge("mapban_dirty_matches", "Matches with changes not yet on disk", lambda: len(_dirty_since))
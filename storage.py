@@ -0,0 +1,566 @@
+"""
+Persistence backends for match state.
+
+state.py keeps matches in memory and decides *when* to write; a backend
+decides *how*. STATE_BACKEND=file (the default) keeps one snapshot plus an
+append-only journal per channel under STATE_DIR; STATE_BACKEND=sqlite keeps
+everything in one WAL-mode database (STATE_DB).
+
+    python storage.py migrate            # copy state/ files into STATE_DB
+"""
+import os
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import asyncio
+import logging
+import argparse
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, NamedTuple, Optional
+
+import model
+from events import apply_event
+from model import Match
+
+logger = logging.getLogger(__name__)
+
+# Directory for per-channel state files. A channel whose guild is known keeps
+# its files (and manifest) in STATE_DIR/<guild_id>/, so with shard-range
+# workers each process only reads and writes the directories of its guilds.
+STATE_DIR = "state"
+MANIFEST_NAME = "manifest.json"
+
+STATE_BACKEND = os.getenv("STATE_BACKEND", "file")
+STATE_DB = os.getenv("STATE_DB", os.path.join(STATE_DIR, "state.db"))
+# Most jobs one SQLite transaction may group together
+SQLITE_BATCH_MAX = int(os.getenv("STATE_SQLITE_BATCH_MAX", "256"))
+
+
+class Write(NamedTuple):
+    """One channel's pending change: a full snapshot or journal events."""
+    channel_id: int
+    guild_id: Optional[int]
+    match_id: Optional[str]
+    snapshot: Optional[str]       # JSON of the whole match; replaces any journal
+    events: list                  # journaled events when snapshot is None
+    journal: str                  # the same events as JSON lines
+
+
+class StateBackend(ABC):
+    """Where match state lives. Every coroutine runs its I/O off the event loop."""
+
+    @abstractmethod
+    async def read(self, channel_id: int, guild_id: Optional[int]) -> tuple[Match, int, tuple]:
+        """(state with journal replayed, journal size in bytes, signature)"""
+
+    @abstractmethod
+    def signature(self, channel_id: int, guild_id: Optional[int]) -> tuple:
+        """Cheap token that changes whenever the stored state does."""
+
+    @abstractmethod
+    async def write(self, writes: list[Write]) -> list[tuple]:
+        """Apply several channels' writes, atomically where the backend can; returns signatures."""
+
+    @abstractmethod
+    async def delete(self, channel_id: int, guild_id: Optional[int]) -> None:
+        ...
+
+    @abstractmethod
+    async def matches(self, guild_id: Optional[int]) -> list[int]:
+        """Every stored channel of a guild (None = guild-less)."""
+
+    @abstractmethod
+    async def active(self, guild_id: Optional[int]) -> list[int]:
+        """Channels of a guild whose match is still running."""
+
+    @abstractmethod
+    async def guilds(self) -> list[int]:
+        """Guilds with stored state."""
+
+    @abstractmethod
+    async def find_match(self, match_id: str) -> Optional[tuple[int, Optional[int]]]:
+        """(channel_id, guild_id) of a match by its match_id."""
+
+    def close(self) -> None:
+        pass
+
+
+# ─── JSON files ──────────────────────────────────────────────────────
+def _replace(path: str, text: str) -> None:
+    """Atomically replace a file; the temp name is unique, so concurrent writers can't share it."""
+    temp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temp, 'w') as f:
+            f.write(text)
+        os.replace(temp, path)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except FileNotFoundError:
+            pass
+        raise
+
+class FileBackend(StateBackend):
+    def __init__(self, directory: str = STATE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # Active-match manifest of each state directory (None = guild-less/legacy)
+        self._manifests: dict[Optional[int], set[int]] = {}
+        # One manifest write per directory at a time, so the newest set lands last
+        self._manifest_locks: dict[Optional[int], asyncio.Lock] = {}
+
+    def _guild_dir(self, guild_id: Optional[int]) -> str:
+        return self.directory if guild_id is None else os.path.join(self.directory, str(guild_id))
+
+    def state_file(self, channel_id: int, guild_id: Optional[int]) -> str:
+        return os.path.join(self._guild_dir(guild_id), f"state_{channel_id}.json")
+
+    def journal_file(self, channel_id: int, guild_id: Optional[int]) -> str:
+        return os.path.join(self._guild_dir(guild_id), f"state_{channel_id}.journal")
+
+    def signature(self, channel_id: int, guild_id: Optional[int]) -> tuple:
+        sig = []
+        for path in (self.state_file(channel_id, guild_id), self.journal_file(channel_id, guild_id)):
+            try:
+                st = os.stat(path)
+                sig.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                sig.append(None)
+        return tuple(sig)
+
+    def _write_snapshot(self, channel_id: int, guild_id: Optional[int], payload: str) -> tuple:
+        path = self.state_file(channel_id, guild_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _replace(path, payload)
+        # The snapshot now covers every journaled event
+        try:
+            os.remove(self.journal_file(channel_id, guild_id))
+        except FileNotFoundError:
+            pass
+        return self.signature(channel_id, guild_id)
+
+    def _append_journal(self, channel_id: int, guild_id: Optional[int], payload: str) -> tuple:
+        path = self.journal_file(channel_id, guild_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a') as f:
+            f.write(payload)
+        return self.signature(channel_id, guild_id)
+
+    def _write_all(self, writes: list[Write]) -> list[tuple]:
+        return [self._write_snapshot(w.channel_id, w.guild_id, w.snapshot) if w.snapshot is not None
+                else self._append_journal(w.channel_id, w.guild_id, w.journal)
+                for w in writes]
+
+    @staticmethod
+    def _read_journal(path: str, after_seq: int) -> list[dict]:
+        events: list[dict] = []
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-append
+                    logger.warning("Skipping corrupt journal line in %s", path)
+                    continue
+                # Skips lines the snapshot covers and any appended twice by a retried flush
+                if event.get("seq", 0) > after_seq:
+                    events.append(event)
+                    after_seq = event["seq"]
+        return events
+
+    def _adopt_legacy(self, channel_id: int, guild_id: Optional[int]) -> bool:
+        """Move a channel's files from STATE_DIR into its guild directory, if still there."""
+        if guild_id is None or os.path.exists(self.state_file(channel_id, guild_id)):
+            return False
+        moved = False
+        for name in (f"state_{channel_id}.json", f"state_{channel_id}.journal"):
+            legacy = os.path.join(self.directory, name)
+            if os.path.exists(legacy):
+                os.makedirs(self._guild_dir(guild_id), exist_ok=True)
+                os.replace(legacy, os.path.join(self._guild_dir(guild_id), name))
+                moved = True
+        return moved
+
+    def _read_state(self, channel_id: int, guild_id: Optional[int]) -> tuple[Match, int, tuple, bool]:
+        """Read a channel's snapshot and replay its journal; runs in the executor."""
+        adopted = self._adopt_legacy(channel_id, guild_id)
+        sig = self.signature(channel_id, guild_id)
+        path = self.state_file(channel_id, guild_id)
+        data = Match()
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    data = Match.from_wire(json.load(f))
+            except json.JSONDecodeError as e:
+                logger.warning("Corrupted JSON in %s: %s", path, e)
+        # Replay journaled events on top of the snapshot
+        journal = self.journal_file(channel_id, guild_id)
+        journal_bytes = 0
+        if os.path.exists(journal):
+            for event in self._read_journal(journal, data.journal_seq):
+                apply_event(data, event)
+            journal_bytes = os.path.getsize(journal)
+        return data, journal_bytes, sig, adopted
+
+    async def read(self, channel_id: int, guild_id: Optional[int]) -> tuple[Match, int, tuple]:
+        data, journal_bytes, sig, adopted = await asyncio.get_running_loop().run_in_executor(
+            None, self._read_state, channel_id, guild_id)
+        if adopted:
+            await self._manifest_set(None, channel_id, False)
+            await self._manifest_set(guild_id, channel_id, True)
+        return data, journal_bytes, sig
+
+    async def write(self, writes: list[Write]) -> list[tuple]:
+        sigs = await asyncio.get_running_loop().run_in_executor(None, self._write_all, writes)
+        for w in writes:
+            if w.snapshot is not None:
+                await self._manifest_set(w.guild_id, w.channel_id, True)
+        return sigs
+
+    async def delete(self, channel_id: int, guild_id: Optional[int]) -> None:
+        await self._manifest_set(guild_id, channel_id, False)
+        paths = [self.state_file(channel_id, guild_id), self.journal_file(channel_id, guild_id)]
+        if guild_id is not None:
+            # Files that were never moved out of the legacy location
+            await self._manifest_set(None, channel_id, False)
+            paths += [self.state_file(channel_id, None), self.journal_file(channel_id, None)]
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    # ─── Active-match manifest ──────────────────────────────────────
+    def list_state_files(self, guild_id: Optional[int] = None) -> list[str]:
+        directory = self._guild_dir(guild_id)
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(directory, fname)
+                for fname in names
+                if fname.startswith("state_") and fname.endswith(".json")]
+
+    def _load_manifest(self, guild_id: Optional[int] = None) -> set[int]:
+        manifest = self._manifests.get(guild_id)
+        if manifest is None:
+            try:
+                with open(os.path.join(self._guild_dir(guild_id), MANIFEST_NAME), 'r') as f:
+                    manifest = set(json.load(f)["active"])
+            except (FileNotFoundError, json.JSONDecodeError, KeyError):
+                # First run after upgrading: rebuild from the state files once
+                manifest = set(self._channels(guild_id))
+                if manifest:
+                    self._write_manifest(guild_id, sorted(manifest))
+            self._manifests[guild_id] = manifest
+        return manifest
+
+    def _write_manifest(self, guild_id: Optional[int], active: list[int]) -> None:
+        directory = self._guild_dir(guild_id)
+        os.makedirs(directory, exist_ok=True)
+        _replace(os.path.join(directory, MANIFEST_NAME), json.dumps({"active": active}))
+
+    async def _manifest_set(self, guild_id: Optional[int], channel_id: int, active: bool) -> None:
+        manifest = self._load_manifest(guild_id)
+        if (channel_id in manifest) == active:
+            return
+        if active:
+            manifest.add(channel_id)
+        else:
+            manifest.discard(channel_id)
+        lock = self._manifest_locks.setdefault(guild_id, asyncio.Lock())
+        async with lock:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._write_manifest, guild_id, sorted(manifest))
+
+    def _channels(self, guild_id: Optional[int]) -> list[int]:
+        return [int(os.path.basename(p)[len("state_"):-len(".json")])
+                for p in self.list_state_files(guild_id)]
+
+    async def matches(self, guild_id: Optional[int]) -> list[int]:
+        return await asyncio.get_running_loop().run_in_executor(None, self._channels, guild_id)
+
+    async def active(self, guild_id: Optional[int]) -> list[int]:
+        return sorted(self._load_manifest(guild_id))
+
+    async def guilds(self) -> list[int]:
+        try:
+            return [int(e.name) for e in os.scandir(self.directory) if e.is_dir() and e.name.isdigit()]
+        except FileNotFoundError:
+            return []
+
+    def _find_match(self, match_id: str, guilds: list[Optional[int]]) -> Optional[tuple[int, Optional[int]]]:
+        # No index on disk: open each snapshot until one matches
+        for guild_id in guilds:
+            for channel_id in self._channels(guild_id):
+                data, _, _, _ = self._read_state(channel_id, guild_id)
+                if data.match_id == match_id:
+                    return channel_id, guild_id
+        return None
+
+    async def find_match(self, match_id: str) -> Optional[tuple[int, Optional[int]]]:
+        guilds: list[Optional[int]] = [None, *await self.guilds()]
+        return await asyncio.get_running_loop().run_in_executor(None, self._find_match, match_id, guilds)
+
+
+# ─── SQLite ──────────────────────────────────────────────────────────
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    channel_id  INTEGER PRIMARY KEY,
+    guild_id    INTEGER,
+    match_id    TEXT,
+    snapshot    TEXT NOT NULL,
+    version     INTEGER NOT NULL DEFAULT 1,
+    updated_at  REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS matches_match_id ON matches(match_id) WHERE match_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS matches_guild ON matches(guild_id);
+CREATE TABLE IF NOT EXISTS events (
+    channel_id  INTEGER NOT NULL,
+    seq         INTEGER NOT NULL,
+    body        TEXT NOT NULL,
+    PRIMARY KEY (channel_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+class _Job:
+    __slots__ = ("fn", "args", "writes", "future", "loop")
+
+    def __init__(self, fn: Callable, args: tuple, writes: bool):
+        self.fn = fn
+        self.args = args
+        self.writes = writes
+        self.loop = asyncio.get_running_loop()
+        self.future: asyncio.Future = self.loop.create_future()
+
+    def resolve(self, result: Any, exc: Optional[BaseException]) -> None:
+        def _set() -> None:
+            if self.future.done():
+                return
+            if exc is not None:
+                self.future.set_exception(exc)
+            else:
+                self.future.set_result(result)
+        try:
+            self.loop.call_soon_threadsafe(_set)
+        except RuntimeError:
+            # The loop is gone (shutdown); nobody is waiting any more
+            pass
+
+
+class SQLiteBackend(StateBackend):
+    """
+    One WAL-mode database. All statements run on a single writer thread that
+    commits whatever has queued up since its last commit in one transaction.
+    """
+    def __init__(self, path: str = STATE_DB):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        conn.close()
+        # Signature checks run on the event loop thread with their own connection
+        self._reader = self._connect()
+        self._jobs: "queue.SimpleQueue[Optional[_Job]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._worker, name="state-sqlite", daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _worker(self) -> None:
+        conn = self._connect()
+        while True:
+            jobs = [self._jobs.get()]
+            while len(jobs) < SQLITE_BATCH_MAX:
+                try:
+                    jobs.append(self._jobs.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in jobs
+            self._run_batch(conn, [j for j in jobs if j is not None])
+            if stop:
+                break
+        conn.close()
+
+    @staticmethod
+    def _run_batch(conn: sqlite3.Connection, jobs: list[_Job]) -> None:
+        writing = any(j.writes for j in jobs)
+        results: list[tuple[_Job, Any, Optional[BaseException]]] = []
+        try:
+            if writing:
+                conn.execute("BEGIN IMMEDIATE")
+            for job in jobs:
+                # A savepoint per job so one failure doesn't undo the others
+                if writing:
+                    conn.execute("SAVEPOINT job")
+                try:
+                    result = job.fn(conn, *job.args)
+                except Exception as e:
+                    if writing:
+                        conn.execute("ROLLBACK TO job")
+                        conn.execute("RELEASE job")
+                    results.append((job, None, e))
+                else:
+                    if writing:
+                        conn.execute("RELEASE job")
+                    results.append((job, result, None))
+            if writing:
+                conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            results = [(job, None, e) for job in jobs]
+        for job, result, exc in results:
+            job.resolve(result, exc)
+
+    def _submit(self, fn: Callable, *args, writes: bool = False) -> asyncio.Future:
+        job = _Job(fn, args, writes)
+        self._jobs.put(job)
+        return job.future
+
+    # Statements; each runs on the writer thread
+    @staticmethod
+    def _read_row(conn: sqlite3.Connection, channel_id: int) -> tuple[Match, int, tuple]:
+        row = conn.execute("SELECT snapshot, version FROM matches WHERE channel_id = ?",
+                           (channel_id,)).fetchone()
+        data = Match.from_wire(json.loads(row[0])) if row else Match()
+        journal_bytes = 0
+        for (body,) in conn.execute("SELECT body FROM events WHERE channel_id = ? AND seq > ? ORDER BY seq",
+                                    (channel_id, data.journal_seq)):
+            apply_event(data, json.loads(body))
+            journal_bytes += len(body) + 1
+        return data, journal_bytes, (row[1] if row else None,)
+
+    @staticmethod
+    def _write_rows(conn: sqlite3.Connection, writes: list[Write]) -> list[tuple]:
+        now = time.time()
+        sigs = []
+        for w in writes:
+            if w.snapshot is not None:
+                conn.execute(
+                    "INSERT INTO matches (channel_id, guild_id, match_id, snapshot, version, updated_at) "
+                    "VALUES (?, ?, ?, ?, 1, ?) "
+                    "ON CONFLICT(channel_id) DO UPDATE SET guild_id = excluded.guild_id, "
+                    "match_id = excluded.match_id, snapshot = excluded.snapshot, "
+                    "version = version + 1, updated_at = excluded.updated_at",
+                    (w.channel_id, w.guild_id, w.match_id, w.snapshot, now))
+                # The snapshot covers every journaled event
+                conn.execute("DELETE FROM events WHERE channel_id = ?", (w.channel_id,))
+            else:
+                conn.executemany("INSERT OR REPLACE INTO events (channel_id, seq, body) VALUES (?, ?, ?)",
+                                 [(w.channel_id, e["seq"], json.dumps(e, separators=(",", ":")))
+                                  for e in w.events])
+                conn.execute(
+                    "INSERT INTO matches (channel_id, guild_id, snapshot, version, updated_at) "
+                    "VALUES (?, ?, '{}', 1, ?) "
+                    "ON CONFLICT(channel_id) DO UPDATE SET version = version + 1, "
+                    "updated_at = excluded.updated_at",
+                    (w.channel_id, w.guild_id, now))
+            version = conn.execute("SELECT version FROM matches WHERE channel_id = ?",
+                                   (w.channel_id,)).fetchone()[0]
+            sigs.append((version,))
+        return sigs
+
+    @staticmethod
+    def _delete_rows(conn: sqlite3.Connection, channel_id: int) -> None:
+        conn.execute("DELETE FROM events WHERE channel_id = ?", (channel_id,))
+        conn.execute("DELETE FROM matches WHERE channel_id = ?", (channel_id,))
+
+    @staticmethod
+    def _query(conn: sqlite3.Connection, sql: str, params: tuple) -> list:
+        return conn.execute(sql, params).fetchall()
+
+    # Interface
+    async def read(self, channel_id: int, guild_id: Optional[int]) -> tuple[Match, int, tuple]:
+        return await self._submit(self._read_row, channel_id)
+
+    def signature(self, channel_id: int, guild_id: Optional[int]) -> tuple:
+        row = self._reader.execute("SELECT version FROM matches WHERE channel_id = ?",
+                                   (channel_id,)).fetchone()
+        return (row[0] if row else None,)
+
+    async def write(self, writes: list[Write]) -> list[tuple]:
+        return await self._submit(self._write_rows, writes, writes=True)
+
+    async def delete(self, channel_id: int, guild_id: Optional[int]) -> None:
+        await self._submit(self._delete_rows, channel_id, writes=True)
+
+    async def matches(self, guild_id: Optional[int]) -> list[int]:
+        rows = await self._submit(self._query, "SELECT channel_id FROM matches WHERE guild_id IS ?",
+                                  (guild_id,))
+        return [r[0] for r in rows]
+
+    async def active(self, guild_id: Optional[int]) -> list[int]:
+        # Cleanup deletes a match's row, so every stored match is still running
+        return await self.matches(guild_id)
+
+    async def guilds(self) -> list[int]:
+        rows = await self._submit(self._query,
+                                  "SELECT DISTINCT guild_id FROM matches WHERE guild_id IS NOT NULL", ())
+        return [r[0] for r in rows]
+
+    async def find_match(self, match_id: str) -> Optional[tuple[int, Optional[int]]]:
+        rows = await self._submit(self._query,
+                                  "SELECT channel_id, guild_id FROM matches WHERE match_id = ?",
+                                  (match_id,))
+        return tuple(rows[0]) if rows else None
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._jobs.put(None)
+            self._thread.join()
+        self._reader.close()
+
+
+def open_backend(kind: str = STATE_BACKEND) -> StateBackend:
+    if kind == "sqlite":
+        return SQLiteBackend(STATE_DB)
+    if kind == "file":
+        return FileBackend(STATE_DIR)
+    raise ValueError(f"Unknown STATE_BACKEND {kind!r} (expected 'file' or 'sqlite')")
+
+# ─── Migration ───────────────────────────────────────────────────────
+async def migrate(src: StateBackend, dst: StateBackend) -> int:
+    """Copy every match from one backend to another; returns the number copied."""
+    copied = 0
+    for guild_id in [None, *await src.guilds()]:
+        writes = []
+        for channel_id in await src.matches(guild_id):
+            data, _, _ = await src.read(channel_id, guild_id)
+            writes.append(Write(channel_id, guild_id, data.match_id, model.dumps(data), [], ""))
+        if writes:
+            # One transaction per guild
+            await dst.write(writes)
+            copied += len(writes)
+    return copied
+
+async def _migrate_cli(args: argparse.Namespace) -> None:
+    src = FileBackend(args.state_dir)
+    dst = SQLiteBackend(args.db)
+    try:
+        copied = await migrate(src, dst)
+    finally:
+        dst.close()
+    print(f"Copied {copied} matches from {args.state_dir}/ into {args.db}. "
+          f"Set STATE_BACKEND=sqlite to use it; the JSON files were left in place.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Match state storage tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    mig = sub.add_parser("migrate", help="copy state_*.json files into the SQLite database")
+    mig.add_argument("--state-dir", default=STATE_DIR)
+    mig.add_argument("--db", default=STATE_DB)
+    args = parser.parse_args()
+    asyncio.run(_migrate_cli(args))
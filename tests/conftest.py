@@ -0,0 +1,17 @@
+import pytest
+
+
+@pytest.fixture
+def scratch(tmp_path, monkeypatch):
+    """Run in an empty directory, so state/ and its databases land there."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def fresh_state(scratch, monkeypatch):
+    """state.py with its own backend in the scratch directory."""
+    import state
+    monkeypatch.setattr(state, "_backend", None)
+    yield state
+    state.close_backend()
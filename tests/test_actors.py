@@ -0,0 +1,119 @@
+import asyncio
+import types
+
+import actors
+import events
+from combos import combo_index
+
+MAPS = ["Carentan", "Foy", "Kursk"]
+
+
+def test_jobs_of_one_match_run_one_at_a_time(fresh_state):
+    log = []
+
+    async def job(name):
+        log.append(f"{name} start")
+        await asyncio.sleep(0.01)
+        log.append(f"{name} end")
+        return name
+
+    async def run():
+        return await asyncio.gather(actors.submit(1, job, "a"), actors.submit(1, job, "b"),
+                                    actors.submit(2, job, "c"))
+
+    assert asyncio.run(run()) == ["a", "b", "c"]
+    # Channel 2 overlapped channel 1; channel 1's jobs didn't overlap each other
+    assert log.index("a end") < log.index("b start")
+    assert log.index("c start") < log.index("a end")
+
+def test_nested_submit_for_the_same_match_runs_inline(fresh_state):
+    async def inner():
+        return "inner"
+
+    async def outer():
+        return await actors.submit(1, inner)
+
+    assert asyncio.run(asyncio.wait_for(actors.submit(1, outer), 1)) == "inner"
+
+def test_queued_jobs_fail_when_the_actor_stops(fresh_state):
+    async def stuck():
+        await asyncio.sleep(10)
+
+    async def never():
+        raise AssertionError("ran after its actor stopped")
+
+    async def run():
+        first = asyncio.ensure_future(actors.submit(1, stuck))
+        second = asyncio.ensure_future(actors.submit(1, never))
+        await asyncio.sleep(0.01)
+        actors._actors[1].task.cancel()
+        return await asyncio.gather(first, second, return_exceptions=True)
+
+    first, second = asyncio.run(run())
+    assert isinstance(first, asyncio.CancelledError)
+    assert isinstance(second, actors.ActorStopped)
+    assert 1 not in actors._actors
+
+def test_readers_see_the_last_finished_job(fresh_state):
+    state = fresh_state
+    channel_id = 8201
+
+    async def run():
+        data = await state.ensure_loaded(channel_id)
+        data.map_bans = {m: 0 for m in MAPS}
+        state.bans_changed(channel_id)
+        # Between jobs the snapshot shares the live index
+        assert actors.combos(channel_id) is combo_index(channel_id)
+        before = actors.combos(channel_id)
+        seen = {}
+
+        async def ban():
+            await state.record_event(channel_id, events.BAN_RECORDED,
+                                     team_key="team_a", map="Foy", side="Allied")
+            await asyncio.sleep(0.01)
+
+        async def peek():
+            # While the ban job runs, readers keep the state from before it
+            seen["bans"] = actors.snapshot(channel_id).map_bans["Foy"]
+            seen["index"] = actors.combos(channel_id)
+
+        job = asyncio.ensure_future(actors.submit(channel_id, ban))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        await peek()
+        await job
+        assert seen == {"bans": 0, "index": before}
+        assert ("Foy", "team_a", "Allied") in before.open
+        after = actors.combos(channel_id)
+        assert after is combo_index(channel_id)
+        assert ("Foy", "team_a", "Allied") not in after.open
+        assert actors.snapshot(channel_id).map_bans["Foy"] != 0
+        await state.flush_all()
+
+    asyncio.run(run())
+
+def test_deferred_commands_are_acknowledged_before_they_queue(fresh_state):
+    log = []
+
+    class Response:
+        async def defer(self, **kwargs):
+            log.append(("defer", kwargs))
+
+    interaction = types.SimpleNamespace(channel=types.SimpleNamespace(id=1), response=Response())
+
+    @actors.serialized(defer=True, ephemeral=True)
+    async def command(interaction):
+        log.append("command")
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        log.append("slow done")
+
+    async def run():
+        first = asyncio.ensure_future(actors.submit(1, slow))
+        await asyncio.sleep(0)
+        await command(interaction)
+        await first
+
+    asyncio.run(run())
+    assert log == [("defer", {"ephemeral": True}), "slow done", "command"]
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+import archive
+import events
+from model import Match
+
+
+@pytest.fixture
+def arch(scratch, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_DB", str(scratch / "archive.db"))
+    monkeypatch.setattr(archive, "_local", threading.local())
+    monkeypatch.setattr(archive, "_schema_ready", False)
+    return archive
+
+
+def _match(match_id: str, teams: list, when: str, bans: list, final_map: str = None) -> Match:
+    data = Match()
+    data.match_id = match_id
+    data.created_at = "2025-01-01T00:00:00Z"
+    data.teams = teams
+    data.team_names = [f"Team {t}" for t in teams]
+    data.scheduled_time = when
+    data.update_history = [{"event": events.BAN_RECORDED, "team_key": team_key, "map": m,
+                            "side": side, "timestamp": when} for team_key, m, side in bans]
+    if final_map:
+        data.final = {"map": final_map, "sides": {}}
+    return data
+
+def test_records_are_written_once(arch):
+    data = _match("m1", [1, 2], "2025-03-01T18:00:00+00:00", [("team_a", "Foy", "Axis")])
+
+    async def run():
+        assert await arch.archive_match(data, 7, 70)
+        data.casters = ["changed"]
+        assert not await arch.archive_match(data, 7, 70)
+        assert not await arch.archive_match(Match())
+        record = await arch.get("m1")
+        assert record["guild_id"] == 7 and record["casters"] != ["changed"]
+        assert record["bans"] == [{"team": 1, "map": "Foy", "side": "Axis", "double": False,
+                                   "timestamp": "2025-03-01T18:00:00+00:00"}]
+        assert await arch.count() == 1
+
+    asyncio.run(run())
+
+def test_queries_by_team_map_and_date(arch):
+    season = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    matches = [
+        _match("old", [1, 2], "2025-02-01T18:00:00+00:00", [("team_a", "Foy", "Axis")], "Kursk"),
+        _match("a", [1, 3], "2025-03-02T18:00:00+00:00",
+               [("team_a", "Foy", "Axis"), ("team_b", "Kursk", "Allied")], "Kursk"),
+        # Not played yet: filed under its creation time
+        _match("b", [3, 1], "TBD", [("team_b", "Foy", "Axis")]),
+        _match("c", [2, 3], "2025-03-03T18:00:00+00:00", [("team_a", "Foy", "Allied")], "Foy"),
+    ]
+
+    async def run():
+        for data in matches:
+            await arch.archive_match(data)
+        assert [r["match_id"] for r in await arch.matches_for_team(1)] == ["a", "old", "b"]
+        assert [r["match_id"] for r in await arch.matches_for_team(1, since=season)] == ["a"]
+        assert [r["match_id"] for r in await arch.matches_on_map("Kursk")] == ["a", "old"]
+        assert [r["match_id"] for r in await arch.matches_between(until=season)] == ["old", "b"]
+        assert await arch.most_banned() == [("Foy", "Axis", 3), ("Foy", "Allied", 1), ("Kursk", "Allied", 1)]
+        assert await arch.most_banned(since=season, team_role=3) == [("Kursk", "Allied", 1)]
+
+    asyncio.run(run())
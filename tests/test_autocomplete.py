@@ -0,0 +1,33 @@
+import autocomplete
+from autocomplete import NameIndex
+
+NAMES = ["Sainte-Mère-Église", "Saint-Marie-du-Mont", "Purple Heart Lane", "Hürtgen Forest",
+         "El Alamein", "Carentan"]
+
+
+def _search(current: str) -> list[str]:
+    return [c.value for c in NameIndex(NAMES).search(current)]
+
+
+def test_accents_are_ignored():
+    assert _search("mere eglise") == ["Sainte-Mère-Église"]
+    assert _search("hurtgen") == ["Hürtgen Forest"]
+    assert _search("HÜRTGEN") == ["Hürtgen Forest"]
+
+def test_dashes_match_spaces_and_each_other():
+    assert _search("Sainte Mère") == ["Sainte-Mère-Église"]
+    # En dash, as pasted from a bracket sheet
+    assert _search("Sainte–Mère–Église") == ["Sainte-Mère-Église"]
+    assert _search("marie—du") == ["Saint-Marie-du-Mont"]
+
+def test_prefix_ranks_before_word_prefix_before_infix():
+    idx = NameIndex(["Omaha Beach", "Utah Beach", "Beach Road", "Seabeach"])
+    assert [c.value for c in idx.search("beach")] == ["Beach Road", "Omaha Beach", "Utah Beach", "Seabeach"]
+
+def test_allowed_filters_results():
+    idx = NameIndex(NAMES)
+    assert [c.value for c in idx.search("saint", lambda n: n != "Sainte-Mère-Église")] == ["Saint-Marie-du-Mont"]
+
+def test_result_is_capped():
+    idx = NameIndex([f"Map {i}" for i in range(60)])
+    assert len(idx.search("map")) == autocomplete.MAX_CHOICES
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+import bracket
+from benchmarks import fake_discord as fake
+
+CSV = """channel,role_a,role_b,time
+#match-1,<@&1>,<@&2>,2030-05-21T18:00:00-04:00
+#match-2,<@&3>,<@&4>,
+"""
+
+
+def test_csv_and_json_brackets_parse_alike():
+    rows = bracket.parse("﻿" + CSV, "bracket.csv")
+    assert rows == [bracket.Row(2, "#match-1", "<@&1>", "<@&2>", "2030-05-21T18:00:00-04:00"),
+                    bracket.Row(3, "#match-2", "<@&3>", "<@&4>", None)]
+    json_rows = bracket.parse('{"matches": [{"Channel": "#match-2", "role_a": "<@&3>", "role_b": "<@&4>"}]}')
+    assert json_rows == [bracket.Row(1, "#match-2", "<@&3>", "<@&4>", None)]
+
+@pytest.mark.parametrize("text", ["", "channel,role_a\n#x,<@&1>", "[1, 2]", "{not json"])
+def test_unreadable_brackets_are_refused(text):
+    with pytest.raises(bracket.BracketError):
+        bracket.parse(text)
+
+def test_bracket_over_the_row_limit_is_refused(monkeypatch):
+    monkeypatch.setattr(bracket, "MAX_ROWS", 1)
+    with pytest.raises(bracket.BracketError):
+        bracket.parse(CSV)
+
+
+@pytest.fixture
+def guild(fresh_state, monkeypatch):
+    guild = fake.Guild([fake.Role(i, f"Team {i}") for i in range(1, 5)])
+    channels = {f"#match-{i}": fake.TextChannel(guild) for i in range(1, 4)}
+    monkeypatch.setattr(bracket, "resolve_channel", lambda _guild, ref: channels.get(ref))
+    return guild, channels
+
+def test_import_reports_every_row(guild):
+    guild, channels = guild
+    state = bracket.state
+    rows = bracket.parse(CSV + "#match-1,<@&3>,<@&4>,\n#match-3,<@&1>,<@&9>,\n"
+                         "#nowhere,<@&1>,<@&2>,\n#match-3,<@&2>,<@&2>,\n")
+
+    async def run():
+        report = await bracket.import_bracket(guild, rows)
+        assert [line for line, _ in report.created] == [2, 3]
+        assert sorted(line for line, _ in report.failed) == [4, 5, 6, 7]
+        first = await state.ensure_loaded(channels["#match-1"].id)
+        assert first.teams == [1, 2] and first.scheduled_time.startswith("2030-05-21T22:00:00")
+        # Existing matches are skipped unless overwritten
+        again = await bracket.import_bracket(guild, rows[:1])
+        assert again.created == [] and [line for line, _ in again.skipped] == [2]
+        await state.flush_all()
+
+    asyncio.run(run())
+
+def test_overwrite_starts_from_a_fresh_match(guild):
+    guild, channels = guild
+    state = bracket.state
+    channel_id = channels["#match-2"].id
+    rows = bracket.parse(CSV)[1:]
+
+    async def run():
+        await bracket.import_bracket(guild, rows)
+        old = await state.ensure_loaded(channel_id)
+        old_id, old_seq = old.match_id, old.journal_seq
+        old.casters = ["https://twitch.tv/old"]
+        old.map_bans = {"Foy": 1}
+        await state.save_state(channel_id)
+
+        report = await bracket.import_bracket(guild, rows, overwrite=True)
+        assert [line for line, _ in report.created] == [3]
+        new = await state.ensure_loaded(channel_id)
+        assert new.match_id != old_id
+        assert not new.casters and new.map_bans.get("Foy", 0) == 0
+        assert new.journal_seq > old_seq
+        await state.flush_all()
+
+    asyncio.run(run())
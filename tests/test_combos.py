@@ -0,0 +1,70 @@
+import asyncio
+import random
+
+import events
+import state
+from combos import ComboIndex, combo_index
+from model import Match
+
+MAPS = ["Carentan", "Foy", "Hill 400", "Kursk", "Omaha Beach", "Sainte-Mère-Église"]
+
+
+def _same(a: ComboIndex, b: ComboIndex) -> None:
+    assert a.open == b.open
+    assert +a.per_map == +b.per_map
+    assert +a.per_map_side == +b.per_map_side
+    assert a.maps() == b.maps()
+    assert a.remaining() == b.remaining()
+
+def _bans(seed: int):
+    rng = random.Random(seed)
+    slots = [(m, t, s) for m in MAPS for t in ("team_a", "team_b") for s in events.SIDES]
+    rng.shuffle(slots)
+    # Some land on slots an earlier ban already closed; those must change nothing
+    for seq, (m, team_key, side) in enumerate(slots[:10], start=1):
+        yield events.make_event(events.BAN_RECORDED, seq, team_key=team_key, map=m, side=side)
+
+
+def test_incremental_index_matches_rebuilt():
+    for seed in range(20):
+        data = Match()
+        data.map_bans = {m: 0 for m in MAPS}
+        idx = ComboIndex(data, 0)
+        for event in _bans(seed):
+            events.apply_event(data, event)
+            idx.apply(event)
+            _same(idx, ComboIndex(data, 0))
+
+def test_non_ban_events_leave_index_alone():
+    data = Match()
+    data.map_bans = {m: 0 for m in MAPS}
+    idx = ComboIndex(data, 0)
+    before = set(idx.open)
+    idx.apply(events.make_event(events.TURN_FLIPPED, 1, new_turn_index=1))
+    assert idx.open == before
+
+def test_state_keeps_index_in_step_with_record_event(scratch, monkeypatch):
+    channel_id = 7001
+    builds = []
+    init = ComboIndex.__init__
+    monkeypatch.setattr(ComboIndex, "__init__", lambda self, *a: builds.append(a) or init(self, *a))
+
+    async def run():
+        data = await state.ensure_loaded(channel_id)
+        data.map_bans = {m: 0 for m in MAPS}
+        state.bans_changed(channel_id)
+        idx = combo_index(channel_id)
+        for event in _bans(3):
+            before = set(idx.open)
+            fields = {k: event[k] for k in ("team_key", "map", "side")}
+            await state.record_event(channel_id, events.BAN_RECORDED, **fields)
+            await state.record_event(channel_id, events.TURN_FLIPPED, new_turn_index=event["seq"] % 2)
+            # A new index for the new bans; the old one, maybe held by a snapshot, is left alone
+            assert idx.open == before
+            idx = combo_index(channel_id)
+            _same(idx, ComboIndex(data, 0))
+        await state.flush_all()
+
+    asyncio.run(run())
+    # One full scan up front plus the comparisons above; bans never rebuilt it
+    assert len(builds) == 1 + 10
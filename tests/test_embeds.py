@@ -0,0 +1,47 @@
+import embeds
+import events
+from model import Match
+
+
+def _ban(i: int) -> dict:
+    return {"event": events.BAN_RECORDED, "team_key": "team_a" if i % 2 else "team_b",
+            "map": f"Map {i}", "side": "Axis", "timestamp": "2025-03-01T18:00:00+00:00"}
+
+def _match(n: int) -> Match:
+    data = Match()
+    data.teams = [111, 222]
+    data.update_history = [_ban(i) for i in range(n)]
+    return data
+
+def test_history_chunks_grow_like_a_full_rechunk():
+    data = _match(0)
+    chunks = embeds.HistoryChunks()
+    for i in range(80):
+        data.update_history.append(_ban(i) if i % 7 else {"event": "note", "text": "x" * (i * 13)})
+        assert chunks.update(data) == embeds.chunk_history_lines(embeds.history_lines(data))
+    # A reloaded match brings a new list: rebuilt from scratch
+    data.update_history = data.update_history[:3]
+    assert chunks.update(data) == embeds.chunk_history_lines(embeds.history_lines(data))
+
+def _history_fields(embed) -> list:
+    return [f for f in embed.fields if f.name.startswith("Update History")]
+
+def test_short_history_is_shown_in_full():
+    data = _match(30)
+    embed = embeds.build_status_embed(data)
+    assert "\n".join(f.value for f in _history_fields(embed)) == "\n".join(embeds.history_lines(data))
+
+def test_long_history_keeps_the_embed_within_discords_limits():
+    data = _match(600)
+    embed = embeds.build_status_embed(data)
+    assert len(embed) <= embeds.EMBED_CHARS_MAX
+    assert len(embed.fields) <= embeds.EMBED_FIELDS_MAX
+    fields = _history_fields(embed)
+    lines = embeds.history_lines(data)
+    shown = [line for f in fields[1:] for line in f.value.split("\n")]
+    # The newest updates are kept; the rest are counted in a summary
+    assert shown == lines[-len(shown):]
+    assert fields[0].value == f"… {len(lines) - len(shown)} earlier updates not shown"
+    # History sits before the turn fields, as it does when it fits
+    names = [f.name for f in embed.fields]
+    assert names.index(fields[-1].name) < names.index("Current Turn:")
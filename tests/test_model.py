@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+import model
+from model import AUTO, MANUAL, OPEN, Match
+
+
+# A free-form (v1) snapshot as written before model.Match existed
+V1 = {
+    "teams": [111, 222],
+    "team_names": ["Alpha", "Bravo"],
+    "current_turn_index": 1,
+    "scheduled_time": "2026-05-25T19:00-04:00",
+    "firstban": False,
+    "embed_message_id": 999,
+    "some_removed_field": "dropped",
+    "update_history": "Coin flip: Alpha won",
+    "Carentan": {"team_a": {"manual": ["Allied"], "auto": []},
+                 "team_b": {"manual": [], "auto": ["Axis"]}},
+    "Foy": {"team_a": {"manual": [], "auto": []},
+            "team_b": {"manual": [], "auto": []}},
+}
+
+
+def test_v1_snapshot_reads_into_match():
+    m = Match.from_wire(V1)
+    assert m.teams == [111, 222]
+    assert m.current_turn_index == 1
+    assert m.firstban is False
+    assert m.slot("Carentan", "team_a", "Allied") == MANUAL
+    assert m.slot("Carentan", "team_b", "Axis") == AUTO
+    assert m.slot("Carentan", "team_a", "Axis") == OPEN
+    assert list(m.map_bans) == ["Carentan", "Foy"] and m.map_bans["Foy"] == 0
+    assert m.update_history == [{"event": "note", "text": "Coin flip: Alpha won"}]
+    assert not hasattr(m, "some_removed_field")
+
+
+def test_v1_to_v2_round_trip():
+    m = Match.from_wire(V1)
+    wire = json.loads(model.dumps(m))
+    assert wire["v"] == model.WIRE_VERSION
+    # Defaults are left out of the compact form
+    assert "host_role" not in wire and "casters" not in wire
+
+    again = model.loads(json.dumps(wire))
+    for name in Match.__slots__:
+        assert getattr(again, name) == getattr(m, name), name
+    assert again.to_wire() == wire
+
+
+def test_newer_snapshot_version_is_refused():
+    with pytest.raises(ValueError):
+        Match.from_wire({"v": model.WIRE_VERSION + 1})
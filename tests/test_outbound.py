@@ -0,0 +1,83 @@
+import asyncio
+
+import outbound
+from benchmarks import fake_discord as fake
+
+
+def _message() -> fake.Message:
+    channel = fake.TextChannel(fake.Guild([]))
+    msg = fake.Message(channel)
+    channel.messages[msg.id] = msg
+    return msg
+
+
+def test_queued_edits_of_one_message_coalesce():
+    async def run():
+        msg = _message()
+        before = fake.calls["edit"]
+        futures = [outbound.edit(msg, content=str(i)) for i in range(5)]
+        assert len({id(f) for f in futures}) == 1
+        assert outbound.queue_depth(msg.channel.id) == 1
+        await futures[-1]
+        return msg, fake.calls["edit"] - before
+
+    msg, edits = asyncio.run(run())
+    assert edits == 1
+    assert msg.content == "4"
+
+def test_edit_after_send_started_is_queued_again():
+    async def run():
+        msg = _message()
+        before = fake.calls["edit"]
+        first = outbound.edit(msg, content="a")
+        await first
+        second = outbound.edit(msg, content="b")
+        assert second is not first
+        await second
+        return msg, fake.calls["edit"] - before
+
+    msg, edits = asyncio.run(run())
+    assert edits == 2
+    assert msg.content == "b"
+
+def test_coalesced_edit_takes_the_more_urgent_priority():
+    async def run():
+        msg = _message()
+        order = []
+        # Nothing goes out before the drain task first runs, so all three are queued
+        sent = outbound.add_reaction(msg, "🇦", priority=outbound.NORMAL)
+        sent.add_done_callback(lambda f: order.append("react"))
+        edited = outbound.edit(msg, content="low", priority=outbound.LOW)
+        edited.add_done_callback(lambda f: order.append("edit"))
+        outbound.edit(msg, content="high", priority=outbound.HIGH)
+        await asyncio.gather(sent, edited)
+        return msg, order
+
+    msg, order = asyncio.run(run())
+    assert order == ["edit", "react"]
+    assert msg.content == "high"
+
+def test_grid_post_is_recorded_on_the_match(fresh_state):
+    import helpers
+    state = fresh_state
+    channel = fake.TextChannel(fake.Guild([]))
+
+    async def run():
+        data = await state.ensure_loaded(channel.id, channel.guild.id)
+        data.match_id = "m1"
+        data.teams = [1, 2]
+        data.map_bans = {"Carentan": 0, "Foy": 0}
+        await state.save_state(channel.id)
+        await helpers.send_remaining_maps_embed(channel, list(data.map_bans), data)
+        # The job returns before the grid goes out
+        assert data.grid_msg_id is None
+        while helpers._recording or outbound.queue_depth(channel.id) or not data.grid_msg_id:
+            await asyncio.sleep(0.01)
+        await state.flush_all()
+        state.evict(channel.id)
+        return data.grid_msg_id, await state.ensure_loaded(channel.id, channel.guild.id)
+
+    grid_id, reloaded = asyncio.run(asyncio.wait_for(run(), 5))
+    assert grid_id in channel.messages
+    # Journaled, so it survives a restart
+    assert reloaded.grid_msg_id == grid_id
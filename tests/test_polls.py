@@ -0,0 +1,98 @@
+import asyncio
+import types
+
+import pytest
+
+import embeds
+import outbound
+import polls
+from benchmarks import fake_discord as fake
+
+GUILD = 77
+POLL = 5550
+
+
+def _reaction(channel_id: int, user_id: int, emoji: str, message_id: int = POLL, bot: bool = False):
+    member = types.SimpleNamespace(bot=bot)
+    return types.SimpleNamespace(message_id=message_id, channel_id=channel_id, guild_id=GUILD,
+                                 user_id=user_id, emoji=emoji, member=member)
+
+@pytest.fixture
+def poll_state(fresh_state, monkeypatch):
+    monkeypatch.setattr(polls, "_polls", {})
+    monkeypatch.setattr(polls, "_misses", set())
+    monkeypatch.setattr(polls, "POLL_FLUSH_INTERVAL", 0.05)
+    removed = []
+    monkeypatch.setattr(outbound, "remove_reaction", lambda *a, **k: removed.append(a))
+    return fresh_state, removed
+
+async def _match_with_poll(state, channel_id: int):
+    data = await state.ensure_loaded(channel_id, GUILD)
+    data.match_id = f"m{channel_id}"
+    data.teams = [1, 2]
+    data.team_names = ["Team A", "Team B"]
+    data.poll_msg_id = POLL
+    await state.save_state(channel_id)
+    await state.flush_all()
+    return data
+
+
+def test_reactions_outside_matches_load_nothing(poll_state, monkeypatch):
+    state, _ = poll_state
+    reads = []
+
+    async def run():
+        await _match_with_poll(state, 9001)
+        b = state.backend()
+        read = b.read
+        monkeypatch.setattr(b, "read", lambda *a: reads.append(a) or read(*a))
+        for user in range(5):
+            await polls.on_reaction_add(_reaction(9002, user, "🇦", message_id=6000 + user), None)
+
+    asyncio.run(run())
+    assert reads == []
+    assert 9002 not in state.ongoing_events
+
+def test_one_vote_per_user_and_moved_votes(poll_state):
+    state, removed = poll_state
+    channel = fake.TextChannel(fake.Guild([]))
+    ch = channel.id
+
+    async def run():
+        data = await _match_with_poll(state, ch)
+        await embeds.send_status_embed(channel, data)
+        await polls.on_reaction_add(_reaction(ch, 1, "🇦"), channel)
+        await polls.on_reaction_add(_reaction(ch, 2, "🇦"), channel)
+        await polls.on_reaction_add(_reaction(ch, 2, "🇧"), channel)
+        # Other bots' letters and unrelated emoji don't count
+        await polls.on_reaction_add(_reaction(ch, 3, "🇦", bot=True), channel)
+        await polls.on_reaction_add(_reaction(ch, 4, "👍"), channel)
+        assert polls.totals(data) == (1, 1)
+        # The removal that follows the bot taking off user 2's 🇦 changes nothing
+        await polls.on_reaction_remove(_reaction(ch, 2, "🇦"), channel)
+        assert polls.totals(data) == (1, 1)
+        await polls.on_reaction_remove(_reaction(ch, 1, "🇦"), channel)
+        assert polls.totals(data) == (0, 1)
+        await asyncio.sleep(0.2)
+        return data
+
+    data = asyncio.run(run())
+    assert [r[1] for r in removed] == ["🇦"]
+    # Written to the match, and shown on its status embed, after POLL_FLUSH_INTERVAL
+    assert data.poll_votes == {"2": 1}
+    embed = channel.messages[data.embed_message_id].embeds[0]
+    field, = [f for f in embed.fields if f.name == "Winner Predictions"]
+    assert field.value == embeds.prediction_lines(("Team A", "Team B"), (0, 1))
+
+def test_flush_all_writes_unflushed_votes(poll_state, monkeypatch):
+    state, _ = poll_state
+    monkeypatch.setattr(polls, "POLL_FLUSH_INTERVAL", 60)
+
+    async def run():
+        data = await _match_with_poll(state, 9004)
+        await polls.on_reaction_add(_reaction(9004, 1, "🇧"), None)
+        assert data.poll_votes == {}
+        await polls.flush_all()
+        return data
+
+    assert asyncio.run(run()).poll_votes == {"1": 1}
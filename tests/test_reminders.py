@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import reminders
+import scheduler
+from tests.test_scheduler import _Channel, _fresh
+
+OFFSETS = reminders.parse_offsets("24h,1h,10m")
+
+
+@pytest.fixture
+def sched(fresh_state, monkeypatch):
+    monkeypatch.setattr(scheduler, "SCHEDULER_DB", "scheduler.db")
+    monkeypatch.setattr(reminders, "OFFSETS", OFFSETS)
+    _fresh(monkeypatch)
+    yield fresh_state
+    scheduler.close()
+
+
+def _in(**delta) -> str:
+    return (datetime.now(timezone.utc) + timedelta(**delta)).isoformat()
+
+
+def test_parse_offsets():
+    assert OFFSETS == [("24h", 86400), ("1h", 3600), ("10m", 600)]
+    assert reminders.parse_offsets(" 5M, ,2d") == [("2d", 172800), ("5m", 300)]
+    with pytest.raises(ValueError):
+        reminders.parse_offsets("soon")
+
+def test_only_reminders_still_ahead_are_scheduled(sched):
+    async def run():
+        assert reminders.schedule(1, 10, "m1", _in(days=2)) == 3
+        # A new time replaces the old reminders rather than adding to them
+        assert reminders.schedule(1, 10, "m1", _in(minutes=30)) == 1
+        assert scheduler.pending(reminders.REMINDER) == 1
+        assert reminders.schedule(2, 10, "m2", "TBD") == 0
+        reminders.cancel(1)
+        assert scheduler.pending(reminders.REMINDER) == 0
+
+    asyncio.run(run())
+
+def test_reminder_is_sent_once_for_the_current_match_time(sched, monkeypatch):
+    state = sched
+    sent = []
+
+    async def send(channel, **kwargs):
+        sent.append(kwargs["content"])
+    monkeypatch.setattr(reminders.outbound, "send", send)
+
+    def job(offset: int, **data) -> scheduler.Job:
+        return scheduler.Job(f"j{offset}", 0, reminders.REMINDER, None, 1, {"seconds": offset, **data})
+
+    async def run():
+        start = _in(minutes=30)
+        data = await state.ensure_loaded(1)
+        data.match_id, data.scheduled_time, data.teams = "m1", start, [11, 12]
+        # After downtime: several due at once, plus one from an earlier time
+        await reminders._remind(_Channel(1), [
+            job(3600, match_id="m1", scheduled_time=start),
+            job(600, match_id="m1", scheduled_time=start),
+            job(60, match_id="m1", scheduled_time=_in(minutes=5)),
+        ])
+        await reminders._remind(_Channel(1), [job(600, match_id="old", scheduled_time=start)])
+
+    asyncio.run(run())
+    assert len(sent) == 1
+    assert sent[0].startswith("⏰ Match starts in 10 minutes") and "<@&11> vs <@&12>" in sent[0]
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+
+import pytest
+
+import render
+from model import AUTO, MANUAL, OPEN
+
+MAPS = ("Carentan", "Foy")
+TEAMS = ("Alpha", "Bravo")
+OPEN_GRID = ((OPEN,) * 4, (OPEN,) * 4)
+BANNED_GRID = ((OPEN,) * 4, (MANUAL, OPEN, AUTO, OPEN))
+
+
+@pytest.fixture
+def fresh_render(monkeypatch):
+    """render.py with an empty cache and no worker pool yet."""
+    monkeypatch.setattr(render, "_png_cache", type(render._png_cache)())
+    monkeypatch.setattr(render, "_inflight", {})
+    monkeypatch.setattr(render, "_queued", 0)
+    monkeypatch.setattr(render, "_executor", None)
+    monkeypatch.setattr(render, "_slots", None)
+    yield render
+    render.shutdown()
+
+
+def _cell_colour(img, row: int, col: int):
+    xs = [render.MARGIN, render.MARGIN + render.CELL_W,
+          render.MARGIN + render.CELL_W*2 + render.MAP_W, render.MARGIN + render.CELL_W*3 + render.MAP_W]
+    y = render.MARGIN + render.GROUP_H + render.HEADER_H + row*render.CELL_H
+    return img.getpixel((xs[col] + 2, y + 2))
+
+
+def test_banned_cells_are_drawn_over_the_open_frame(fresh_render):
+    img = render.render_grid(MAPS, BANNED_GRID, TEAMS)
+    assert _cell_colour(img, 1, 0) == (255, 0, 0)
+    assert _cell_colour(img, 1, 2) == (255, 165, 0)
+    assert _cell_colour(img, 1, 1) == (255, 255, 255)
+    # The cached frame itself is never drawn on
+    assert render.render_grid(MAPS, OPEN_GRID, TEAMS).tobytes() == \
+        render._static_frame(MAPS, TEAMS).tobytes()
+
+
+def test_pngs_are_cached_by_ban_state(fresh_render, monkeypatch):
+    monkeypatch.setattr(render, "PNG_CACHE_SIZE", 2)
+    encodes = []
+    encode = render.encode_grid
+    monkeypatch.setattr(render, "encode_grid", lambda *a: encodes.append(a) or encode(*a))
+
+    first = render.render_grid_png(MAPS, OPEN_GRID, TEAMS)
+    assert render.render_grid_png(MAPS, OPEN_GRID, TEAMS) is first
+    assert len(encodes) == 1
+    render.render_grid_png(MAPS, BANNED_GRID, TEAMS)
+    render.render_grid_png(MAPS, BANNED_GRID, ("Alpha", "Charlie"))
+    # Least recently used went first
+    assert len(render._png_cache) == 2
+    render.render_grid_png(MAPS, OPEN_GRID, TEAMS)
+    assert len(encodes) == 4
+
+
+def _blocked_encodes(monkeypatch) -> tuple[list, threading.Event]:
+    """Make encode_grid wait for the returned event; returns the calls it saw."""
+    encodes, release = [], threading.Event()
+    encode = render.encode_grid
+
+    def blocked(*a):
+        encodes.append(a)
+        release.wait(5)
+        return encode(*a)
+    monkeypatch.setattr(render, "encode_grid", blocked)
+    return encodes, release
+
+def test_identical_renders_share_one_job(fresh_render, monkeypatch):
+    encodes, release = _blocked_encodes(monkeypatch)
+
+    async def run():
+        callers = [asyncio.ensure_future(render.render_grid_png_async(MAPS, BANNED_GRID, TEAMS))
+                   for _ in range(3)]
+        await asyncio.sleep(0.05)
+        # A caller that gives up doesn't take the render down with it
+        callers[0].cancel()
+        release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert isinstance(results[0], asyncio.CancelledError)
+        assert results[1] == results[2] == render.render_grid_png(MAPS, BANNED_GRID, TEAMS)
+        assert render.queue_depth() == 0 and not render._inflight
+
+    asyncio.run(run())
+    assert len(encodes) == 1
+
+def test_renders_past_the_queue_limit_are_refused(fresh_render, monkeypatch):
+    monkeypatch.setattr(render, "RENDER_QUEUE_MAX", 1)
+    _, release = _blocked_encodes(monkeypatch)
+
+    async def run():
+        first = asyncio.ensure_future(render.render_grid_png_async(MAPS, OPEN_GRID, TEAMS))
+        await asyncio.sleep(0.01)
+        assert render.queue_depth() == 1
+        with pytest.raises(render.RenderQueueFull):
+            await render.render_grid_png_async(MAPS, BANNED_GRID, TEAMS)
+        # The same grid joins the pending render instead
+        second = asyncio.ensure_future(render.render_grid_png_async(MAPS, OPEN_GRID, TEAMS))
+        release.set()
+        assert await first == await second
+        assert render.queue_depth() == 0
+
+    asyncio.run(run())
@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+import pytest
+
+import scheduler
+
+
+def _fresh(monkeypatch) -> None:
+    """A scheduler as a newly started process sees it; the database is kept."""
+    for name, value in (("_jobs", {}), ("_heap", []), ("_wake", None), ("_runner", None),
+                        ("_running", set()), ("_to_save", {}), ("_to_delete", set()),
+                        ("_persist_task", None), ("_conn", None), ("_get_channel", None)):
+        monkeypatch.setattr(scheduler, name, value)
+
+@pytest.fixture
+def sched(scratch, monkeypatch):
+    monkeypatch.setattr(scheduler, "SCHEDULER_DB", str(scratch / "scheduler.db"))
+    monkeypatch.setattr(scheduler, "_handlers", {})
+    _fresh(monkeypatch)
+    yield monkeypatch
+    scheduler.close()
+
+
+class _Channel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+
+
+def test_pending_jobs_resume_after_restart(sched):
+    ran = []
+
+    async def handler(channel, jobs):
+        ran.extend((channel.id, j.data["n"]) for j in jobs)
+
+    async def first_run():
+        await scheduler.start(_Channel)
+        scheduler.schedule("test", 1, 0.5, n=1)
+        scheduler.schedule("test", 2, 0.5, n=2)
+        gone = scheduler.schedule("test", 3, 0.5, n=3)
+        scheduler.cancel(gone.id)
+        # Stopped before anything fell due
+        scheduler.close()
+
+    async def second_run():
+        scheduler.register("test", handler)
+        await scheduler.start(_Channel)
+        assert scheduler.pending("test") == 2
+        await asyncio.sleep(0.8)
+        await asyncio.sleep(scheduler.PERSIST_DELAY + 0.1)
+
+    asyncio.run(first_run())
+    assert ran == []
+    _fresh(sched)
+    asyncio.run(second_run())
+    assert sorted(ran) == [(1, 1), (2, 2)]
+    # Ran once: nothing left for a third start
+    scheduler.close()
+    _fresh(sched)
+    assert scheduler._read() == []
+
+def test_overdue_jobs_run_on_start(sched):
+    ran = []
+
+    async def handler(channel, jobs):
+        ran.extend(j.data["n"] for j in jobs)
+
+    scheduler._write([scheduler.Job("late", time.time() - 60, "test", None, 5, {"n": 1})], [])
+    scheduler.register("test", handler)
+
+    async def run():
+        await scheduler.start(_Channel)
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+    assert ran == [1]
+
+def test_rescheduling_a_key_replaces_the_stored_job(sched):
+    async def run():
+        await scheduler.start(_Channel)
+        scheduler.schedule("test", 1, 60, key="k", n=1)
+        scheduler.schedule("test", 1, 120, key="k", n=2)
+        await asyncio.sleep(scheduler.PERSIST_DELAY + 0.1)
+
+    asyncio.run(run())
+    stored = scheduler._read()
+    assert [(j.id, j.data) for j in stored] == [("k", {"n": 2})]
+
+def test_batch_of_one_channel_is_handled_together(sched):
+    batches = []
+
+    async def handler(channel, jobs):
+        batches.append(sorted(j.data["n"] for j in jobs))
+
+    scheduler.register("test", handler)
+
+    async def run():
+        await scheduler.start(_Channel)
+        for n in range(3):
+            scheduler.schedule("test", 9, 0.05 + n * 0.05, n=n)
+        await asyncio.sleep(0.4)
+
+    asyncio.run(run())
+    assert batches == [[0, 1, 2]]
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import time
+
+import actors
+import model
+import storage
+from model import Match
+
+
+def test_disk_check_runs_at_most_once_per_interval(fresh_state, monkeypatch):
+    state = fresh_state
+    channel_id = 8101
+    checks = []
+
+    async def run():
+        b = state.backend()
+        signature = b.signature
+        monkeypatch.setattr(b, "signature", lambda *a: checks.append(a) or signature(*a))
+        await state.ensure_loaded(channel_id)
+        for _ in range(50):
+            await state.ensure_loaded(channel_id)
+        assert len(checks) <= 1
+
+        # Changed outside the bot: noticed once the interval has passed
+        outside = Match()
+        outside.match_id = "outside"
+        await b.write([storage.Write(channel_id, None, "outside", model.dumps(outside), [], "")])
+        assert (await state.ensure_loaded(channel_id)).match_id is None
+        monkeypatch.setattr(state, "WATCH_INTERVAL", 0)
+        assert (await state.ensure_loaded(channel_id)).match_id == "outside"
+
+    asyncio.run(run())
+
+
+def _slow_writes(monkeypatch, b, seconds: float) -> list:
+    """Make the file backend's writes take a while in their thread; returns (start, end) spans."""
+    spans = []
+    write_all = b._write_all
+
+    def slow(writes):
+        start = time.monotonic()
+        time.sleep(seconds)
+        try:
+            return write_all(writes)
+        finally:
+            spans.append((start, time.monotonic()))
+    monkeypatch.setattr(b, "_write_all", slow)
+    return spans
+
+def test_delete_during_a_write_does_not_bring_the_match_back(fresh_state, monkeypatch):
+    state = fresh_state
+    monkeypatch.setattr(state, "FLUSH_DELAY", 0)
+    channel_id = 8102
+
+    async def run():
+        b = state.backend()
+        _slow_writes(monkeypatch, b, 0.2)
+        data = await state.ensure_loaded(channel_id)
+        data.match_id = "doomed"
+        await state.save_state(channel_id)
+        await asyncio.sleep(0.05)
+        # The snapshot is being written in its thread right now
+        await state.delete_state(channel_id)
+        await asyncio.sleep(0.3)
+        return b
+
+    b = asyncio.run(run())
+    assert not os.path.exists(b.state_file(channel_id, None))
+    assert channel_id not in state._dirty_since
+    assert channel_id not in state._pending_events
+    assert channel_id not in state._snapshot_dirty
+    assert channel_id not in state.ongoing_events
+
+def test_flush_all_waits_for_a_write_in_progress(fresh_state, monkeypatch):
+    state = fresh_state
+    monkeypatch.setattr(state, "FLUSH_DELAY", 0)
+    channel_id = 8103
+
+    async def run():
+        b = state.backend()
+        spans = _slow_writes(monkeypatch, b, 0.2)
+        data = await state.ensure_loaded(channel_id)
+        data.match_id = "first"
+        await state.save_state(channel_id)
+        await asyncio.sleep(0.05)
+        data.match_id = "second"
+        await state.save_state(channel_id)
+        await state.flush_all()
+        return b, spans
+
+    b, spans = asyncio.run(run())
+    assert len(spans) == 2
+    # One after the other, never two threads on the same file
+    (_, first_end), (second_start, _) = sorted(spans)
+    assert second_start >= first_end
+    with open(b.state_file(channel_id, None)) as f:
+        assert model.loads(f.read()).match_id == "second"
+    assert channel_id not in state._dirty_since
+
+
+def test_lru_eviction_skips_matches_held_by_a_handler(fresh_state, monkeypatch):
+    state = fresh_state
+    monkeypatch.setattr(state, "CACHE_MAX", 1)
+
+    async def run():
+        await state.ensure_loaded(8111)
+        await state.ensure_loaded(8112)
+        # Clean and over the limit: the older channel goes
+        assert 8111 not in state.ongoing_events
+
+        async def job():
+            data = await state.ensure_loaded(8113)
+            await state.ensure_loaded(8114)
+            await state.ensure_loaded(8115)
+            # Still the live object the handler holds
+            assert state.ongoing_events[8113] is data
+
+        await actors.submit(8113, job)
+        await state.ensure_loaded(8116)
+        assert 8113 not in state.ongoing_events
+        assert list(state.ongoing_events) == [8116]
+
+    asyncio.run(run())
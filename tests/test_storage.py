@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+import random
+import time
+
+import pytest
+
+import events
+import model
+import storage
+from model import MANUAL, Match
+
+CHANNEL = 42
+
+
+def _ban(seq: int, map_name: str, team_key: str = "team_a", side: str = "Allied") -> dict:
+    return events.make_event(events.BAN_RECORDED, seq, team_key=team_key, map=map_name, side=side)
+
+def _journal(evts: list[dict]) -> storage.Write:
+    lines = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in evts)
+    return storage.Write(CHANNEL, None, "m1", None, evts, lines)
+
+def _snapshot(m: Match) -> storage.Write:
+    return storage.Write(CHANNEL, None, m.match_id, model.dumps(m), [], "")
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def backend(request, scratch):
+    b = (storage.FileBackend(str(scratch / "state")) if request.param == "file"
+         else storage.SQLiteBackend(str(scratch / "state.db")))
+    yield b
+    b.close()
+
+
+def test_journal_replay_skips_duplicate_seqs(backend):
+    async def run():
+        m = Match()
+        m.match_id = "m1"
+        m.map_bans = {"Carentan": 0, "Foy": 0, "Kursk": 0}
+        await backend.write([_snapshot(m)])
+        first = [_ban(1, "Carentan"), _ban(2, "Foy", "team_b", "Axis")]
+        await backend.write([_journal(first)])
+        # A retried flush writes the same events again, then the next one follows
+        await backend.write([_journal(first)])
+        await backend.write([_journal([_ban(3, "Kursk")])])
+        return await backend.read(CHANNEL, None)
+
+    data, journal_bytes, _ = asyncio.run(run())
+    assert data.journal_seq == 3
+    assert [e["seq"] for e in data.update_history] == [1, 2, 3]
+    assert data.slot("Carentan", "team_a", "Allied") == MANUAL
+    assert data.slot("Foy", "team_b", "Axis") == MANUAL
+    assert data.slot("Kursk", "team_a", "Allied") == MANUAL
+    assert journal_bytes > 0
+
+
+def test_snapshot_covers_journaled_seqs(backend):
+    async def run():
+        m = Match()
+        m.match_id = "m1"
+        m.map_bans = {"Carentan": 0}
+        events.apply_event(m, _ban(1, "Carentan"))
+        await backend.write([_snapshot(m)])
+        # Left over from before the snapshot, e.g. a journal append that raced it
+        await backend.write([_journal([_ban(1, "Carentan")])])
+        return await backend.read(CHANNEL, None)
+
+    data, _, _ = asyncio.run(run())
+    assert data.journal_seq == 1
+    assert len(data.update_history) == 1
+
+def test_deleted_match_is_neither_stored_nor_active(backend):
+    async def run():
+        for channel_id in (CHANNEL, CHANNEL + 1):
+            m = Match()
+            m.match_id = f"m{channel_id}"
+            await backend.write([storage.Write(channel_id, 7, m.match_id, model.dumps(m), [], "")])
+        await backend.delete(CHANNEL, 7)
+        return await backend.matches(7), await backend.active(7), await backend.find_match(f"m{CHANNEL}")
+
+    stored, active, found = asyncio.run(run())
+    assert stored == active == [CHANNEL + 1]
+    assert found is None
+
+def test_concurrent_manifest_updates_keep_every_channel(scratch, monkeypatch):
+    b = storage.FileBackend(str(scratch / "state"))
+    write_manifest = b._write_manifest
+    rng = random.Random(1)
+
+    def slow(guild_id, active):
+        # Later updates finishing first is what used to drop channels
+        time.sleep(rng.random() * 0.02)
+        write_manifest(guild_id, active)
+    monkeypatch.setattr(b, "_write_manifest", slow)
+
+    async def run():
+        await asyncio.gather(*(b._manifest_set(7, ch, True) for ch in range(100, 140)))
+
+    asyncio.run(run())
+    with open(scratch / "state" / "7" / storage.MANIFEST_NAME) as f:
+        assert json.load(f)["active"] == list(range(100, 140))
+    assert not [p for p in os.listdir(scratch / "state" / "7") if p.endswith(".tmp")]